@@ -0,0 +1,62 @@
+import argparse
+import json
+import sys
+
+# Zwei Ergebnisse von bench.run vergleichen:
+#   python -m bench.compare alt.json neu.json [--threshold 10]
+# Exit-Code 1, wenn eine Kennzahl um mehr als threshold Prozent schlechter geworden ist.
+
+HIGHER_IS_BETTER = ("lines_per_s",)
+IGNORED = ("lines", "runs", "steps") # Mengenangaben, keine Leistungswerte
+
+
+def flatten(results, prefix=""):
+    values = {}
+    for key, value in results.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            values.update(flatten(value, path))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and key not in IGNORED:
+            values[path] = value
+    return values
+
+
+def change(metric, old, new):
+    # Veränderung in Prozent, positiv = schlechter
+    if old == 0:
+        return 0.0 if new == 0 else 100.0
+    delta = (new - old) / abs(old) * 100
+    return -delta if metric.rsplit(".", 1)[-1] in HIGHER_IS_BETTER else delta
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench.compare", description="Benchmark-Ergebnisse vergleichen")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Prozent, ab denen eine Verschlechterung zählt")
+    args = parser.parse_args(argv)
+
+    with open(args.old) as f:
+        old = flatten(json.load(f)["results"])
+    with open(args.new) as f:
+        new = flatten(json.load(f)["results"])
+
+    regressions = 0
+    for metric in sorted(old.keys() & new.keys()):
+        worse = change(metric, old[metric], new[metric])
+        mark = ""
+        if worse > args.threshold:
+            mark = "  <-- schlechter"
+            regressions += 1
+        elif worse < -args.threshold:
+            mark = "  besser"
+        print(f"{metric:60} {old[metric]:>12} -> {new[metric]:>12} ({worse:+.1f}%){mark}")
+    for metric in sorted(old.keys() ^ new.keys()):
+        print(f"{metric:60} nur in {'alt' if metric in old else 'neu'}")
+
+    print(f"\n{regressions} Verschlechterung(en) über {args.threshold:.0f}%")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,46 @@
+import os
+
+# Synthetische Module für die Benchmarks. Module werden ohne Argumente gestartet
+# (python -u code_path bzw. im Warm-Pool), deshalb landet die Konfiguration
+# direkt im erzeugten Skript.
+
+TEMPLATE = '''import sys
+import time
+
+LINES = {lines}
+SIZE = {size}
+RATE = {rate} # Zeilen pro Sekunde, 0 = so schnell wie möglich
+BLOCK = {block} # Zeilen pro write() (ohne RATE), 0 = jede Zeile einzeln
+
+payload = "x" * SIZE
+start = time.monotonic()
+if BLOCK and not RATE:
+    for first in range(0, LINES, BLOCK):
+        sys.stdout.write("".join(f"L{{i:08d}} {{payload}}\\n" for i in range(first, min(first + BLOCK, LINES))))
+else:
+    for i in range(LINES):
+        sys.stdout.write(f"L{{i:08d}} {{payload}}\\n")
+        if RATE:
+            delay = start + (i + 1) / RATE - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+sys.stdout.flush()
+'''
+
+FIRST_LINE = "L00000000" # Anfang der ersten Ausgabezeile, für die Latenz-Messung
+
+
+def module_script(lines=100, line_size=80, rate=0, duration=None, block=0):
+    # duration (Sekunden) zusammen mit rate ergibt die Zeilenzahl
+    # block: Zeilen gesammelt schreiben, misst den Runner statt print() im Modul
+    if duration is not None and rate:
+        lines = int(duration * rate)
+    return TEMPLATE.format(lines=int(lines), size=int(line_size), rate=float(rate), block=int(block))
+
+
+def write_module(directory, name, **config):
+    # Skript ablegen, Rückgabe: Pfad (für Module.code_path)
+    path = os.path.join(directory, f"{name}.py")
+    with open(path, "w") as f:
+        f.write(module_script(**config))
+    return path
@@ -0,0 +1,353 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from bench.modules import FIRST_LINE, write_module
+
+# Benchmarks für die heißen Pfade: Ausführung, Log-Persistenz, GUI-Log.
+# Aufruf aus dem Projektverzeichnis:  python -m bench.run --output ergebnis.json
+# Ohne --db-url läuft alles gegen eine temporäre SQLite-Datenbank statt MariaDB.
+
+BENCHMARKS = ("log_throughput", "db_per_run", "first_output", "linear", "parallel", "gui_log")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m bench.run", description="Benchmarks für Ausführung und Logging")
+    parser.add_argument("--output", "-o", help="JSON-Datei (Standard: stdout)")
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, help="nur diese Benchmarks")
+    parser.add_argument("--db-url", help="Datenbank (Standard: temporäre SQLite-Datei)")
+    parser.add_argument("--executor", choices=("async", "thread"), help="Executor (Standard: WORKFLOW_EXECUTOR)")
+    parser.add_argument("--backends", nargs="+", default=["subprocess", "pool"], choices=("subprocess", "pool"))
+    parser.add_argument("--lines", type=int, default=50000, help="Zeilen für den Durchsatz-Test")
+    parser.add_argument("--line-size", type=int, default=80, help="Zeichen pro Zeile")
+    parser.add_argument("--block-lines", type=int, default=0,
+                        help="Zeilen pro write() im Durchsatz-Modul (0 = einzeln, begrenzt dann meist das Modul)")
+    parser.add_argument("--repeat", type=int, default=10, help="Wiederholungen für Latenz und DB-Zähler")
+    parser.add_argument("--steps", type=int, default=10, help="Steps für linear/parallel")
+    parser.add_argument("--step-lines", type=int, default=100, help="Zeilen pro Step für linear/parallel")
+    parser.add_argument("--gui-rate", type=int, default=50000, help="Zeilen pro Sekunde ins Log-Fenster")
+    parser.add_argument("--gui-duration", type=float, default=3.0, help="Sekunden Last auf dem Log-Fenster")
+    return parser
+
+
+def setup_environment(args, tmp):
+    # Muss vor dem ersten Import von db/workflows passieren (Konfiguration wird beim Import gelesen)
+    os.environ["WORKFLOWS_DB_URL"] = args.db_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+    os.environ["WORKFLOW_ARTIFACT_DIR"] = os.path.join(tmp, "artifacts")
+    os.environ["WORKFLOW_CACHE"] = "0" # sonst misst die Wiederholung nur den Cache
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    if args.executor:
+        os.environ["WORKFLOW_EXECUTOR"] = args.executor
+
+
+def percentiles(values):
+    if not values:
+        return {}
+    values = sorted(values)
+    return {
+        "min": round(values[0], 3),
+        "median": round(statistics.median(values), 3),
+        "p95": round(values[min(len(values) - 1, int(len(values) * 0.95))], 3),
+        "max": round(values[-1], 3),
+    }
+
+
+class StatementCounter:
+    # Zählt SQL-Anweisungen und Commits aller Verbindungen der Engine
+    def __init__(self, engine):
+        from sqlalchemy import event
+        self._lock = threading.Lock()
+        self.statements = 0
+        self.commits = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+        event.listen(engine, "commit", self._on_commit)
+
+    def _on_execute(self, *args):
+        with self._lock:
+            self.statements += 1
+
+    def _on_commit(self, *args):
+        with self._lock:
+            self.commits += 1
+
+    def snapshot(self):
+        with self._lock:
+            return self.statements, self.commits
+
+
+class Bench:
+    def __init__(self, args, tmp):
+        from db.db_setup import engine, init_db
+        from db.log_writer import get_log_writer
+
+        with contextlib.redirect_stdout(sys.stderr): # Migrationsmeldungen nicht ins JSON
+            init_db()
+        self.args = args
+        self.module_dir = os.path.join(tmp, "modules")
+        os.makedirs(self.module_dir, exist_ok=True)
+        self.counter = StatementCounter(engine)
+        self.writer = get_log_writer()
+        self._names = 0
+
+    def create_workflow(self, modules, parallel=False):
+        # modules: [(Name, Backend, Modul-Konfiguration)], Rückgabe: Workflow-ID
+        from db.db_setup import SessionLocal, Module, Workflow, WorkflowStep
+
+        self._names += 1
+        session = SessionLocal()
+        try:
+            workflow = Workflow(name=f"bench-{self._names}", max_parallel=len(modules) if parallel else None)
+            session.add(workflow)
+            session.flush()
+            for position, (name, backend, config) in enumerate(modules):
+                mod = Module(
+                    name=name, code_path=write_module(self.module_dir, f"{name}_{self._names}", **config),
+                    needs_input=False, needs_output=True, backend=backend,
+                )
+                session.add(mod)
+                session.flush()
+                parameters = {"cache": False}
+                if parallel:
+                    parameters["depends_on"] = []
+                session.add(WorkflowStep(workflow_id=workflow.id, module_id=mod.id, position=position, parameters=parameters))
+            session.commit()
+            return workflow.id
+        finally:
+            session.close()
+
+    def run(self, workflow_id, emit=None):
+        # Ein kompletter Lauf wie aus der GUI/CLI, gemessen inkl. DB-Zugriffen
+        from workflows.engine import run_workflow
+
+        statements, commits = self.counter.snapshot()
+        start = time.perf_counter()
+        instance_id, status, _ = run_workflow(workflow_id, emit or (lambda line: None))
+        elapsed = time.perf_counter() - start
+        statements_after, commits_after = self.counter.snapshot()
+        if status != "finished":
+            raise RuntimeError(f"Benchmark-Workflow {workflow_id} endete mit Status {status}")
+        return instance_id, elapsed, statements_after - statements, commits_after - commits
+
+    def persisted_lines(self, instance_id):
+        from db.db_setup import SessionLocal, ModuleRun
+        from db.log_store import line_count
+
+        session = SessionLocal()
+        try:
+            run_ids = [r.id for r in session.query(ModuleRun.id).filter_by(workflow_instance_id=instance_id)]
+        finally:
+            session.close()
+        return sum(line_count(run_id) for run_id in run_ids)
+
+    # --- Benchmarks ---
+
+    def log_throughput(self):
+        # Ein Modul schreibt so schnell es kann, gemessen bis alle Zeilen in der DB stehen
+        results = {}
+        for backend in self.args.backends:
+            config = {"lines": self.args.lines, "line_size": self.args.line_size, "block": self.args.block_lines}
+            workflow_id = self.create_workflow([("throughput", backend, config)])
+            before = self.writer.counters()
+            instance_id, elapsed, statements, commits = self.run(workflow_id)
+            after = self.writer.counters()
+            persisted = self.persisted_lines(instance_id)
+            results[backend] = {
+                "lines": persisted,
+                "seconds": round(elapsed, 3),
+                "lines_per_s": round(persisted / elapsed, 1),
+                "mb_per_s": round(persisted * (self.args.line_size + 10) / elapsed / 1e6, 1),
+                "statements": statements,
+                "commits": commits,
+                "writer_flushes": after["flushes"] - before["flushes"],
+                "writer_max_flush_ms": after["max_flush_ms"],
+                "writer_spilled_mb": round((after["spilled_bytes"] - before["spilled_bytes"]) / 1e6, 1),
+            }
+        return results
+
+    def db_per_run(self):
+        # SQL-Anweisungen/Commits für einen kleinen Ein-Step-Lauf
+        results = {}
+        for backend in self.args.backends:
+            workflow_id = self.create_workflow([("small", backend, {"lines": 10})])
+            counts = [self.run(workflow_id)[2:] for _ in range(self.args.repeat)]
+            results[backend] = {
+                "runs": len(counts),
+                "statements_per_run": round(statistics.mean(c[0] for c in counts), 1),
+                "commits_per_run": round(statistics.mean(c[1] for c in counts), 1),
+            }
+        return results
+
+    def first_output(self):
+        # Zeit vom Start des Laufs bis zur ersten Ausgabezeile des Moduls (ms)
+        results = {}
+        for backend in self.args.backends:
+            workflow_id = self.create_workflow([("latency", backend, {"lines": 1})])
+            latencies = []
+            for _ in range(self.args.repeat):
+                seen = []
+                start = time.perf_counter()
+
+                def emit(line):
+                    if not seen and FIRST_LINE in line:
+                        seen.append(time.perf_counter())
+
+                self.run(workflow_id, emit)
+                if seen:
+                    latencies.append((seen[0] - start) * 1000)
+            results[backend] = {"runs": len(latencies), "ms": percentiles(latencies)}
+        return results
+
+    def _chain(self, parallel):
+        results = {}
+        config = {"lines": self.args.step_lines, "line_size": self.args.line_size}
+        for backend in self.args.backends:
+            modules = [(f"step{i}", backend, config) for i in range(self.args.steps)]
+            workflow_id = self.create_workflow(modules, parallel=parallel)
+            _, elapsed, statements, commits = self.run(workflow_id)
+            results[backend] = {
+                "steps": self.args.steps,
+                "seconds": round(elapsed, 3),
+                "ms_per_step": round(elapsed * 1000 / self.args.steps, 1),
+                "statements": statements,
+                "commits": commits,
+            }
+        return results
+
+    def linear(self):
+        return self._chain(parallel=False)
+
+    def parallel(self):
+        return self._chain(parallel=True)
+
+    def gui_log(self):
+        # Latenz vom LogView.append (beliebiger Thread) bis die Zeile im Puffer/Modell ist
+        try:
+            from PyQt5.QtCore import QTimer
+            from PyQt5.QtWidgets import QApplication
+            from gui.log_view import LogView
+        except ImportError as e:
+            return {"skipped": f"PyQt5 nicht verfügbar: {e}"}
+
+        app = QApplication.instance() or QApplication([])
+        appended = [] # perf_counter je Zeile, Index = Zeilennummer
+        latencies = []
+        drain_ms = []
+
+        class TimedLogView(LogView):
+            def _drain(self):
+                start = time.perf_counter()
+                before = len(self.buffer)
+                super()._drain()
+                now = time.perf_counter()
+                drain_ms.append((now - start) * 1000)
+                for i in range(before, min(len(self.buffer), len(appended))):
+                    latencies.append((now - appended[i]) * 1000)
+
+        view = TimedLogView()
+        view.show()
+        rate, duration = self.args.gui_rate, self.args.gui_duration
+        line = "x" * self.args.line_size
+
+        def produce():
+            # Wie ein Run-Thread: eine append()-Zeile pro Modul-Zeile, in Schüben alle 10 ms
+            start = time.perf_counter()
+            count = 0
+            while True:
+                elapsed = time.perf_counter() - start
+                if elapsed >= duration:
+                    break
+                due = int(elapsed * rate) - count
+                for _ in range(due):
+                    appended.append(time.perf_counter())
+                    view.append(line)
+                count += max(due, 0)
+                time.sleep(0.01)
+
+        producer = threading.Thread(target=produce, daemon=True)
+
+        def check():
+            if not producer.is_alive() and not view.counters()["pending"]:
+                app.quit()
+
+        poll = QTimer()
+        poll.timeout.connect(check)
+        poll.start(50)
+        started = time.perf_counter()
+        producer.start()
+        app.exec_()
+        poll.stop()
+        elapsed = time.perf_counter() - started
+        counters = view.counters()
+        view.close()
+        view.buffer.close()
+        return {
+            "lines": counters["received"],
+            "lines_per_s": round(counters["received"] / elapsed, 1),
+            "dropped": counters["dropped"],
+            "latency_ms": percentiles(latencies),
+            "drain_ms": percentiles(drain_ms),
+        }
+
+
+def environment_info(args):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip()
+    except OSError:
+        commit = ""
+    from workflows.async_executor import EXECUTOR_MODE
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "db": "sqlite" if not args.db_url else args.db_url.split(":", 1)[0],
+        "executor": EXECUTOR_MODE,
+    }
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    with tempfile.TemporaryDirectory(prefix="workflow-bench-") as tmp:
+        setup_environment(args, tmp)
+        bench = Bench(args, tmp)
+        results = {}
+        for name in args.only or BENCHMARKS:
+            print(f"{name} ...", file=sys.stderr)
+            try:
+                results[name] = getattr(bench, name)()
+            except Exception as e:
+                results[name] = {"error": str(e)}
+                print(f"{name} fehlgeschlagen: {e}", file=sys.stderr)
+
+        from db.db_config import pool_counters
+        from db.db_setup import engine
+        report = {
+            "environment": environment_info(args),
+            "config": {k: v for k, v in vars(args).items() if k not in ("output", "db_url")},
+            "results": results,
+            "db_pool": pool_counters(engine),
+        }
+        bench.writer.stop()
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,263 @@
+import enum
+import gzip
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, delete
+
+from db.db_setup import engine, SessionLocal, Workflow, WorkflowStep, Module, WorkflowInstance, ModuleRun, ModuleRunLogChunk, ArchivedInstance
+from db.log_store import decode_chunk
+
+# Aufbewahrung der Lauf-Historie: ältere Instanzen eines Workflows werden samt Modul-Runs und
+# Logs in komprimierte Dateien geschrieben und danach aus den Tabellen gelöscht.
+# Eine Datei pro Instanz (JSON Lines, gzip): erst die Instanz, dann je Run eine Zeile,
+# dann die Log-Zeilen chunkweise. archived_instances hält den Index zum Durchblättern.
+
+ARCHIVE_DIR = os.environ.get("WORKFLOW_ARCHIVE_DIR", os.path.join(os.path.expanduser("~"), ".workflow_archive"))
+KEEP_RUNS = int(os.environ.get("WORKFLOW_KEEP_RUNS", "0")) # neueste N Instanzen je Workflow behalten, 0 = alle
+KEEP_DAYS = float(os.environ.get("WORKFLOW_KEEP_DAYS", "0")) # Instanzen der letzten D Tage behalten, 0 = alle
+BATCH_SIZE = 50 # Instanzen pro Lösch-Transaktion
+ID_CHUNK = 500 # max. IDs pro IN (...)
+
+ACTIVE_STATUS = ("pending", "running") # laufende Instanzen werden nie archiviert
+
+
+def _row(obj):
+    values = {}
+    for column in obj.__table__.columns:
+        value = getattr(obj, column.key)
+        if isinstance(value, enum.Enum):
+            value = value.value
+        elif isinstance(value, datetime):
+            value = value.isoformat()
+        values[column.key] = value
+    return values
+
+
+def _chunks(ids, size=ID_CHUNK):
+    for i in range(0, len(ids), size):
+        yield ids[i:i + size]
+
+
+def expired_instances(session, workflow_id, keep_runs=KEEP_RUNS, keep_days=KEEP_DAYS, limit=BATCH_SIZE):
+    # IDs der Instanzen, die außerhalb der Aufbewahrung liegen (älteste zuerst)
+    # Archiviert wird nur, was weder zu den neuesten keep_runs gehört noch jünger als keep_days ist
+    if not keep_runs and not keep_days:
+        return []
+    query = (
+        session.query(WorkflowInstance.id)
+        .filter(WorkflowInstance.workflow_id == workflow_id)
+        .filter(WorkflowInstance.status.notin_(ACTIVE_STATUS))
+    )
+    if keep_runs:
+        boundary = (
+            session.query(WorkflowInstance.id)
+            .filter(WorkflowInstance.workflow_id == workflow_id)
+            .order_by(WorkflowInstance.id.desc())
+            .offset(keep_runs - 1)
+            .limit(1)
+            .scalar()
+        )
+        if boundary is None:
+            return []
+        query = query.filter(WorkflowInstance.id < boundary)
+    if keep_days:
+        query = query.filter(WorkflowInstance.started_at < datetime.now() - timedelta(days=keep_days))
+    return [row.id for row in query.order_by(WorkflowInstance.id).limit(limit)]
+
+
+def archive_path(instance, root=ARCHIVE_DIR):
+    stamp = instance.started_at.strftime("%Y%m%d-%H%M%S") if instance.started_at else "unknown"
+    return os.path.join(root, str(instance.workflow_id), f"{instance.id}-{stamp}.jsonl.gz")
+
+
+def write_archive(session, conn, instance, path):
+    # Instanz, Runs (mit Modulname/Position) und Logs in eine Datei schreiben; atomar per rename
+    runs = (
+        session.query(ModuleRun, Module.name, WorkflowStep.position)
+        .outerjoin(WorkflowStep, WorkflowStep.id == ModuleRun.workflow_step_id)
+        .outerjoin(Module, Module.id == WorkflowStep.module_id)
+        .filter(ModuleRun.workflow_instance_id == instance.id)
+        .order_by(ModuleRun.id)
+        .all()
+    )
+    workflow_name = session.query(Workflow.name).filter_by(id=instance.workflow_id).scalar()
+    chunks = ModuleRunLogChunk.__table__
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as raw:
+        with gzip.open(raw, "wt", encoding="utf-8") as f:
+            f.write(json.dumps({"type": "instance", "workflow_name": workflow_name, **_row(instance)}) + "\n")
+            for run, module_name, position in runs:
+                f.write(json.dumps({"type": "run", "module_name": module_name, "position": position, **_row(run)}, default=str) + "\n")
+            for run, _, _ in runs:
+                rows = conn.execute(
+                    select(chunks.c.data)
+                    .where(chunks.c.module_run_id == run.id)
+                    .order_by(chunks.c.seq)
+                    .execution_options(yield_per=16)
+                )
+                for row in rows:
+                    f.write(json.dumps({"type": "log", "run": run.id, "lines": decode_chunk(row.data)}) + "\n")
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(tmp, path)
+    return [run.id for run, _, _ in runs]
+
+
+def archive_instances(instance_ids, root=ARCHIVE_DIR, bind=None):
+    # Instanzen archivieren und löschen; eine Transaktion für die ganze Gruppe.
+    # Bricht der Vorgang ab, bleiben die Daten in der DB und die Datei wird beim nächsten Mal überschrieben.
+    bind = bind or engine
+    if not instance_ids:
+        return 0
+    session = SessionLocal(bind=bind)
+    try:
+        instances = session.query(WorkflowInstance).filter(WorkflowInstance.id.in_(instance_ids)).all()
+        run_ids = []
+        index = []
+        with bind.connect() as conn:
+            for inst in instances:
+                path = archive_path(inst, root)
+                ids = write_archive(session, conn, inst, path)
+                run_ids.extend(ids)
+                index.append({
+                    "instance_id": inst.id,
+                    "workflow_id": inst.workflow_id,
+                    "status": inst.status.value if inst.status else None,
+                    "started_at": inst.started_at,
+                    "finished_at": inst.finished_at,
+                    "run_count": len(ids),
+                    "path": path,
+                    "archived_at": datetime.now(),
+                })
+    finally:
+        session.close()
+
+    with bind.begin() as conn:
+        for ids in _chunks(run_ids):
+            conn.execute(delete(ModuleRunLogChunk.__table__).where(ModuleRunLogChunk.module_run_id.in_(ids)))
+            conn.execute(delete(ModuleRun.__table__).where(ModuleRun.id.in_(ids)))
+        for ids in _chunks([entry["instance_id"] for entry in index]):
+            conn.execute(delete(WorkflowInstance.__table__).where(WorkflowInstance.id.in_(ids)))
+        if index:
+            conn.execute(ArchivedInstance.__table__.insert(), index)
+    return len(index)
+
+
+def apply_retention(workflow_id=None, keep_runs=KEEP_RUNS, keep_days=KEEP_DAYS, root=ARCHIVE_DIR,
+                    batch_size=BATCH_SIZE, dry_run=False):
+    # Aufbewahrung für einen oder alle Workflows anwenden, Rückgabe: workflow_id -> Anzahl archiviert
+    session = SessionLocal()
+    try:
+        workflow_ids = [workflow_id] if workflow_id is not None else [w.id for w in session.query(Workflow.id)]
+    finally:
+        session.close()
+
+    archived = {}
+    for wf_id in workflow_ids:
+        total = 0
+        while True:
+            session = SessionLocal()
+            try:
+                # Probelauf: alle Kandidaten auf einmal zählen (es wird ja nichts gelöscht)
+                ids = expired_instances(session, wf_id, keep_runs, keep_days, None if dry_run else batch_size)
+            finally:
+                session.close()
+            if not ids:
+                break
+            if dry_run:
+                total = len(ids)
+                break
+            total += archive_instances(ids, root)
+        if total:
+            archived[wf_id] = total
+    return archived
+
+
+_retention_lock = threading.Lock()
+
+
+def schedule_retention(workflow_id):
+    # Nach einem Lauf im Hintergrund aufräumen (nur wenn WORKFLOW_KEEP_RUNS/_DAYS gesetzt sind);
+    # läuft schon ein Durchgang, wird dieser ausgelassen
+    if not KEEP_RUNS and not KEEP_DAYS:
+        return
+
+    def run():
+        if not _retention_lock.acquire(blocking=False):
+            return
+        try:
+            apply_retention(workflow_id)
+        except Exception as e:
+            print(f"Archivierung für Workflow {workflow_id} fehlgeschlagen: {e}")
+        finally:
+            _retention_lock.release()
+
+    threading.Thread(target=run, name="retention", daemon=True).start()
+
+
+# --- Archiv lesen ---
+
+def archived_instances(workflow_id=None, limit=None):
+    session = SessionLocal()
+    try:
+        query = session.query(ArchivedInstance).order_by(ArchivedInstance.instance_id.desc())
+        if workflow_id is not None:
+            query = query.filter(ArchivedInstance.workflow_id == workflow_id)
+        if limit:
+            query = query.limit(limit)
+        rows = query.all()
+        session.expunge_all()
+        return rows
+    finally:
+        session.close()
+
+
+def find_archive(instance_id):
+    session = SessionLocal()
+    try:
+        entry = (
+            session.query(ArchivedInstance)
+            .filter(ArchivedInstance.instance_id == instance_id)
+            .order_by(ArchivedInstance.id.desc())
+            .first()
+        )
+        if entry is not None:
+            session.expunge(entry)
+        return entry
+    finally:
+        session.close()
+
+
+def read_archive(path, logs=False):
+    # (Instanz, [Runs]); mit logs=True bekommt jeder Run eine Liste "log"
+    instance = None
+    runs = {}
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            entry = json.loads(line)
+            kind = entry.pop("type")
+            if kind == "instance":
+                instance = entry
+            elif kind == "run":
+                runs[entry["id"]] = entry
+                if logs:
+                    entry["log"] = []
+            elif kind == "log":
+                if not logs:
+                    break # Logs stehen am Ende der Datei
+                runs[entry["run"]]["log"].extend(entry["lines"])
+    return instance, list(runs.values())
+
+
+def iter_archived_log(path, run_id):
+    # Log eines archivierten Runs zeilenweise
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            entry = json.loads(line)
+            if entry["type"] == "log" and entry["run"] == run_id:
+                yield from entry["lines"]
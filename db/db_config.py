@@ -0,0 +1,177 @@
+import configparser
+import os
+import threading
+import time
+
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.pool import QueuePool, StaticPool
+
+# Datenbank-Konfiguration: Standardwerte < Konfigurationsdatei < Umgebungsvariablen.
+# Datei: WORKFLOWS_DB_CONFIG, sonst ./workflows.ini, sonst ~/.config/workflows/workflows.ini,
+# Abschnitt [database] mit denselben Schlüsseln wie DEFAULTS.
+
+DEFAULTS = {
+    "url": "mysql+pymysql://user:@localhost:3306/workflows_db?charset=utf8mb4",
+    "pool_size": 10, # dauerhaft offene Verbindungen
+    "max_overflow": 20, # zusätzliche Verbindungen bei Last
+    "pool_timeout": 30, # Sekunden Warten auf eine freie Verbindung
+    "pool_recycle": 3600, # Verbindungen nach so vielen Sekunden erneuern (MariaDB wait_timeout)
+    "pre_ping": None, # Verbindung vor Benutzung prüfen, leer = nur bei Server-Datenbanken
+    "statement_timeout": 0, # Sekunden pro Anweisung, 0 = unbegrenzt (MariaDB/MySQL/PostgreSQL)
+    "busy_timeout": 30, # SQLite: Sekunden Warten auf Sperren
+}
+
+CONFIG_PATHS = ("workflows.ini", os.path.join("~", ".config", "workflows", "workflows.ini"))
+
+
+def _convert(key, value):
+    default = DEFAULTS[key]
+    if value is None or isinstance(value, type(default)):
+        return value
+    if key == "pre_ping":
+        return str(value).strip().lower() in ("1", "true", "yes", "on")
+    if isinstance(default, int):
+        return int(value)
+    return value
+
+
+def load_db_config(path=None):
+    config = dict(DEFAULTS)
+
+    path = path or os.environ.get("WORKFLOWS_DB_CONFIG")
+    candidates = [path] if path else CONFIG_PATHS
+    for candidate in candidates:
+        candidate = os.path.expanduser(candidate)
+        if os.path.exists(candidate):
+            parser = configparser.ConfigParser()
+            parser.read(candidate)
+            if parser.has_section("database"):
+                for key, value in parser.items("database"):
+                    if key in DEFAULTS:
+                        config[key] = _convert(key, value)
+            break
+        if path:
+            print(f"DB-Konfiguration {candidate} nicht gefunden, verwende Standardwerte")
+
+    for key in DEFAULTS:
+        value = os.environ.get(f"WORKFLOWS_DB_{key.upper()}")
+        if value is not None:
+            config[key] = _convert(key, value)
+    return config
+
+
+class TimedQueuePool(QueuePool):
+    # QueuePool, der misst, wie lange auf eine Verbindung gewartet wurde
+    # (ist der Pool ausgeschöpft, blockiert _do_get bis pool_timeout)
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._checkouts = 0
+        self._waited = 0
+        self._timeouts = 0
+        self._total_wait_ms = 0.0
+        self._max_wait_ms = 0.0
+
+    def _do_get(self):
+        if getattr(self._local, "active", False):
+            return super()._do_get() # rekursiver Aufruf innerhalb von QueuePool
+        self._local.active = True
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            timed_out = True
+            raise
+        finally:
+            self._local.active = False
+            elapsed = (time.perf_counter() - start) * 1000
+            with self._stats_lock:
+                self._checkouts += 1
+                self._timeouts += timed_out
+                self._total_wait_ms += elapsed
+                self._max_wait_ms = max(self._max_wait_ms, elapsed)
+                if elapsed >= 1.0:
+                    self._waited += 1
+
+    def counters(self):
+        with self._stats_lock:
+            return {
+                "size": self.size(),
+                "checked_out": self.checkedout(),
+                "overflow": self.overflow(),
+                "checkouts": self._checkouts,
+                "waited": self._waited, # Checkouts mit >= 1 ms Wartezeit (inkl. Verbindungsaufbau)
+                "timeouts": self._timeouts,
+                "avg_wait_ms": round(self._total_wait_ms / self._checkouts, 3) if self._checkouts else 0.0,
+                "max_wait_ms": round(self._max_wait_ms, 3),
+            }
+
+
+def _sqlite_setup(engine, busy_timeout):
+    # WAL: Leser blockieren den Schreiber nicht; NORMAL reicht mit WAL für Konsistenz.
+    # Transaktionen bleiben beim pysqlite-Standard (BEGIN erst vor dem ersten Schreibzugriff),
+    # damit offene Lese-Sessions der GUI keine Schreibsperre halten.
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={int(busy_timeout * 1000)}")
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+
+def _statement_timeout_setup(engine, seconds):
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            if engine.dialect.name in ("mysql", "mariadb"):
+                try:
+                    cursor.execute(f"SET SESSION max_statement_time = {float(seconds)}") # MariaDB
+                except Exception:
+                    cursor.execute(f"SET SESSION max_execution_time = {int(seconds * 1000)}") # MySQL, nur SELECT
+            elif engine.dialect.name == "postgresql":
+                cursor.execute(f"SET statement_timeout = {int(seconds * 1000)}")
+        except Exception as e:
+            print(f"Statement-Timeout nicht gesetzt: {e}")
+        finally:
+            cursor.close()
+
+
+def create_db_engine(config=None):
+    config = config or load_db_config()
+    url = config["url"]
+    sqlite = url.startswith("sqlite")
+    memory = sqlite and (url in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in url)
+    pre_ping = config["pre_ping"] if config["pre_ping"] is not None else not sqlite
+
+    if memory:
+        # eine gemeinsame Verbindung, sonst sieht jeder Thread eine eigene leere Datenbank
+        engine = create_engine(url, poolclass=StaticPool, connect_args={"check_same_thread": False})
+    else:
+        engine = create_engine(
+            url,
+            poolclass=TimedQueuePool,
+            pool_size=config["pool_size"],
+            max_overflow=config["max_overflow"],
+            pool_timeout=config["pool_timeout"],
+            pool_recycle=config["pool_recycle"],
+            pool_pre_ping=pre_ping,
+            # SQLite: Verbindungen werden zwischen Threads weitergereicht
+            connect_args={"check_same_thread": False} if sqlite else {},
+        )
+
+    if sqlite:
+        _sqlite_setup(engine, config["busy_timeout"])
+    elif config["statement_timeout"]:
+        _statement_timeout_setup(engine, config["statement_timeout"])
+    return engine
+
+
+def pool_counters(engine):
+    # Zähler des Verbindungs-Pools (leer, wenn der Pool keine Zeiten misst)
+    pool = engine.pool
+    return pool.counters() if isinstance(pool, TimedQueuePool) else {}
@@ -1,8 +1,10 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, ForeignKey, Enum, JSON, DateTime, Boolean
+from sqlalchemy import select, create_engine, Column, Integer, BigInteger, Float, String, Text, ForeignKey, Enum, JSON, DateTime, Boolean, LargeBinary, UniqueConstraint, Index
 from sqlalchemy.orm import declarative_base, relationship, sessionmaker
 import enum
 import datetime
 
+from db.db_config import load_db_config, create_db_engine
+
 Base = declarative_base()
 
 # Status Enums
@@ -11,6 +13,9 @@ class StatusEnum(str, enum.Enum):
     running = "running"
     failed = "failed"
     finished = "finished"
+    cancelled = "cancelled" # vom Benutzer abgebrochen
+    timeout = "timeout" # Laufzeit- oder CPU-Grenze überschritten
+    oom = "oom" # Speichergrenze überschritten
 
 # Tabellen
 class Module(Base):
@@ -23,6 +28,10 @@ class Module(Base):
     code_path = Column(Text, default="")
     needs_input = Column(Boolean, default=True)
     needs_output = Column(Boolean, default=True)
+    backend = Column(String(20), default="subprocess") # "subprocess" oder "pool" (Warm-Pool)
+    timeout = Column(Integer) # max. Laufzeit in Sekunden, leer = unbegrenzt
+    cpu_limit = Column(Integer) # max. CPU-Zeit in Sekunden
+    memory_limit_mb = Column(Integer) # max. Speicher (Adressraum) in MB
 
 class Workflow(Base):
     __tablename__ = "workflows"
@@ -30,6 +39,9 @@ class Workflow(Base):
     name = Column(String(255), unique=True, nullable=False)
     description = Column(Text)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    max_parallel = Column(Integer) # max. parallele Steps, leer = globale Grenze
+    pipeline = Column(Boolean, default=False) # Steps per Pipe verbinden (stdout -> stdin)
+    priority = Column(Integer, default=0) # höher = wird in der Warteschlange zuerst gestartet
     steps = relationship("WorkflowStep", back_populates="workflow", order_by="WorkflowStep.position")
 
 class WorkflowStep(Base):
@@ -38,11 +50,15 @@ class WorkflowStep(Base):
     workflow_id = Column(Integer, ForeignKey("workflows.id"))
     module_id = Column(Integer, ForeignKey("modules.id"))
     position = Column(Integer)
-    parameters = Column(JSON)
+    parameters = Column(JSON) # u.a. "depends_on": [step_id, ...], fehlt = vorheriger Step
     
     workflow = relationship("Workflow", back_populates="steps")
     module = relationship("Module")
 
+    __table_args__ = (
+        Index("ix_workflow_steps_workflow_position", "workflow_id", "position"),
+    )
+
 class WorkflowInstance(Base):
     __tablename__ = "workflow_instances"
     id = Column(Integer, primary_key=True)
@@ -50,6 +66,21 @@ class WorkflowInstance(Base):
     status = Column(Enum(StatusEnum), default=StatusEnum.pending)
     started_at = Column(DateTime)
     finished_at = Column(DateTime)
+    # Fortsetzung nach Fehler: Instanz, deren Ergebnisse übernommen wurden
+    # (ohne Fremdschlüssel, die Vorgänger-Instanz kann inzwischen archiviert sein)
+    resumed_from_id = Column(Integer)
+
+    __table_args__ = (
+        # Instanzen eines Workflows nach Startzeit (status, Historie)
+        Index("ix_workflow_instances_workflow_started", "workflow_id", "started_at"),
+        # neueste Instanzen eines Workflows (latest_instances), ohne zusätzliche Sortierung
+        Index("ix_workflow_instances_workflow_id", "workflow_id", "id"),
+    )
+
+    @classmethod
+    def latest(cls, workflow_id):
+        # Instanzen eines Workflows, neueste zuerst; dieselbe Abfrage prüft db/migrations.hot_queries
+        return select(cls).where(cls.workflow_id == workflow_id).order_by(cls.id.desc())
 
 class ModuleRun(Base):
     __tablename__ = "module_runs"
@@ -61,15 +92,88 @@ class ModuleRun(Base):
     output_ref = Column(String(255))
     started_at = Column(DateTime)
     finished_at = Column(DateTime)
-    log = Column(JSON)
+    log = Column(JSON) # Altbestand, neue Logs liegen in module_run_log_chunks
+    parameters = Column(JSON) # Parameter dieses Laufs (bei Sweeps der jeweilige Parametersatz)
+    # Ressourcenverbrauch des Modul-Prozesses (os.wait4), leer bei Cache-Treffern
+    wall_time = Column(Float) # Sekunden
+    cpu_user = Column(Float) # Sekunden
+    cpu_system = Column(Float) # Sekunden
+    max_rss_kb = Column(BigInteger)
+    io_read_bytes = Column(BigInteger) # Block-I/O
+    io_write_bytes = Column(BigInteger)
+    ctx_voluntary = Column(BigInteger) # Kontextwechsel
+    ctx_involuntary = Column(BigInteger)
+    # Job-Warteschlange für Worker-Agenten (db/job_queue.py), leer bei lokaler Ausführung
+    job = Column(JSON) # {"inputs": [Artefakt-Hashes], "parameters": Parametersatz oder null}
+    worker = Column(String(255)) # Agent, der den Job ausführt bzw. ausgeführt hat
+    lease_until = Column(DateTime) # Claim läuft ab, wenn der Agent ihn nicht per Heartbeat verlängert
+    attempts = Column(Integer, default=0) # Anzahl Claims (> 1 nach Ausfall eines Agenten)
+    cancel_requested = Column(Boolean, default=False)
+    # Profil des Laufs (workflows/profiles.py): Artefakt-Hash einer pstats-Datei, "cprofile" oder "sample"
+    profile_ref = Column(String(64))
+    profile_mode = Column(String(16))
+
+    __table_args__ = (
+        Index("ix_module_runs_instance_step", "workflow_instance_id", "workflow_step_id"),
+        Index("ix_module_runs_step", "workflow_step_id"), # letzter Lauf je Step
+        Index("ix_module_runs_queue", "status", "lease_until"), # offene Jobs, abgelaufene Claims
+    )
+
+class ModuleRunLogChunk(Base):
+    # Append-only Log-Speicher: jeder Eintrag ist ein komprimierter Block von Log-Zeilen
+    __tablename__ = "module_run_log_chunks"
+    id = Column(Integer, primary_key=True)
+    module_run_id = Column(Integer, ForeignKey("module_runs.id"), nullable=False)
+    seq = Column(Integer, nullable=False) # fortlaufende Nummer je Run
+    first_line = Column(BigInteger, nullable=False) # Zeilen-Offset des ersten Eintrags
+    line_count = Column(Integer, nullable=False)
+    byte_offset = Column(BigInteger, nullable=False) # Offset im unkomprimierten Log
+    byte_count = Column(Integer, nullable=False)
+    data = Column(LargeBinary(length=16777215)) # zlib-komprimiert, Zeilen mit \n getrennt
+
+    __table_args__ = (
+        UniqueConstraint("module_run_id", "seq", name="uq_log_chunk_seq"),
+        Index("ix_log_chunk_lines", "module_run_id", "first_line"),
+    )
+
+class ArchivedInstance(Base):
+    # Index archivierter Workflow-Instanzen, der Inhalt liegt komprimiert in einer Datei (db/archive.py)
+    __tablename__ = "archived_instances"
+    id = Column(Integer, primary_key=True)
+    instance_id = Column(Integer, nullable=False) # frühere WorkflowInstance.id
+    workflow_id = Column(Integer, ForeignKey("workflows.id"))
+    status = Column(String(20))
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    run_count = Column(Integer)
+    path = Column(Text)
+    archived_at = Column(DateTime)
+
+    __table_args__ = (
+        Index("ix_archived_instances_workflow", "workflow_id", "instance_id"),
+        Index("ix_archived_instances_instance", "instance_id"),
+    )
+
+class SchemaMigration(Base):
+    # Angewendete Migrationen aus db/migrations.py
+    __tablename__ = "schema_migrations"
+    version = Column(Integer, primary_key=True, autoincrement=False)
+    description = Column(String(255))
+    applied_at = Column(DateTime, default=datetime.datetime.now)
 
 
-engine = create_engine("mysql+pymysql://user:@localhost:3306/workflows_db?charset=utf8mb4")
+# Verbindung und Pool aus db_config (Umgebungsvariablen WORKFLOWS_DB_* bzw. workflows.ini)
+db_config = load_db_config()
+engine = create_db_engine(db_config)
 SessionLocal = sessionmaker(bind=engine)
 
 def init_db():
     #Base.metadata.drop_all(engine) #zum löschen der aktuellen DB
+    # Neue Tabellen anlegen, bestehende per Migration auf den aktuellen Stand bringen
     Base.metadata.create_all(engine)
+    from db.migrations import migrate, check_schema
+    migrate(engine)
+    check_schema(engine) # Modelländerung ohne Migration: hier abbrechen statt später bei einer Abfrage
 
 if __name__ == "__main__":
     init_db()
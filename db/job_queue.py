@@ -0,0 +1,198 @@
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update, func
+
+from db.db_setup import engine, SessionLocal, ModuleRun
+
+# Job-Warteschlange in module_runs: ein Job ist ein ModuleRun mit status "pending" und
+# gesetztem job (Eingänge, Parametersatz). Worker-Agenten (workflows/agent.py) holen sich Jobs
+# per Claim, führen sie aus und verlängern den Claim per Heartbeat (lease_until). Stirbt ein
+# Agent, läuft der Claim ab und der Job wird wieder "pending" (requeue_expired).
+#
+# Claim: auf MariaDB/MySQL/PostgreSQL SELECT ... FOR UPDATE SKIP LOCKED, d.h. mehrere Agenten
+# greifen gleichzeitig zu, ohne aufeinander zu warten. SQLite kennt keine Zeilensperren und
+# serialisiert Schreiber ohnehin; dort wird jeder Kandidat per bedingtem UPDATE
+# (status = 'pending') übernommen, wer zuerst kommt, bekommt ihn.
+#
+# Uhrzeiten kommen von den beteiligten Rechnern (datetime.now()), die Uhren müssen also
+# synchron laufen (NTP); LEASE_SECONDS sollte deutlich über der möglichen Abweichung liegen.
+
+LEASE_SECONDS = float(os.environ.get("WORKFLOW_LEASE_SECONDS", "30"))
+MAX_ATTEMPTS = int(os.environ.get("WORKFLOW_JOB_ATTEMPTS", "3")) # danach gilt ein Job als fehlgeschlagen
+
+SKIP_LOCKED_DIALECTS = ("mysql", "mariadb", "postgresql")
+DONE_STATUS = ("finished", "failed", "cancelled", "timeout", "oom")
+
+runs = ModuleRun.__table__
+
+
+def enqueue(step, workflow_instance_id, inputs=None, parameters=None):
+    # Job für einen Step anlegen, Rückgabe: ModuleRun-ID
+    # parameters: Parametersatz statt step.parameters (Sweep), None = Parameter des Steps
+    session = SessionLocal()
+    try:
+        run = ModuleRun(
+            workflow_instance_id=workflow_instance_id,
+            workflow_step_id=step.id,
+            status="pending",
+            job={"inputs": list(inputs or []), "parameters": parameters},
+            attempts=0,
+            cancel_requested=False,
+        )
+        session.add(run)
+        session.commit()
+        return run.id
+    finally:
+        session.close()
+
+
+def claim_jobs(worker, limit=1, lease=LEASE_SECONDS, bind=None):
+    # Bis zu limit offene Jobs für diesen Agenten übernehmen, älteste zuerst; Rückgabe: [ModuleRun-ID]
+    bind = bind or engine
+    now = datetime.now()
+    values = {
+        "status": "running",
+        "worker": worker,
+        "lease_until": now + timedelta(seconds=lease),
+        "attempts": func.coalesce(runs.c.attempts, 0) + 1,
+    }
+    candidates = (
+        select(runs.c.id)
+        .where(runs.c.status == "pending", runs.c.job.isnot(None))
+        .order_by(runs.c.id)
+        .limit(limit)
+    )
+    if bind.dialect.name in SKIP_LOCKED_DIALECTS:
+        with bind.begin() as conn:
+            ids = list(conn.execute(candidates.with_for_update(skip_locked=True)).scalars())
+            if ids:
+                conn.execute(update(runs).where(runs.c.id.in_(ids)).values(**values))
+            return ids
+
+    claimed = []
+    with bind.connect() as conn:
+        # mehr Kandidaten lesen, als gebraucht werden: andere Agenten können schneller sein
+        ids = list(conn.execute(candidates.limit(limit * 4)).scalars())
+        conn.rollback()
+        for run_id in ids:
+            with conn.begin():
+                result = conn.execute(
+                    update(runs).where(runs.c.id == run_id, runs.c.status == "pending").values(**values))
+            if result.rowcount == 1:
+                claimed.append(run_id)
+                if len(claimed) >= limit:
+                    break
+    return claimed
+
+
+def heartbeat(worker, run_ids, lease=LEASE_SECONDS, bind=None):
+    # Claims verlängern; Rückgabe: (noch gehaltene IDs, davon abzubrechende IDs)
+    # Nicht mehr gehalten heißt: Claim abgelaufen und neu vergeben, der Agent muss den Job aufgeben
+    if not run_ids:
+        return set(), set()
+    bind = bind or engine
+    with bind.begin() as conn:
+        conn.execute(
+            update(runs)
+            .where(runs.c.id.in_(run_ids), runs.c.worker == worker, runs.c.status == "running")
+            .values(lease_until=datetime.now() + timedelta(seconds=lease))
+        )
+        rows = conn.execute(
+            select(runs.c.id, runs.c.cancel_requested)
+            .where(runs.c.id.in_(run_ids), runs.c.worker == worker, runs.c.status == "running")
+        ).all()
+    return {row.id for row in rows}, {row.id for row in rows if row.cancel_requested}
+
+
+def update_job(run_id, worker, bind=None, **values):
+    # Spalten eines Jobs setzen, nur solange der Agent ihn hält; Rückgabe: True, wenn gesetzt
+    return _update_held(run_id, worker, values, bind)
+
+
+def release_job(run_id, worker, bind=None):
+    # Job zurück in die Warteschlange (Agent wird beendet), der Versuch zählt nicht
+    values = {"status": "pending", "worker": None, "lease_until": None,
+              "attempts": func.coalesce(runs.c.attempts, 1) - 1}
+    return _update_held(run_id, worker, values, bind)
+
+
+def _update_held(run_id, worker, values, bind=None):
+    bind = bind or engine
+    with bind.begin() as conn:
+        result = conn.execute(
+            update(runs).where(runs.c.id == run_id, runs.c.worker == worker, runs.c.status == "running")
+            .values(**values)
+        )
+    return result.rowcount == 1
+
+
+def requeue_expired(max_attempts=MAX_ATTEMPTS, bind=None):
+    # Jobs mit abgelaufenem Claim (Agent tot oder hängt) wieder einreihen bzw. nach max_attempts
+    # Versuchen oder bei angefordertem Abbruch beenden; Rückgabe: [(ID, neuer Status, Agent)]
+    bind = bind or engine
+    now = datetime.now()
+    changed = []
+    with bind.begin() as conn:
+        rows = conn.execute(
+            select(runs.c.id, runs.c.worker, runs.c.attempts, runs.c.cancel_requested)
+            .where(runs.c.status == "running", runs.c.lease_until < now)
+        ).all()
+        for row in rows:
+            if row.cancel_requested:
+                values = {"status": "cancelled", "finished_at": now}
+            elif (row.attempts or 0) >= max_attempts:
+                values = {"status": "failed", "finished_at": now}
+            else:
+                values = {"status": "pending", "worker": None}
+            # Bedingung wiederholen: der Agent kann sich inzwischen zurückgemeldet haben
+            result = conn.execute(
+                update(runs)
+                .where(runs.c.id == row.id, runs.c.status == "running", runs.c.lease_until < now)
+                .values(lease_until=None, **values)
+            )
+            if result.rowcount == 1:
+                changed.append((row.id, values["status"], row.worker))
+    return changed
+
+
+def cancel_job(run_id, bind=None):
+    # Abbruch anfordern: offene Jobs sofort beenden, laufende bricht der Agent beim nächsten Heartbeat ab
+    bind = bind or engine
+    with bind.begin() as conn:
+        result = conn.execute(
+            update(runs).where(runs.c.id == run_id, runs.c.status == "pending")
+            .values(status="cancelled", finished_at=datetime.now(), cancel_requested=True)
+        )
+        if result.rowcount == 0:
+            conn.execute(update(runs).where(runs.c.id == run_id).values(cancel_requested=True))
+
+
+def job_state(run_id, bind=None):
+    # (Status, output_ref, Agent) eines Jobs
+    with (bind or engine).connect() as conn:
+        row = conn.execute(
+            select(runs.c.status, runs.c.output_ref, runs.c.worker).where(runs.c.id == run_id)
+        ).first()
+    if row is None:
+        return None, None, None
+    status = row.status.value if hasattr(row.status, "value") else row.status
+    return status, row.output_ref, row.worker
+
+
+def queue_counters(bind=None):
+    # Offene und laufende Jobs, laufende je Agent
+    with (bind or engine).connect() as conn:
+        pending = conn.execute(
+            select(func.count()).where(runs.c.status == "pending", runs.c.job.isnot(None))
+        ).scalar()
+        rows = conn.execute(
+            select(runs.c.worker, func.count(), func.min(runs.c.lease_until))
+            .where(runs.c.status == "running", runs.c.job.isnot(None))
+            .group_by(runs.c.worker)
+        ).all()
+    return {
+        "pending": pending,
+        "running": sum(count for _, count, _ in rows),
+        "workers": {worker: {"running": count, "lease_until": lease} for worker, count, lease in rows},
+    }
@@ -0,0 +1,202 @@
+import zlib
+
+from sqlalchemy import select, func, and_, null
+
+from db.db_setup import engine, ModuleRun, ModuleRunLogChunk
+
+# Obergrenzen pro Chunk (unkomprimiert)
+CHUNK_MAX_LINES = 5000
+CHUNK_MAX_BYTES = 256 * 1024
+# zlib-Stufe 1: etwa fünfmal schneller als 6 bei kaum schlechterer Kompression von Logs,
+# sonst begrenzt das Komprimieren den Log-Durchsatz (ältere Chunks bleiben lesbar)
+COMPRESS_LEVEL = 1
+
+chunks = ModuleRunLogChunk.__table__
+runs = ModuleRun.__table__
+
+
+def encode_lines(lines):
+    raw = "\n".join(lines).encode("utf-8", errors="replace")
+    return zlib.compress(raw, COMPRESS_LEVEL), len(raw)
+
+
+def decode_chunk(data):
+    if not data:
+        return []
+    return zlib.decompress(data).decode("utf-8", errors="replace").split("\n")
+
+
+class ChunkCursor:
+    # Merkt sich, wo der nächste Chunk eines Runs anschließt
+    def __init__(self, seq=0, line=0, byte=0):
+        self.seq = seq
+        self.line = line
+        self.byte = byte
+
+
+def load_cursor(conn, run_id):
+    row = conn.execute(
+        select(chunks.c.seq, chunks.c.first_line, chunks.c.line_count, chunks.c.byte_offset, chunks.c.byte_count)
+        .where(chunks.c.module_run_id == run_id)
+        .order_by(chunks.c.seq.desc())
+        .limit(1)
+    ).first()
+    if row is None:
+        return ChunkCursor()
+    # +1 Byte für den Zeilenumbruch zwischen zwei Chunks
+    return ChunkCursor(row.seq + 1, row.first_line + row.line_count, row.byte_offset + row.byte_count + 1)
+
+
+def split_batches(lines):
+    # Zeilen in Chunks aufteilen, die die Obergrenzen einhalten
+    batch, size = [], 0
+    for line in lines:
+        if batch and (len(batch) >= CHUNK_MAX_LINES or size + len(line) > CHUNK_MAX_BYTES):
+            yield batch
+            batch, size = [], 0
+        batch.append(line)
+        size += len(line) + 1
+    if batch:
+        yield batch
+
+
+def append_lines(conn, run_id, lines, cursor=None):
+    # Hängt Zeilen als neue Chunks an (kein Rewrite bestehender Daten)
+    # Gibt den fortgeschriebenen Cursor zurück; Transaktion verwaltet der Aufrufer
+    if cursor is None:
+        cursor = load_cursor(conn, run_id)
+    rows = []
+    for batch in split_batches(lines):
+        data, size = encode_lines(batch)
+        rows.append({
+            "module_run_id": run_id,
+            "seq": cursor.seq,
+            "first_line": cursor.line,
+            "line_count": len(batch),
+            "byte_offset": cursor.byte,
+            "byte_count": size,
+            "data": data,
+        })
+        cursor.seq += 1
+        cursor.line += len(batch)
+        cursor.byte += size + 1
+    if rows:
+        conn.execute(chunks.insert(), rows)
+    return cursor
+
+
+def line_count(run_id, bind=None):
+    with (bind or engine).connect() as conn:
+        return load_cursor(conn, run_id).line
+
+
+def tail_lines(run_id, n=100, bind=None):
+    # Die letzten n Zeilen, liest nur so viele Chunks wie nötig (rückwärts über seq)
+    result = []
+    with (bind or engine).connect() as conn:
+        rows = conn.execute(
+            select(chunks.c.data, chunks.c.line_count)
+            .where(chunks.c.module_run_id == run_id)
+            .order_by(chunks.c.seq.desc())
+            .execution_options(yield_per=16)
+        )
+        for row in rows:
+            result[:0] = decode_chunk(row.data)
+            if len(result) >= n:
+                break
+        rows.close()
+    return result[-n:] if n else []
+
+
+def read_range(run_id, start, count, bind=None):
+    # Zeilen [start, start+count) – für seitenweises Lesen sehr langer Logs
+    if count <= 0:
+        return []
+    end = start + count
+    result = []
+    with (bind or engine).connect() as conn:
+        # Chunk, in dem start liegt, plus alle folgenden bis end
+        first = conn.execute(
+            select(func.max(chunks.c.first_line))
+            .where(and_(chunks.c.module_run_id == run_id, chunks.c.first_line <= start))
+        ).scalar()
+        rows = conn.execute(
+            select(chunks.c.first_line, chunks.c.data)
+            .where(and_(
+                chunks.c.module_run_id == run_id,
+                chunks.c.first_line >= (first or 0),
+                chunks.c.first_line < end,
+            ))
+            .order_by(chunks.c.first_line)
+        )
+        for row in rows:
+            lines = decode_chunk(row.data)
+            lo = max(start - row.first_line, 0)
+            hi = min(end - row.first_line, len(lines))
+            result.extend(lines[lo:hi])
+    return result
+
+
+def new_lines(run_id, seq=0, bind=None):
+    # Zeilen aller Chunks ab seq (zum Mitlesen eines laufenden Logs), Rückgabe: (Zeilen, nächste seq)
+    result = []
+    with (bind or engine).connect() as conn:
+        rows = conn.execute(
+            select(chunks.c.seq, chunks.c.data)
+            .where(and_(chunks.c.module_run_id == run_id, chunks.c.seq >= seq))
+            .order_by(chunks.c.seq)
+        )
+        for row in rows:
+            result.extend(decode_chunk(row.data))
+            seq = row.seq + 1
+    return result, seq
+
+
+def iter_lines(run_id, bind=None):
+    # Gesamtes Log zeilenweise, ohne alles auf einmal in den Speicher zu laden
+    with (bind or engine).connect() as conn:
+        rows = conn.execute(
+            select(chunks.c.data)
+            .where(chunks.c.module_run_id == run_id)
+            .order_by(chunks.c.seq)
+            .execution_options(yield_per=16)
+        )
+        for row in rows:
+            yield from decode_chunk(row.data)
+
+
+def legacy_lines(text):
+    # Der alte Runner hat Zeilen mitsamt ihrem "\n" nochmals mit "\n" verbunden ("a\n\nb\n"):
+    # dann steht jede echte Zeile an gerader Position und dazwischen je ein leerer Eintrag
+    parts = text.split("\n")
+    if len(parts) > 1 and not any(parts[1::2]):
+        return parts[0::2]
+    if parts[-1] == "":
+        parts.pop()
+    return parts
+
+
+def migrate_legacy_logs(bind=None, batch_size=100):
+    # Überführt alte module_runs.log-Blobs in Chunks und leert die Spalte
+    bind = bind or engine
+    migrated = 0
+    while True:
+        with bind.begin() as conn:
+            rows = conn.execute(
+                select(runs.c.id, runs.c.log)
+                .where(runs.c.log.isnot(None))
+                .order_by(runs.c.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            for row in rows:
+                text = row.log if isinstance(row.log, str) else ("" if row.log is None else str(row.log))
+                if text:
+                    # Falls ein Run schon Chunks hat, werden die alten Zeilen davor nicht mehr eingefügt
+                    cursor = load_cursor(conn, row.id)
+                    if cursor.seq == 0:
+                        append_lines(conn, row.id, legacy_lines(text), cursor)
+                conn.execute(runs.update().where(runs.c.id == row.id).values(log=null()))
+                migrated += 1
+    return migrated
@@ -0,0 +1,371 @@
+import os
+import queue
+import tempfile
+import threading
+import time
+
+from db.db_setup import engine, ModuleRun
+from db.log_store import append_lines
+
+# Obergrenze für Log-Zeilen, die auf den Writer warten; darüber landen die Zeilen eines Runs in
+# einer temporären Datei (LogSpill), bis der Writer aufgeholt hat
+MAX_BUFFER_BYTES = int(float(os.environ.get("WORKFLOW_LOG_BUFFER_MB", "64")) * 1024 * 1024)
+SPILL_DIR = os.environ.get("WORKFLOW_LOG_SPILL_DIR") or None # None = Standard-Temp-Verzeichnis
+LINE_OVERHEAD = 56 # ungefährer Speicherbedarf einer Zeile ohne Inhalt (str-Objekt + Listeneintrag)
+SPILL_BLOCK = 1024 * 1024
+# Fehlgeschlagene Flushes (z.B. Lock-/Pool-Timeout) werden mit wachsendem Abstand wiederholt;
+# Log-Zeilen werden nach so vielen Fehlversuchen verworfen (gezählt), Status-Updates nie
+MAX_RETRIES = int(os.environ.get("WORKFLOW_LOG_RETRIES", "10"))
+RETRY_DELAY = 0.5 # Sekunden, verdoppelt sich je Fehlversuch
+MAX_RETRY_DELAY = 30.0
+# Endstatus eines Runs erst schreiben, wenn seine Zeilen in der DB sind: Leser (runner.run_queued,
+# GUI) hören beim Endstatus auf, das Log zu lesen
+TERMINAL_STATUS = ("finished", "failed", "cancelled", "timeout", "oom", "skipped")
+
+
+def is_terminal(values):
+    status = values.get("status")
+    return getattr(status, "value", status) in TERMINAL_STATUS
+
+
+def buffer_size(lines):
+    return sum(map(len, lines)) + LINE_OVERHEAD * len(lines)
+
+
+class LogSpill:
+    # Ausgelagerte Log-Zeilen eines Runs, UTF-8 mit "\n" getrennt
+    def __init__(self):
+        self.file = tempfile.TemporaryFile(prefix="workflow-log-", dir=SPILL_DIR)
+        self.size = 0
+        self.read_pos = 0 # bis hierher geschrieben, ein neuer Versuch setzt dort fort
+
+    def write(self, lines):
+        data = ("\n".join(lines) + "\n").encode("utf-8", errors="replace")
+        self.file.write(data)
+        self.size += len(data)
+
+    def batches(self):
+        # Zeilen ab read_pos blockweise zurücklesen; ein Block gilt erst als geschrieben, wenn der
+        # nächste angefordert wird
+        self.file.seek(self.read_pos)
+        rest = b""
+        for data in iter(lambda: self.file.read(SPILL_BLOCK), b""):
+            data = rest + data
+            cut = data.rfind(b"\n")
+            if cut < 0:
+                rest = data
+                continue
+            rest = data[cut + 1:]
+            yield data[:cut].decode("utf-8", errors="replace").split("\n")
+            self.read_pos += cut + 1
+
+    def remaining_lines(self):
+        self.file.seek(self.read_pos)
+        return sum(data.count(b"\n") for data in iter(lambda: self.file.read(SPILL_BLOCK), b""))
+
+    def close(self):
+        # Datei schließen (und damit löschen)
+        self.file.close()
+
+
+class LogWriter(threading.Thread):
+    # Write-Behind-Schreiber: sammelt Log-Zeilen und Status-Änderungen aller
+    # laufenden Threads und schreibt sie gebündelt über eine eigene Verbindung
+    def __init__(self, bind=None, max_batch=1000, flush_interval=0.25, max_batch_bytes=4 * 1024 * 1024,
+                 max_buffer=MAX_BUFFER_BYTES):
+        super().__init__(name="LogWriter", daemon=True)
+        self.bind = bind if bind is not None else engine
+        self.max_batch = max_batch # Flush spätestens nach so vielen Einträgen
+        self.max_batch_bytes = max_batch_bytes # ... oder so vielen Bytes Log-Zeilen
+        self.flush_interval = flush_interval # ... oder nach so vielen Sekunden
+        self.max_buffer = max_buffer # Log-Zeilen im Speicher, darüber LogSpill
+        self._queue = queue.Queue()
+        self._cursors = {} # run_id -> ChunkCursor (nur solange der Run läuft)
+        self._buffer_lock = threading.Lock()
+        self._buffered = 0 # Bytes Log-Zeilen in der Queue bzw. noch nicht geschrieben
+        self._spills = {} # run_id -> LogSpill, solange die Zeilen des Runs ausgelagert werden
+
+        # Zähler für Monitoring
+        self._stats_lock = threading.Lock()
+        self._flushes = 0
+        self._lines = 0
+        self._statements = 0
+        self._last_flush_ms = 0.0
+        self._max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+        self._spill_count = 0
+        self._spilled_bytes = 0
+        self._failures = 0 # Fehlversuche in Folge
+        self._retries = 0
+        self._dropped_lines = 0
+        self._pending_statuses = 0
+
+    # --- API für die Run-Threads (nicht blockierend) ---
+
+    def append_log(self, run_id, line):
+        self.append_lines(run_id, [line])
+
+    def append_lines(self, run_id, lines):
+        # Zeilen eines gelesenen Blocks als ein Eintrag. Ist der Puffer voll, gehen die Zeilen des
+        # Runs in eine Datei, bis der Writer sie übernimmt (Reihenfolge bleibt erhalten)
+        size = buffer_size(lines)
+        with self._buffer_lock:
+            spill = self._spills.get(run_id)
+            if spill is None and self._buffered + size <= self.max_buffer:
+                self._buffered += size
+                self._queue.put(("log", run_id, lines))
+                return
+            if spill is None:
+                spill = self._spills[run_id] = LogSpill()
+                self._queue.put(("spill", run_id, None))
+            spill.write(lines)
+
+    def set_status(self, run_id, **values):
+        self._queue.put(("status", run_id, values))
+
+    def finish_run(self, run_id, wait=True, **values):
+        # Endstatus setzen und sofort flushen (einmal pro Step)
+        self._queue.put(("status", run_id, values))
+        self._queue.put(("release", run_id, None))
+        self.flush(wait)
+
+    def release(self, run_id, wait=True):
+        # Run ist hier fertig, Status schreibt jemand anderes (Worker-Agent per bedingtem UPDATE)
+        self._queue.put(("release", run_id, None))
+        self.flush(wait)
+
+    def flush(self, wait=True):
+        done = threading.Event()
+        self._queue.put(("flush", None, done))
+        if wait and self.is_alive():
+            done.wait()
+
+    def stop(self):
+        done = threading.Event()
+        self._queue.put(("stop", None, done))
+        if self.is_alive():
+            done.wait()
+
+    def counters(self):
+        with self._buffer_lock:
+            buffered = self._buffered
+            spilling = sum(spill.size for spill in self._spills.values())
+        with self._stats_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "buffered_bytes": buffered,
+                "spilling_bytes": spilling,
+                "spills": self._spill_count,
+                "spilled_bytes": self._spilled_bytes,
+                "retries": self._retries,
+                "dropped_lines": self._dropped_lines,
+                "pending_statuses": self._pending_statuses,
+                "flushes": self._flushes,
+                "lines_written": self._lines,
+                "statements": self._statements,
+                "last_flush_ms": round(self._last_flush_ms, 3),
+                "max_flush_ms": round(self._max_flush_ms, 3),
+                "avg_flush_ms": round(self._total_flush_ms / self._flushes, 3) if self._flushes else 0.0,
+            }
+
+    # --- Writer-Thread ---
+
+    def run(self):
+        conn = self.bind.connect()
+        # run_id -> Log-Segmente in Reihenfolge: Zeilen-Listen aus dem Speicher, LogSpill oder
+        # None (Platzhalter für eine Auslagerung, die beim Flush übernommen wird)
+        pending_logs = {}
+        pending_status = {} # run_id -> Spalten-Updates
+        pending_bytes = 0
+        released = []
+        waiters = []
+        count = 0
+        deadline = None
+        retry_at = None # nach einem Fehler: frühester nächster Versuch
+        running = True
+
+        try:
+            while running:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    kind, run_id, payload = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    kind = None
+
+                if kind == "log":
+                    segments = pending_logs.setdefault(run_id, [])
+                    if segments and isinstance(segments[-1], list):
+                        segments[-1].extend(payload)
+                    else:
+                        segments.append(list(payload))
+                    pending_bytes += buffer_size(payload)
+                    count += 1
+                elif kind == "spill":
+                    pending_logs.setdefault(run_id, []).append(None)
+                    count += 1
+                elif kind == "status":
+                    pending_status.setdefault(run_id, {}).update(payload)
+                    count += 1
+                elif kind == "release":
+                    released.append(run_id)
+                elif kind in ("flush", "stop"):
+                    waiters.append(payload)
+                    running = kind != "stop"
+
+                if count and deadline is None:
+                    deadline = retry_at or time.monotonic() + self.flush_interval
+
+                now = time.monotonic()
+                due = (waiters or count >= self.max_batch or pending_bytes >= self.max_batch_bytes
+                       or (deadline is not None and now >= deadline))
+                # Während der Wartezeit nach einem Fehler nur beim Beenden vorzeitig versuchen
+                if due and (retry_at is None or now >= retry_at or not running):
+                    # Ausgelagerte Zeilen übernehmen; danach kommen neue Zeilen des Runs wieder über die Queue
+                    with self._buffer_lock:
+                        for rid, segments in pending_logs.items():
+                            if None in segments:
+                                segments[segments.index(None)] = self._spills.pop(rid, None)
+                                segments[:] = [segment for segment in segments if segment is not None]
+                    if count and self._flush(conn, pending_logs, pending_status):
+                        self._failures = 0
+                        retry_at = None
+                    elif count:
+                        self._failures += 1
+                        if self._failures >= MAX_RETRIES or not running:
+                            self._drop_logs(pending_logs)
+                            # zurückgehaltene Endstatus haben jetzt keine offenen Zeilen mehr
+                            if pending_status and self._flush(conn, pending_logs, pending_status):
+                                self._failures = 0
+                        retry_at = time.monotonic() + min(RETRY_DELAY * 2 ** (self._failures - 1), MAX_RETRY_DELAY)
+                    with self._buffer_lock:
+                        remaining = sum(buffer_size(segment) for segments in pending_logs.values()
+                                        for segment in segments if isinstance(segment, list))
+                        self._buffered -= pending_bytes - remaining
+                    pending_bytes = remaining
+                    # Cursor nur für Runs ohne offene Zeilen freigeben
+                    still_pending = [rid for rid in released if rid in pending_logs]
+                    for rid in released:
+                        if rid not in pending_logs:
+                            self._cursors.pop(rid, None)
+                    released = still_pending
+                    count = len(pending_logs) + len(pending_status)
+                    deadline = retry_at if count else None
+                    with self._stats_lock:
+                        self._pending_statuses = len(pending_status)
+                # Wartende werden auch nach einem Fehlversuch geweckt, offene Daten folgen mit dem
+                # nächsten Versuch
+                if due:
+                    for ev in waiters:
+                        ev.set()
+                    waiters = []
+        finally:
+            conn.close()
+            if pending_status:
+                print(f"LogWriter: {len(pending_status)} Status-Updates beim Beenden nicht geschrieben")
+
+    def _flush(self, conn, pending_logs, pending_status):
+        # Log-Zeilen und Status in getrennten Transaktionen; ein Endstatus wird aber zurückgehalten,
+        # solange der Run noch offene Zeilen hat (sonst stünde er vor dem Ende des Logs in der DB).
+        # Zeilen aus dem Speicher in einer Transaktion, ausgelagerte Zeilen je Block
+        # (die Datenbank bleibt dazwischen für andere Schreiber frei). Geschriebenes wird aus
+        # pending_logs/pending_status entfernt, der Rest bleibt für den nächsten Versuch.
+        # Rückgabe: ob alles geschrieben wurde
+        start = time.perf_counter()
+        table = ModuleRun.__table__
+        statements = 0
+        lines = 0
+        spilled = 0
+        spilled_bytes = 0
+        ok = True
+        try:
+            # Zuerst die Zeilen aus dem Speicher, die jeweils vor allem Ausgelagerten liegen
+            with conn.begin():
+                for run_id, segments in pending_logs.items():
+                    if segments and isinstance(segments[0], list):
+                        self._cursors[run_id] = append_lines(conn, run_id, segments[0], self._cursors.get(run_id))
+                        statements += 1
+            for run_id, segments in pending_logs.items():
+                if segments and isinstance(segments[0], list):
+                    lines += len(segments.pop(0))
+            for run_id in [rid for rid, segments in pending_logs.items() if not segments]:
+                del pending_logs[run_id]
+            for run_id, segments in list(pending_logs.items()):
+                while segments:
+                    segment = segments[0]
+                    if isinstance(segment, list):
+                        with conn.begin():
+                            self._cursors[run_id] = append_lines(conn, run_id, segment, self._cursors.get(run_id))
+                        lines += len(segment)
+                        statements += 1
+                    else:
+                        for batch in segment.batches():
+                            with conn.begin():
+                                self._cursors[run_id] = append_lines(conn, run_id, batch, self._cursors.get(run_id))
+                            lines += len(batch)
+                            statements += 1
+                        spilled += 1
+                        spilled_bytes += segment.size
+                        segment.close()
+                    segments.pop(0)
+                del pending_logs[run_id]
+        except Exception as e:
+            # Cursor verwerfen, beim nächsten Versuch wird er aus der DB neu gelesen
+            self._cursors.clear()
+            print(f"LogWriter: Log-Flush fehlgeschlagen ({self._failures + 1}. Versuch): {e}")
+            ok = False
+
+        try:
+            ready = [run_id for run_id, values in pending_status.items()
+                     if run_id not in pending_logs or not is_terminal(values)]
+            if ready:
+                with conn.begin():
+                    for run_id in ready:
+                        conn.execute(table.update().where(table.c.id == run_id).values(**pending_status[run_id]))
+                        statements += 1
+                for run_id in ready:
+                    del pending_status[run_id]
+        except Exception as e:
+            print(f"LogWriter: Status-Flush fehlgeschlagen ({self._failures + 1}. Versuch): {e}")
+            ok = False
+
+        elapsed = (time.perf_counter() - start) * 1000
+        with self._stats_lock:
+            self._flushes += 1
+            self._lines += lines
+            self._statements += statements
+            self._last_flush_ms = elapsed
+            self._max_flush_ms = max(self._max_flush_ms, elapsed)
+            self._total_flush_ms += elapsed
+            self._spill_count += spilled
+            self._spilled_bytes += spilled_bytes
+            self._retries += not ok
+        return ok
+
+    def _drop_logs(self, pending_logs):
+        # Nach zu vielen Fehlversuchen (oder beim Beenden) offene Log-Zeilen verwerfen und zählen
+        dropped = 0
+        for segments in pending_logs.values():
+            for segment in segments:
+                if isinstance(segment, list):
+                    dropped += len(segment)
+                elif segment is not None:
+                    dropped += segment.remaining_lines()
+                    segment.close()
+        if dropped:
+            print(f"LogWriter: {dropped} Log-Zeilen nach {self._failures} Fehlversuchen verworfen")
+        pending_logs.clear()
+        with self._stats_lock:
+            self._dropped_lines += dropped
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_log_writer():
+    # Ein gemeinsamer Writer für den ganzen Prozess
+    global _writer
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = LogWriter()
+            _writer.start()
+        return _writer
@@ -0,0 +1,276 @@
+import argparse
+import sys
+
+from sqlalchemy import inspect, select, func, text
+
+from db.db_setup import engine, Base, Module, Workflow, WorkflowStep, WorkflowInstance, ModuleRun, ModuleRunLogChunk, ArchivedInstance, SchemaMigration
+
+# Versionierte Schema-Migrationen. init_db() legt fehlende Tabellen mit create_all an und
+# ruft danach migrate() auf. Jede Migration prüft selbst, was schon vorhanden ist, und kann
+# daher auf neuen wie alten Datenbanken laufen (MariaDB committet DDL sofort, eine
+# abgebrochene Migration wird beim nächsten Aufruf einfach fortgesetzt).
+#
+#   python -m db.migrations            # Stand anzeigen
+#   python -m db.migrations upgrade    # ausstehende Migrationen anwenden
+#   python -m db.migrations plans      # Query-Pläne der häufigen Abfragen prüfen
+
+MIGRATIONS = [] # (version, Beschreibung, Funktion(bind))
+
+
+def migration(version, description):
+    def register(fn):
+        MIGRATIONS.append((version, description, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return register
+
+
+# --- Hilfsfunktionen für Migrationen ---
+
+def add_columns(bind, model, *names):
+    # Spalten aus dem Modell ergänzen, falls sie fehlen; skalare Defaults für bestehende Zeilen setzen
+    table = model.__table__
+    existing = {c["name"] for c in inspect(bind).get_columns(table.name)}
+    with bind.begin() as conn:
+        for name in names:
+            if name in existing:
+                continue
+            column = table.c[name]
+            column_type = column.type.compile(dialect=conn.dialect)
+            conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {name} {column_type}"))
+            if column.default is not None and column.default.is_scalar:
+                conn.execute(table.update().where(column.is_(None)).values({name: column.default.arg}))
+
+
+def create_indexes(bind, model):
+    # Alle im Modell deklarierten Indizes anlegen, die noch fehlen; Indizes auf Spalten, die erst eine
+    # spätere Migration ergänzt, legt deren create_indexes an
+    table = model.__table__
+    inspector = inspect(bind)
+    existing = {ix["name"] for ix in inspector.get_indexes(table.name)}
+    columns = {c["name"] for c in inspector.get_columns(table.name)}
+    for index in table.indexes:
+        if index.name not in existing and all(column.name in columns for column in index.columns):
+            index.create(bind)
+
+
+def extend_enum(bind, model, name):
+    # Neue Enum-Werte: MariaDB/MySQL speichern die erlaubten Werte in der Spalte,
+    # PostgreSQL im Typ; SQLite prüft sie nicht
+    column = model.__table__.c[name]
+    dialect = bind.dialect.name
+    with bind.begin() as conn:
+        if dialect in ("mysql", "mariadb"):
+            column_type = column.type.compile(dialect=conn.dialect)
+            conn.execute(text(f"ALTER TABLE {model.__tablename__} MODIFY COLUMN {name} {column_type}"))
+        elif dialect == "postgresql":
+            for value in column.type.enums:
+                conn.execute(text(f"ALTER TYPE {column.type.name} ADD VALUE IF NOT EXISTS '{value}'"))
+
+
+# --- Migrationen (nur anhängen, nie umnummerieren) ---
+
+@migration(1, "Logs aus module_runs.log in module_run_log_chunks überführen")
+def _legacy_logs(bind):
+    from db.log_store import migrate_legacy_logs
+    migrate_legacy_logs(bind)
+
+
+@migration(2, "modules.backend (Warm-Pool)")
+def _module_backend(bind):
+    add_columns(bind, Module, "backend")
+
+
+@migration(3, "workflows.max_parallel, pipeline, priority")
+def _workflow_execution(bind):
+    add_columns(bind, Workflow, "max_parallel", "pipeline", "priority")
+
+
+@migration(4, "Zeit-/Ressourcengrenzen und Status cancelled/timeout/oom")
+def _limits(bind):
+    add_columns(bind, Module, "timeout", "cpu_limit", "memory_limit_mb")
+    extend_enum(bind, WorkflowInstance, "status")
+    extend_enum(bind, ModuleRun, "status")
+
+
+@migration(5, "Ressourcenverbrauch in module_runs")
+def _usage(bind):
+    add_columns(bind, ModuleRun, "wall_time", "cpu_user", "cpu_system", "max_rss_kb",
+                "io_read_bytes", "io_write_bytes", "ctx_voluntary", "ctx_involuntary")
+
+
+@migration(6, "Indizes für Instanz-, Step- und Modul-Run-Abfragen")
+def _indexes(bind):
+    for model in (WorkflowStep, WorkflowInstance, ModuleRun, ModuleRunLogChunk):
+        create_indexes(bind, model)
+
+
+@migration(7, "Archiv-Index archived_instances")
+def _archive_index(bind):
+    ArchivedInstance.__table__.create(bind, checkfirst=True)
+    create_indexes(bind, ArchivedInstance)
+
+
+@migration(8, "workflow_instances.resumed_from_id (Fortsetzen nach Fehler)")
+def _resume(bind):
+    add_columns(bind, WorkflowInstance, "resumed_from_id")
+
+
+@migration(9, "module_runs.parameters (Parameter-Sweeps)")
+def _run_parameters(bind):
+    add_columns(bind, ModuleRun, "parameters")
+
+
+@migration(10, "Job-Warteschlange in module_runs (Worker-Agenten)")
+def _job_queue(bind):
+    add_columns(bind, ModuleRun, "job", "worker", "lease_until", "attempts", "cancel_requested")
+    create_indexes(bind, ModuleRun)
+
+
+@migration(11, "module_runs.profile_ref, profile_mode (Profiling)")
+def _profiles(bind):
+    add_columns(bind, ModuleRun, "profile_ref", "profile_mode")
+
+
+@migration(12, "Index auf workflow_instances (workflow_id, id) für die letzte Instanz")
+def _latest_instance_index(bind):
+    create_indexes(bind, WorkflowInstance)
+
+
+# --- Runner ---
+
+def applied_versions(bind=None):
+    bind = bind or engine
+    SchemaMigration.__table__.create(bind, checkfirst=True)
+    with bind.connect() as conn:
+        return set(conn.execute(select(SchemaMigration.version)).scalars())
+
+
+def migrate(bind=None, target=None):
+    # Ausstehende Migrationen bis einschließlich target anwenden, Rückgabe: angewendete Versionen
+    bind = bind or engine
+    done = applied_versions(bind)
+    applied = []
+    for version, description, fn in MIGRATIONS:
+        if version in done or (target is not None and version > target):
+            continue
+        fn(bind)
+        with bind.begin() as conn:
+            conn.execute(SchemaMigration.__table__.insert().values(version=version, description=description))
+        print(f"Migration {version}: {description}")
+        applied.append(version)
+    return applied
+
+
+def schema_drift(bind=None):
+    # Tabellen/Spalten des Modells, die in der Datenbank fehlen. Nach migrate() leer; sonst fehlt
+    # zu einer Modelländerung die Migration (die Anwendung würde erst bei der ersten Abfrage scheitern)
+    bind = bind or engine
+    inspector = inspect(bind)
+    tables = set(inspector.get_table_names())
+    missing = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in tables:
+            missing.append(table.name)
+            continue
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        missing.extend(f"{table.name}.{column.name}" for column in table.columns if column.name not in existing)
+    return missing
+
+
+def check_schema(bind=None):
+    missing = schema_drift(bind)
+    if missing:
+        raise RuntimeError(f"Datenbank-Schema unvollständig, Migration fehlt für: {', '.join(missing)}")
+
+
+# --- Query-Pläne ---
+
+def hot_queries():
+    # (Name, erwarteter Index, Abfrage) der Zugriffe, die bei jedem Lauf bzw. GUI-Refresh passieren
+    return [
+        ("letzte Instanz eines Workflows", "ix_workflow_instances_workflow_id",
+         WorkflowInstance.latest(1).limit(1)),
+        ("Steps eines Workflows", "ix_workflow_steps_workflow_position",
+         select(WorkflowStep.id).where(WorkflowStep.workflow_id == 1).order_by(WorkflowStep.position)),
+        ("Modul-Runs einer Instanz/eines Steps", "ix_module_runs_instance_step",
+         select(ModuleRun.id).where(ModuleRun.workflow_instance_id == 1, ModuleRun.workflow_step_id == 1)),
+        ("letzter Modul-Run je Step", "ix_module_runs_step",
+         select(func.max(ModuleRun.id)).where(ModuleRun.workflow_step_id == 1)),
+        ("abgelaufene Claims der Job-Warteschlange", "ix_module_runs_queue",
+         select(ModuleRun.id).where(ModuleRun.status == "running", ModuleRun.lease_until < func.now())),
+        ("Log-Chunks eines Runs", "ix_log_chunk_lines",
+         select(ModuleRunLogChunk.id).where(ModuleRunLogChunk.module_run_id == 1, ModuleRunLogChunk.first_line <= 0)
+         .order_by(ModuleRunLogChunk.first_line.desc()).limit(1)),
+    ]
+
+
+def explain(conn, query):
+    # Plan als Text, die Namen der benutzten Indizes und ob zusätzlich sortiert wird
+    # (Index passt dann nicht zum ORDER BY)
+    sql = str(query.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        rows = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()
+        plan = [row[-1] for row in rows]
+        used = {word for line in plan for word in line.split() if word.startswith(("ix_", "uq_"))}
+        sorts = any("TEMP B-TREE" in line for line in plan)
+    elif dialect in ("mysql", "mariadb"):
+        rows = conn.execute(text(f"EXPLAIN {sql}")).mappings().all()
+        plan = [f"{row['table']}: key={row['key']} rows={row['rows']} {row['Extra'] or ''}".rstrip() for row in rows]
+        used = {row["key"] for row in rows if row["key"]}
+        sorts = any("filesort" in (row["Extra"] or "") for row in rows)
+    else:
+        rows = conn.execute(text(f"EXPLAIN {sql}")).all()
+        plan = [row[0] for row in rows]
+        used = {word for line in plan for word in line.split() if word.startswith(("ix_", "uq_"))}
+        sorts = any(line.lstrip(" ->").startswith(("Sort", "Incremental Sort")) for line in plan)
+    return plan, used, sorts
+
+
+def check_query_plans(bind=None):
+    # Rückgabe: [(Name, erwarteter Index, benutzt (ohne Extra-Sortierung)?, Plan)]
+    bind = bind or engine
+    results = []
+    with bind.connect() as conn:
+        for name, index, query in hot_queries():
+            plan, used, sorts = explain(conn, query)
+            results.append((name, index, index in used and not sorts, plan))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m db.migrations", description="Schema-Migrationen")
+    parser.add_argument("command", nargs="?", default="status", choices=("status", "upgrade", "plans"))
+    parser.add_argument("--target", type=int, help="upgrade: nur bis zu dieser Version")
+    args = parser.parse_args(argv)
+
+    if args.command == "upgrade":
+        Base.metadata.create_all(engine)
+        applied = migrate(engine, args.target)
+        print(f"{len(applied)} Migration(en) angewendet" if applied else "Schema ist aktuell")
+        missing = schema_drift(engine) if args.target is None else []
+        if missing:
+            print(f"Fehlende Spalten ohne Migration: {', '.join(missing)}", file=sys.stderr)
+            return 1
+        return 0
+
+    if args.command == "plans":
+        failed = 0
+        for name, index, ok, plan in check_query_plans(engine):
+            print(f"[{'OK' if ok else 'FEHLT'}] {name} ({index})")
+            for line in plan:
+                print(f"       {line}")
+            failed += not ok
+        return 1 if failed else 0
+
+    done = applied_versions(engine)
+    for version, description, _ in MIGRATIONS:
+        print(f"{'x' if version in done else ' '} {version:3} {description}")
+    for name in schema_drift(engine):
+        print(f"  fehlt: {name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,448 @@
+import threading
+import weakref
+from collections import namedtuple
+
+from sqlalchemy import inspect, update, case
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.attributes import set_committed_value
+
+from db.db_setup import SessionLocal, Workflow, WorkflowStep, Module
+
+# Gemeinsamer Cache für Workflows, Steps und Module im GUI-Prozess.
+# Jede Zeile existiert genau einmal als vom Session-Kontext gelöstes Objekt (Identity Map):
+# alle offenen Tabs halten dieselben Objekte, step.module zeigt auf das gecachte Modul.
+# Schreibzugriffe laufen über das Repository, aktualisieren die Objekte an Ort und Stelle,
+# erhöhen die Version der geänderten Zeilen und benachrichtigen die Listener mit einem Change.
+# Änderungen von außen (CLI, anderer Rechner) werden erst nach invalidate() sichtbar.
+
+# kind: "workflow" | "step" | "module", action: "added" | "updated" | "removed" | "invalidated"
+# ids: geänderte Zeilen (leer bei "invalidated" ohne ids = alle), workflow_id: Workflow der Steps
+Change = namedtuple("Change", "kind action ids workflow_id")
+
+# Positionen der Steps sind nur Sortierschlüssel mit Lücken: neue Steps bekommen
+# letzte Position + POSITION_GAP, verschobene Steps die Mitte zwischen ihren Nachbarn.
+# Einfügen, Löschen und Verschieben ändern so genau eine Zeile; erst wenn zwischen zwei
+# Nachbarn kein Platz mehr ist, wird der Workflow in einer Anweisung neu verteilt.
+# Ältere Workflows mit Positionen 1..n funktionieren unverändert (erste Verschiebung verteilt neu).
+POSITION_GAP = 1024
+
+
+def _copy_columns(target, source):
+    # Spaltenwerte übernehmen, ohne das gecachte Objekt als geändert zu markieren
+    for column in inspect(type(target)).column_attrs:
+        set_committed_value(target, column.key, getattr(source, column.key))
+
+
+class Repository:
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+        self._lock = threading.RLock()
+        self._workflows = {} # workflow_id -> Workflow (ohne Steps)
+        self._workflow_names = {} # Name -> workflow_id
+        self._steps = {} # step_id -> WorkflowStep
+        self._workflow_steps = {} # workflow_id -> [step_id] nach Position
+        self._modules = {} # module_id -> Module
+        self._all_modules = False # alle Module geladen?
+        self._versions = {} # (kind, id) -> Version, steigt bei jeder Änderung
+        self._listeners = []
+        self.queries = 0 # DB-Zugriffe (Lesen + Schreiben), für Statistik/Benchmarks
+
+    # --- Versionen und Benachrichtigungen ---
+
+    def version(self, kind, id):
+        return self._versions.get((kind, id), 0)
+
+    def subscribe(self, callback):
+        # Gebundene Methoden werden nur schwach referenziert, geschlossene Tabs fallen so heraus
+        ref = weakref.WeakMethod(callback) if hasattr(callback, "__self__") else (lambda: callback)
+        with self._lock:
+            self._listeners.append(ref)
+
+    def unsubscribe(self, callback):
+        # Entfernt auch Listener, deren Objekt nicht mehr existiert
+        with self._lock:
+            self._listeners = [ref for ref in self._listeners if ref() is not None and ref() != callback]
+
+    def _changed(self, kind, action, ids, workflow_id=None):
+        with self._lock:
+            for id in ids:
+                self._versions[(kind, id)] = self.version(kind, id) + 1
+            listeners = list(self._listeners)
+        change = Change(kind, action, tuple(ids), workflow_id)
+        for ref in listeners:
+            callback = ref()
+            if callback is None:
+                self.unsubscribe(None)
+                continue
+            try:
+                callback(change)
+            except RuntimeError as e:
+                # Qt-Objekt wurde bereits gelöscht
+                if "deleted" not in str(e):
+                    raise
+                self.unsubscribe(callback)
+
+    def invalidate(self, kind=None, ids=None):
+        # Cache verwerfen (alles oder einzelne Zeilen), z. B. nach Änderungen von außen.
+        # Listener laden daraufhin neu; Objekte, die sie noch halten, bleiben gültig, aber veraltet.
+        with self._lock:
+            if kind in (None, "workflow"):
+                for id in (ids if ids is not None else list(self._workflows)):
+                    workflow = self._workflows.pop(id, None)
+                    if workflow is not None:
+                        self._workflow_names.pop(workflow.name, None)
+                    self._workflow_steps.pop(id, None)
+            if kind in (None, "step"):
+                for id in (ids if ids is not None else list(self._steps)):
+                    step = self._steps.pop(id, None)
+                    if step is not None:
+                        self._workflow_steps.pop(step.workflow_id, None)
+            if kind in (None, "module"):
+                for id in (ids if ids is not None else list(self._modules)):
+                    self._modules.pop(id, None)
+                self._all_modules = False
+            if kind is None:
+                self._workflow_names.clear()
+                self._workflow_steps.clear()
+        for k in (("workflow", "step", "module") if kind is None else (kind,)):
+            self._changed(k, "invalidated", ids or ())
+
+    # --- Lesen ---
+
+    def _session(self):
+        self.queries += 1
+        return self.session_factory()
+
+    def _module(self, module):
+        # Modul in die Identity Map aufnehmen; vorhandenes Objekt behalten
+        cached = self._modules.get(module.id)
+        if cached is None:
+            self._modules[module.id] = cached = module
+        return cached
+
+    def _step(self, step):
+        cached = self._steps.get(step.id)
+        if cached is None:
+            self._steps[step.id] = cached = step
+        else:
+            _copy_columns(cached, step)
+        set_committed_value(cached, "module", self._module(step.module) if step.module is not None else None)
+        return cached
+
+    def _workflow(self, workflow):
+        cached = self._workflows.get(workflow.id)
+        if cached is None:
+            self._workflows[workflow.id] = cached = workflow
+        else:
+            _copy_columns(cached, workflow)
+        self._workflow_names[cached.name] = cached.id
+        return cached
+
+    def _load_steps(self, workflow_id):
+        session = self._session()
+        try:
+            steps = (
+                session.query(WorkflowStep)
+                .options(joinedload(WorkflowStep.module))
+                .filter_by(workflow_id=workflow_id)
+                .order_by(WorkflowStep.position)
+                .all()
+            )
+            session.expunge_all()
+        finally:
+            session.close()
+        self._workflow_steps[workflow_id] = [self._step(step).id for step in steps]
+
+    def workflow(self, name_or_id):
+        # Workflow (Spalten, ohne Steps) nach ID oder Name; None, wenn es ihn nicht gibt
+        with self._lock:
+            if isinstance(name_or_id, int):
+                workflow_id = name_or_id
+            else:
+                workflow_id = self._workflow_names.get(name_or_id)
+            if workflow_id in self._workflows:
+                return self._workflows[workflow_id]
+
+            session = self._session()
+            try:
+                if workflow_id is not None:
+                    workflow = session.get(Workflow, workflow_id)
+                else:
+                    workflow = session.query(Workflow).filter_by(name=name_or_id).first()
+                if workflow is None:
+                    return None
+                session.expunge(workflow)
+            finally:
+                session.close()
+            return self._workflow(workflow)
+
+    def steps(self, workflow_id):
+        # Steps eines Workflows nach Position, step.module ist geladen
+        with self._lock:
+            if workflow_id not in self._workflow_steps:
+                self._load_steps(workflow_id)
+            return [self._steps[id] for id in self._workflow_steps[workflow_id]]
+
+    def step(self, step_id):
+        with self._lock:
+            step = self._steps.get(step_id)
+            if step is None:
+                session = self._session()
+                try:
+                    step = session.get(WorkflowStep, step_id, options=[joinedload(WorkflowStep.module)])
+                    if step is None:
+                        return None
+                    session.expunge_all()
+                finally:
+                    session.close()
+                step = self._step(step)
+            return step
+
+    def module(self, module_id):
+        with self._lock:
+            module = self._modules.get(module_id)
+            if module is None:
+                session = self._session()
+                try:
+                    module = session.get(Module, module_id)
+                    if module is None:
+                        return None
+                    session.expunge(module)
+                finally:
+                    session.close()
+                module = self._module(module)
+            return module
+
+    def modules(self):
+        # Alle Module nach Name; nach dem ersten Aufruf aus dem Cache
+        with self._lock:
+            if not self._all_modules:
+                session = self._session()
+                try:
+                    modules = session.query(Module).all()
+                    session.expunge_all()
+                finally:
+                    session.close()
+                for module in modules:
+                    _copy_columns(self._module(module), module)
+                self._all_modules = True
+            return sorted(self._modules.values(), key=lambda m: m.name or "")
+
+    # --- Schreiben ---
+
+    def create_workflow(self, name):
+        session = self._session()
+        try:
+            workflow = Workflow(name=name)
+            session.add(workflow)
+            session.commit()
+            session.refresh(workflow)
+            session.expunge(workflow)
+        finally:
+            session.close()
+        with self._lock:
+            workflow = self._workflow(workflow)
+            self._workflow_steps[workflow.id] = []
+        self._changed("workflow", "added", [workflow.id])
+        return workflow
+
+    def update_workflow(self, workflow_id, **values):
+        session = self._session()
+        try:
+            workflow = session.get(Workflow, workflow_id)
+            for key, value in values.items():
+                setattr(workflow, key, value)
+            session.commit()
+            session.refresh(workflow)
+            session.expunge(workflow)
+        finally:
+            session.close()
+        with self._lock:
+            workflow = self._workflow(workflow)
+        self._changed("workflow", "updated", [workflow_id])
+        return workflow
+
+    def create_module(self, **values):
+        session = self._session()
+        try:
+            module = Module(**values)
+            session.add(module)
+            session.commit()
+            session.refresh(module)
+            session.expunge(module)
+        finally:
+            session.close()
+        with self._lock:
+            module = self._module(module)
+        self._changed("module", "added", [module.id])
+        return module
+
+    def update_module(self, module_id, **values):
+        # Gecachtes Modul an Ort und Stelle aktualisieren: alle Steps/Tabs sehen die neuen Werte
+        session = self._session()
+        try:
+            module = session.get(Module, module_id)
+            for key, value in values.items():
+                setattr(module, key, value)
+            session.commit()
+            session.refresh(module)
+            session.expunge(module)
+        finally:
+            session.close()
+        with self._lock:
+            cached = self._module(module)
+            _copy_columns(cached, module)
+        self._changed("module", "updated", [module_id])
+        return cached
+
+    def add_step(self, workflow_id, module_id, parameters=None):
+        # Step am Ende des Workflows anhängen
+        steps = self.steps(workflow_id)
+        position = max((s.position or 0 for s in steps), default=0) + POSITION_GAP
+        session = self._session()
+        try:
+            step = WorkflowStep(workflow_id=workflow_id, module_id=module_id, position=position, parameters=parameters or {})
+            session.add(step)
+            session.commit()
+            step = session.get(WorkflowStep, step.id, options=[joinedload(WorkflowStep.module)], populate_existing=True)
+            session.expunge_all()
+        finally:
+            session.close()
+        with self._lock:
+            step = self._step(step)
+            self._workflow_steps.setdefault(workflow_id, []).append(step.id)
+        self._changed("step", "added", [step.id], workflow_id)
+        return step
+
+    def update_step(self, step_id, **values):
+        session = self._session()
+        try:
+            step = session.get(WorkflowStep, step_id)
+            for key, value in values.items():
+                setattr(step, key, value)
+            session.commit()
+            step = session.get(WorkflowStep, step_id, options=[joinedload(WorkflowStep.module)], populate_existing=True)
+            session.expunge_all()
+        finally:
+            session.close()
+        with self._lock:
+            step = self._step(step)
+        self._changed("step", "updated", [step_id], step.workflow_id)
+        return step
+
+    def _write_positions(self, workflow_id, positions, ordered_ids=None):
+        # Neue Positionen (step_id -> position) mit einer UPDATE-Anweisung schreiben
+        if positions:
+            session = self._session()
+            try:
+                session.execute(
+                    update(WorkflowStep.__table__)
+                    .where(WorkflowStep.id.in_(positions))
+                    .values(position=case(positions, value=WorkflowStep.id))
+                )
+                session.commit()
+            finally:
+                session.close()
+        with self._lock:
+            for id, position in positions.items():
+                set_committed_value(self._steps[id], "position", position)
+            if ordered_ids is None:
+                ordered_ids = sorted(self._workflow_steps[workflow_id], key=lambda id: self._steps[id].position)
+            self._workflow_steps[workflow_id] = list(ordered_ids)
+        if positions:
+            self._changed("step", "updated", list(positions), workflow_id)
+        return list(positions)
+
+    def reorder_steps(self, workflow_id, ordered_ids, respace=False):
+        # Beliebige Permutation der Steps in einer Anweisung anwenden. Die vorhandenen Positionswerte
+        # werden in der neuen Reihenfolge verteilt (nur geänderte Zeilen), mit respace=True
+        # bzw. bei doppelten Werten neu im Abstand POSITION_GAP. Rückgabe: geänderte Step-IDs
+        current = self.steps(workflow_id)
+        if sorted(ordered_ids) != sorted(s.id for s in current):
+            raise ValueError(f"Reihenfolge passt nicht zu den Steps von Workflow {workflow_id}")
+        values = sorted(s.position or 0 for s in current)
+        if respace or len(set(values)) != len(values):
+            values = [i * POSITION_GAP for i in range(1, len(ordered_ids) + 1)]
+        positions = {id: value for id, value in zip(ordered_ids, values) if self._steps[id].position != value}
+        return self._write_positions(workflow_id, positions, ordered_ids)
+
+    def move_step_to(self, step_id, index):
+        # Step an Zeile index verschieben; schreibt nur diesen Step (Position zwischen den
+        # neuen Nachbarn), solange dort noch eine Lücke frei ist. Rückgabe: neue Zeile
+        step = self.step(step_id)
+        steps = self.steps(step.workflow_id)
+        current = steps.index(step)
+        steps.pop(current)
+        index = max(0, min(len(steps), index))
+        if index == current:
+            return index
+        before = steps[index - 1].position if index > 0 else None
+        after = steps[index].position if index < len(steps) else None
+        if before is None and after is None:
+            position = POSITION_GAP
+        elif before is None:
+            position = after - POSITION_GAP
+        elif after is None:
+            position = before + POSITION_GAP
+        elif after - before > 1:
+            position = (before + after) // 2
+        else:
+            # keine Lücke mehr: ganzen Workflow neu verteilen (eine Anweisung)
+            ids = [s.id for s in steps]
+            ids.insert(index, step_id)
+            self.reorder_steps(step.workflow_id, ids, respace=True)
+            return index
+        ids = [s.id for s in steps]
+        ids.insert(index, step_id)
+        self._write_positions(step.workflow_id, {step_id: position}, ids)
+        return index
+
+    def move_step(self, step_id, offset):
+        # Step um offset Plätze verschieben (z. B. -1 = nach oben), Rückgabe: neue Zeile
+        step = self.step(step_id)
+        ids = [s.id for s in self.steps(step.workflow_id)]
+        current = ids.index(step_id)
+        target = max(0, min(len(ids) - 1, current + offset))
+        if target == current:
+            return current
+        return self.move_step_to(step_id, target)
+
+    def delete_step(self, step_id, delete_module=False):
+        # Step löschen; die übrigen Steps behalten ihre Positionen (Lücken sind erlaubt)
+        step = self.step(step_id)
+        if step is None:
+            return
+        workflow_id = step.workflow_id
+        session = self._session()
+        try:
+            db_step = session.get(WorkflowStep, step_id)
+            if db_step is not None:
+                session.delete(db_step)
+            if delete_module:
+                module = session.get(Module, step.module_id)
+                if module is not None:
+                    session.delete(module)
+            session.commit()
+        finally:
+            session.close()
+        with self._lock:
+            ids = [id for id in self._workflow_steps.get(workflow_id, []) if id != step_id]
+            self._steps.pop(step_id, None)
+            self._workflow_steps[workflow_id] = ids
+            if delete_module:
+                self._modules.pop(step.module_id, None)
+        self._changed("step", "removed", [step_id], workflow_id)
+        if delete_module:
+            self._changed("module", "removed", [step.module_id])
+
+
+_repository = None
+_repository_lock = threading.Lock()
+
+
+def get_repository():
+    global _repository
+    with _repository_lock:
+        if _repository is None:
+            _repository = Repository()
+        return _repository
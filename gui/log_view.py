@@ -0,0 +1,246 @@
+import tempfile
+import threading
+from array import array
+
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QListView, QLabel, QAbstractItemView
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QTimer, QVariant
+from PyQt5.QtGui import QFontDatabase
+
+
+class LogBuffer:
+    # Scrollback auf der Platte: alle Zeilen landen in einer Temp-Datei,
+    # im Speicher steht nur ein Offset je BLOCK Zeilen
+    BLOCK = 256
+
+    def __init__(self):
+        self._file = tempfile.TemporaryFile(mode="w+b")
+        self._index = array("Q")
+        self._count = 0
+        self._end = 0
+
+    def __len__(self):
+        return self._count
+
+    def append(self, lines):
+        f = self._file
+        f.seek(self._end)
+        for line in lines:
+            if self._count % self.BLOCK == 0:
+                self._index.append(self._end)
+            data = line.encode("utf-8", errors="replace") + b"\n"
+            f.write(data)
+            self._end += len(data)
+            self._count += 1
+
+    def read(self, start, count):
+        start = max(start, 0)
+        count = min(count, self._count - start)
+        if count <= 0:
+            return []
+        f = self._file
+        block = start // self.BLOCK
+        f.seek(self._index[block])
+        for _ in range(start - block * self.BLOCK):
+            f.readline()
+        return [f.readline()[:-1].decode("utf-8", errors="replace") for _ in range(count)]
+
+    def clear(self):
+        self._file.close()
+        self.__init__()
+
+    def close(self):
+        self._file.close()
+
+
+class LogModel(QAbstractListModel):
+    # Zeigt nur ein Fenster [start, start + len(lines)) des Scrollbacks
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.lines = []
+        self.start = 0
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.lines)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and index.isValid():
+            return self.lines[index.row()]
+        return QVariant()
+
+    def appendLines(self, lines):
+        if not lines:
+            return
+        first = len(self.lines)
+        self.beginInsertRows(QModelIndex(), first, first + len(lines) - 1)
+        self.lines.extend(lines)
+        self.endInsertRows()
+
+    def prependLines(self, lines):
+        if not lines:
+            return
+        self.beginInsertRows(QModelIndex(), 0, len(lines) - 1)
+        self.lines[:0] = lines
+        self.start -= len(lines)
+        self.endInsertRows()
+
+    def trimTop(self, n):
+        n = min(n, len(self.lines))
+        if n <= 0:
+            return
+        self.beginRemoveRows(QModelIndex(), 0, n - 1)
+        del self.lines[:n]
+        self.start += n
+        self.endRemoveRows()
+
+    def trimBottom(self, n):
+        n = min(n, len(self.lines))
+        if n <= 0:
+            return
+        first = len(self.lines) - n
+        self.beginRemoveRows(QModelIndex(), first, len(self.lines) - 1)
+        del self.lines[first:]
+        self.endRemoveRows()
+
+    def reset(self, start, lines):
+        self.beginResetModel()
+        self.start = start
+        self.lines = list(lines)
+        self.endResetModel()
+
+
+class LogView(QWidget):
+    # Ersatz für QTextEdit als Log-Fenster:
+    # - Threads liefern Zeilen direkt (ohne Queued-Signal pro Zeile) in einen Puffer
+    # - ein Timer übernimmt sie gebündelt mit begrenzter Rate
+    # - im Speicher bleibt nur ein Fenster, ältere Zeilen werden beim Hochscrollen nachgeladen
+    def __init__(self, max_lines=5000, page_size=1000, refresh_ms=100, max_pending=200000, parent=None):
+        super().__init__(parent)
+        self.max_lines = max_lines
+        self.page_size = page_size
+        self.max_pending = max_pending
+
+        self._lock = threading.Lock()
+        self._pending = []
+        self._received = 0
+        self._dropped = 0
+        self._coalesced = 0
+        self._follow = True
+
+        self.buffer = LogBuffer()
+        self.model = LogModel(self)
+
+        self.view = QListView()
+        self.view.setModel(self.model)
+        self.view.setUniformItemSizes(True)
+        self.view.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.view.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        self.view.verticalScrollBar().valueChanged.connect(self._scrolled)
+
+        self.stats_label = QLabel()
+
+        self.setLayout(QVBoxLayout())
+        self.layout().setContentsMargins(0, 0, 0, 0)
+        self.layout().addWidget(self.view)
+        h_layout = QHBoxLayout()
+        h_layout.addStretch()
+        h_layout.addWidget(self.stats_label)
+        self.layout().addLayout(h_layout)
+
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self._drain)
+        self._timer.start(refresh_ms)
+        self._updateStats()
+
+    # --- Thread-sichere Eingänge ---
+
+    def append(self, text):
+        # Darf aus jedem Thread aufgerufen werden
+        lines = str(text).rstrip("\n").split("\n")
+        with self._lock:
+            self._received += len(lines)
+            self._pending.extend(lines)
+            overflow = len(self._pending) - self.max_pending
+            if overflow > 0:
+                # GUI kommt nicht hinterher -> älteste wartende Zeilen verwerfen
+                del self._pending[:overflow]
+                self._dropped += overflow
+
+    def attach(self, thread):
+        # Signale eines Run-Threads direkt (ohne Event-Queue) anbinden
+        thread.log_signal.connect(self.append, Qt.DirectConnection)
+        thread.error_signal.connect(lambda e: self.append(f"ERROR: {e}"), Qt.DirectConnection)
+
+    def clear(self):
+        with self._lock:
+            self._pending = []
+            self._received = self._dropped = self._coalesced = 0
+        self.buffer.clear()
+        self.model.reset(0, [])
+        self._follow = True
+        self._updateStats()
+
+    def counters(self):
+        with self._lock:
+            return {
+                "received": self._received,
+                "pending": len(self._pending),
+                "dropped": self._dropped,
+                "coalesced": self._coalesced,
+                "stored": len(self.buffer),
+            }
+
+    # --- GUI-Thread ---
+
+    def _drain(self):
+        with self._lock:
+            batch, self._pending = self._pending, []
+            if len(batch) > 1:
+                self._coalesced += len(batch) - 1
+        if not batch:
+            return
+
+        self.buffer.append(batch)
+        if self._follow:
+            visible = batch[-self.max_lines:]
+            if len(visible) < len(batch):
+                # Nur das Ende des Batches landet im Fenster, der Rest bleibt im Scrollback
+                self.model.reset(len(self.buffer) - len(visible), visible)
+            else:
+                self.model.appendLines(visible)
+                self.model.trimTop(len(self.model.lines) - self.max_lines)
+            self.view.scrollToBottom()
+        self._updateStats()
+
+    def _scrolled(self, value):
+        bar = self.view.verticalScrollBar()
+        if value <= bar.minimum() and self.model.start > 0:
+            self._loadOlder()
+        elif value >= bar.maximum():
+            self._loadNewer()
+        elif value < bar.maximum():
+            self._follow = False
+
+    def _loadOlder(self):
+        self._follow = False
+        count = min(self.page_size, self.model.start)
+        lines = self.buffer.read(self.model.start - count, count)
+        self.model.prependLines(lines)
+        self.model.trimBottom(len(self.model.lines) - self.max_lines)
+        # Ansicht auf der bisherigen ersten Zeile halten
+        self.view.scrollTo(self.model.index(len(lines), 0), QAbstractItemView.PositionAtTop)
+
+    def _loadNewer(self):
+        end = self.model.start + len(self.model.lines)
+        if end >= len(self.buffer):
+            self._follow = True
+            return
+        lines = self.buffer.read(end, self.page_size)
+        self.model.appendLines(lines)
+        self.model.trimTop(len(self.model.lines) - self.max_lines)
+        self._follow = self.model.start + len(self.model.lines) >= len(self.buffer)
+
+    def _updateStats(self):
+        c = self.counters()
+        self.stats_label.setText(
+            f"Zeilen: {c['stored']}  |  zusammengefasst: {c['coalesced']}  |  verworfen: {c['dropped']}"
+        )
@@ -1,8 +1,11 @@
-from PyQt5.QtCore import QThread, pyqtSignal
-import subprocess, sys
-from datetime import datetime
+from PyQt5.QtCore import QObject, QThread, QTimer, pyqtSignal
+import queue
+import threading
+from collections import deque
 
-from db.db_setup import SessionLocal, ModuleRun
+from workflows.async_executor import EXECUTOR_MODE, get_async_executor
+from workflows.engine import execute_steps
+from workflows.runner import run_module
 
 
 class SingleModuleRunThread(QThread):
@@ -15,172 +18,186 @@ class SingleModuleRunThread(QThread):
         super().__init__()
         self.step = step # Der WorkflowStep, der ausgeführt werden soll
         self.input_data = input_data  # Optionaler Input für das Modul
-        self._stop = False # Flag, um Ausführung abzubrechen
+        self._stop_event = threading.Event() # Flag, um Ausführung abzubrechen
 
     def run(self):
-        mod = self.step.module
-        if not mod.code_path:
-            # Wenn kein Code hinterlegt ist -> abbrechen
-            self.log_signal.emit(f"{mod.name}: Kein Code hinterlegt.\n")
-            self.finished_signal.emit()
-            return
-
-        self.log_signal.emit(f"Running {mod.name}...\n")
-        cmd = [sys.executable, "-u", mod.code_path] # Python-Script starten
-
         try:
-            # Wenn Input gebraucht wird und vorhanden ist -> per stdin übergeben
-            if mod.needs_input and self.input_data:
-                process = subprocess.Popen(
-                    cmd,
-                    stdin=subprocess.PIPE,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.STDOUT,
-                    bufsize=1,
-                    universal_newlines=True
-                )
-                process.stdin.write(self.input_data)
-                process.stdin.close()
-            else:
-                # Ohne Input starten
-                process = subprocess.Popen(
-                    cmd,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.STDOUT,
-                    bufsize=1,
-                    universal_newlines=True
-                )
-
-            # Echtzeit-Ausgabe lesen
-            for line in iter(process.stdout.readline, ""):
-                if self._stop:
-                    self.log_signal.emit("Execution stopped by user.\n")
-                    process.terminate()
-                    break
-                self.log_signal.emit(line.rstrip())
-
-            process.stdout.close()
-            process.wait()
-
+            run_module(self.step.module, self.log_signal.emit, self._stop_event, self.input_data)
         except Exception as e:
             self.error_signal.emit(str(e))
 
         # Immer melden, dass Modul durch ist
         self.finished_signal.emit()
-        self.log_signal.emit(f"Finished {mod.name}\n")
 
     def stop(self):
         # Stop-Flag setzen, damit run() abbrechen kann
-        self._stop = True
+        self._stop_event.set()
 
 
 class ModuleRunThread(QThread):
-    # Wie oben, nur für mehrere Module im Workflow
+    # Wie oben, nur für mehrere Module im Workflow (Ausführung entlang der Step-Abhängigkeiten)
     log_signal = pyqtSignal(str)
+    step_finished_signal = pyqtSignal(int, str) # step.id, Status
     finished_signal = pyqtSignal()
     error_signal = pyqtSignal(str)
 
-    def __init__(self, steps, workflow_instance_id, parent=None):
+    def __init__(self, steps, workflow_instance_id, max_parallel=None, pipeline=False, parent=None, completed=None):
         super().__init__(parent)
         self.steps = steps # Liste von WorkflowSteps
-        self._stop = False
+        self.completed = completed # übernommene Ergebnisse beim Fortsetzen (step.id -> (Status, output_ref))
+        self.max_parallel = max_parallel # Obergrenze paralleler Steps (None = global)
+        self.pipeline = pipeline # Steps gleichzeitig starten und per Pipe verbinden
+        self._stop_event = threading.Event()
         self.workflow_instance_id = workflow_instance_id # ID der Workflow-Instanz (für DB)
+        self.step_status = {}
 
     def run(self):
-        session = SessionLocal()
         try:
-            for step in self.steps:
-                if self._stop:
-                    self.log_signal.emit("Execution stopped by user.\n")
-                    break
-
-                mod = step.module
-                if not mod.code_path:
-                    self.log_signal.emit(f"{mod.name}: Kein Code hinterlegt.\n")
-                    
-                    continue
-                
-                # DB-Eintrag für den Modul-Run anlegen
-                module_run = ModuleRun(
-                    workflow_instance_id=self.workflow_instance_id,
-                    workflow_step_id=step.id,
-                    status="running",
-                    started_at=datetime.now(),
-                    input_ref=getattr(step, "input_ref", None),
-                    log=""
-                )
-                session.add(module_run)
-                session.commit()
-
-                self.log_signal.emit(f"Running {mod.name}...\n")
-                cmd = [sys.executable, "-u", mod.code_path]
-                logs = []
-
-                try:
-                    # Input falls nötig über stdin
-                    if mod.needs_input and getattr(step, "input_data", None):
-                        process = subprocess.Popen(
-                            cmd,
-                            stdin=subprocess.PIPE,
-                            stdout=subprocess.PIPE,
-                            stderr=subprocess.STDOUT,
-                            bufsize=1,
-                            universal_newlines=True
-                        )
-                        process.stdin.write(step.input_data)
-                        process.stdin.close()
-                    else:
-                        process = subprocess.Popen(
-                            cmd,
-                            stdout=subprocess.PIPE,
-                            stderr=subprocess.STDOUT,
-                            bufsize=1,
-                            universal_newlines=True
-                        )
-
-                    # Live-Ausgabe + direkt in DB speichern
-                    for line in iter(process.stdout.readline, ""):
-                        if self._stop:
-                            self.log_signal.emit("Execution stopped by user.\n")
-                            process.terminate()
-                            break
-                        self.log_signal.emit(line.rstrip())
-                        logs.append(line)
-
-                        # Zwischenstand ins Log in DB speichern
-                        session.query(ModuleRun).filter_by(id=module_run.id).update(
-                                {"log": "\n".join(logs)}
-                            )
-                        session.commit()
-
-                    process.stdout.close()
-                    return_code = process.wait()
-
-                    # Status (finished/failed) in DB aktualisieren
-                    session.query(ModuleRun).filter_by(id=module_run.id).update(
-                            {
-                                "status": "finished" if return_code == 0 else "failed",
-                                "finished_at": datetime.now(),
-                                "log": "\n".join(logs),
-                            }
-                        )
-                    session.commit()
-
-                except Exception as e:
-                    # Falls Exception: ModulRun in DB auf failed setzen
-                    session.query(ModuleRun).filter_by(id=module_run.id).update(
-                            {"status": "failed", "finished_at": datetime.now(), "log": str(e)}
-                        )
-                    session.commit()
-                    self.error_signal.emit(str(e))
-                    logs.append(f"\nException: {str(e)}")
-
-                # Meldung, dass Step fertig ist
-                self.finished_signal.emit()
-                self.log_signal.emit(f"Finished {mod.name}\n")
-        finally:
-            session.close()
+            self.step_status = execute_steps(
+                self.steps, self.workflow_instance_id, self.log_signal.emit, self._stop_event,
+                self.max_parallel, self.pipeline, self.step_finished_signal.emit, self.completed,
+            )
+        except Exception as e:
+            # z.B. CycleError: kein Step wurde ausgeführt
+            self.step_status = {s.id: "failed" for s in self.steps}
+            self.error_signal.emit(str(e))
+        self.finished_signal.emit()
 
     def stop(self):
         # Abbruch-Flag setzen
-        self._stop = True
\ No newline at end of file
+        self._stop_event.set()
+
+
+
+class AsyncRunBridge(QObject):
+    # Eine thread-sichere Queue für alle Läufe der Event-Loop; der GUI-Thread leert sie per Timer
+    # und gibt die Ereignisse als Signale an den jeweiligen AsyncWorkflowRun weiter.
+    # Log-Zeilen gehen nicht über die Queue, sondern in einen begrenzten Puffer je Lauf
+    # und werden pro Tick als ein Block weitergegeben
+    MAX_EVENTS_PER_TICK = 20000 # GUI bleibt bedienbar, Rest kommt beim nächsten Tick
+
+    def __init__(self, interval_ms=50, parent=None):
+        super().__init__(parent)
+        self.queue = queue.SimpleQueue()
+        self.active = set()
+        self.timer = QTimer(self)
+        self.timer.setInterval(interval_ms)
+        self.timer.timeout.connect(self.drain)
+
+    def register(self, run):
+        self.active.add(run)
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def drain(self):
+        for run in list(self.active):
+            run.flushLines()
+        for _ in range(self.MAX_EVENTS_PER_TICK):
+            try:
+                run, kind, payload = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            run.dispatch(kind, payload)
+            if kind == "done":
+                self.active.discard(run)
+        if not self.active and self.queue.empty():
+            self.timer.stop()
+
+
+_bridge = None
+
+
+def get_run_bridge():
+    # Nur aus dem GUI-Thread aufrufen (QTimer gehört zu dessen Event-Loop)
+    global _bridge
+    if _bridge is None:
+        _bridge = AsyncRunBridge()
+    return _bridge
+
+
+class AsyncWorkflowRun(QObject):
+    # Gleiche Schnittstelle wie ModuleRunThread, aber ohne eigenen Thread:
+    # die Steps laufen im gemeinsamen AsyncExecutor
+    MAX_PENDING_LINES = 200000 # wie LogView.max_pending; darüber werden die ältesten Zeilen verworfen
+    log_signal = pyqtSignal(str)
+    step_finished_signal = pyqtSignal(int, str) # step.id, Status
+    finished_signal = pyqtSignal()
+    error_signal = pyqtSignal(str)
+
+    def __init__(self, steps, workflow_instance_id, max_parallel=None, pipeline=False, parent=None, completed=None):
+        super().__init__(parent)
+        self.steps = steps
+        self.completed = completed
+        self.workflow_instance_id = workflow_instance_id
+        self.max_parallel = max_parallel
+        self.pipeline = pipeline
+        self.step_status = {}
+        self._run = None
+        self._running = False
+        self._lines = deque(maxlen=self.MAX_PENDING_LINES)
+        self._lines_lock = threading.Lock()
+        self.dropped_lines = 0
+        self._reported_drops = 0
+
+    def start(self):
+        bridge = get_run_bridge()
+        bridge.register(self)
+        put = bridge.queue.put
+        self._running = True
+        self._run = get_async_executor().submit(
+            self.steps, self.workflow_instance_id,
+            self.appendLine,
+            self.max_parallel, self.pipeline,
+            lambda step_id, status: put((self, "step", (step_id, status))),
+            self.completed,
+        )
+        self._run.future.add_done_callback(lambda future: put((self, "done", future)))
+
+    def appendLine(self, line):
+        # Läuft im Loop-Thread
+        with self._lines_lock:
+            if len(self._lines) == self._lines.maxlen:
+                self.dropped_lines += 1
+            self._lines.append(line)
+
+    def flushLines(self):
+        # Läuft im GUI-Thread: gepufferte Zeilen als ein Block an den LogView
+        with self._lines_lock:
+            lines = list(self._lines)
+            self._lines.clear()
+            dropped = self.dropped_lines - self._reported_drops
+            self._reported_drops = self.dropped_lines
+        if dropped:
+            self.log_signal.emit(f"[{dropped} Log-Zeilen verworfen, Anzeige kommt nicht hinterher]")
+        if lines:
+            self.log_signal.emit("\n".join(lines))
+
+    def isRunning(self):
+        return self._running
+
+    def stop(self):
+        if self._run is not None:
+            self._run.cancel()
+
+    def dispatch(self, kind, payload):
+        # Läuft im GUI-Thread
+        if kind == "step":
+            self.step_finished_signal.emit(*payload)
+        elif kind == "done":
+            self.flushLines() # letzte Zeilen vor finished_signal
+            self._running = False
+            try:
+                self.step_status = payload.result()
+            except Exception as e:
+                self.step_status = {s.id: "failed" for s in self.steps}
+                self.error_signal.emit(str(e))
+            self.finished_signal.emit()
+
+
+def create_workflow_run(steps, workflow_instance_id, max_parallel=None, pipeline=False, parent=None, completed=None):
+    # Standard: Event-Loop (AsyncWorkflowRun), WORKFLOW_EXECUTOR=thread/queue: ein QThread pro Lauf
+    # (bei queue wartet er nur auf die Jobs der Worker-Agenten)
+    # completed: übernommene Ergebnisse beim Fortsetzen nach Fehler
+    if EXECUTOR_MODE == "async":
+        return AsyncWorkflowRun(steps, workflow_instance_id, max_parallel, pipeline, parent, completed)
+    return ModuleRunThread(steps, workflow_instance_id, max_parallel, pipeline, parent, completed)
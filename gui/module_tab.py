@@ -1,8 +1,11 @@
-from PyQt5.QtWidgets import QVBoxLayout, QListWidget, QWidget, QLabel, QPushButton, QInputDialog, QLineEdit, QMessageBox, QHBoxLayout, QCheckBox, QFileDialog, QListWidgetItem, QTextEdit
+from PyQt5.QtWidgets import QVBoxLayout, QListWidget, QWidget, QLabel, QPushButton, QInputDialog, QLineEdit, QMessageBox, QHBoxLayout, QCheckBox, QFileDialog, QListWidgetItem, QSpinBox, QDialog, QDialogButtonBox, QAbstractItemView
+from PyQt5.QtCore import Qt, pyqtSignal
 
-from db.db_setup import Module, Workflow, WorkflowStep, SessionLocal
+from db.repository import get_repository
 from .module_run import SingleModuleRunThread
-from sqlalchemy.orm import joinedload
+from .log_view import LogView
+from .profile_tab import ProfileTab
+from workflows.usage import format_usage, latest_step_usage, workflow_usage_summary
 
 
 class ModuleTab(QWidget):
@@ -12,21 +15,37 @@ class ModuleTab(QWidget):
         self.workflow_window = workflow_window
         self.setLayout(QVBoxLayout())
 
-        # Workflow aus der DB holen (inkl. aller Steps + Module)
-        session = SessionLocal()
-        self.workflow = (
-            session.query(Workflow)
-            .options(joinedload(Workflow.steps).joinedload(WorkflowStep.module))
-            .filter_by(name=self.usecase_name)
-            .first()
-        )
-        session.expunge_all() 
-        session.close()
+        # Workflow aus dem gemeinsamen Cache (Steps + Module lädt die Step-Liste)
+        self.repository = get_repository()
+        self.workflow = self.repository.workflow(self.usecase_name)
 
         # Liste der Steps im UI anzeigen
         self.step_list = WorkflowStepList(self.workflow, self)
         self.layout().addWidget(self.step_list)
 
+        # Wie viele Steps dürfen parallel laufen (0 = globale Grenze)
+        parallel_layout = QHBoxLayout()
+        parallel_layout.addWidget(QLabel("Parallele Steps (0 = automatisch):"))
+        self.parallel_spin = QSpinBox()
+        self.parallel_spin.setRange(0, 256)
+        self.parallel_spin.valueChanged.connect(self.setMaxParallel)
+        parallel_layout.addWidget(self.parallel_spin)
+
+        # Pipeline-Modus: alle Steps gleichzeitig, stdout -> stdin des nächsten Steps
+        self.pipeline_checkbox = QCheckBox("Pipeline-Modus (Steps per Pipe verbinden)")
+        self.pipeline_checkbox.toggled.connect(self.setPipeline)
+        parallel_layout.addWidget(self.pipeline_checkbox)
+
+        # Priorität in der Warteschlange (höher = früher gestartet)
+        parallel_layout.addWidget(QLabel("Priorität:"))
+        self.priority_spin = QSpinBox()
+        self.priority_spin.setRange(-100, 100)
+        self.priority_spin.valueChanged.connect(self.setPriority)
+        parallel_layout.addWidget(self.priority_spin)
+        parallel_layout.addStretch()
+        self.layout().addLayout(parallel_layout)
+        self.showSettings()
+
         # Buttons zum Hinzufügen von Modulen
         self.addModuleBtn = QPushButton("Add New Module")
         self.layout().addWidget(self.addModuleBtn)
@@ -37,28 +56,56 @@ class ModuleTab(QWidget):
         self.addExistingModuleBtn.clicked.connect(self.addExistingModule)
 
         # Logfenster unten
-        self.log_text = QTextEdit()
-        self.log_text.setReadOnly(True)
+        self.log_text = LogView()
 
         self.layout().addWidget(QLabel("Logs:"))
         self.layout().addWidget(self.log_text)
 
         self.run_thread = None
-    
+
+        # Änderungen aus anderen Tabs (gleicher Workflow, gemeinsam genutzte Module)
+        self.repository.subscribe(self.repositoryChanged)
+
+    def showSettings(self):
+        # Einstellungen anzeigen, ohne die Setter erneut auszulösen
+        for widget, setter, value in (
+            (self.parallel_spin, self.parallel_spin.setValue, self.workflow.max_parallel or 0),
+            (self.pipeline_checkbox, self.pipeline_checkbox.setChecked, bool(self.workflow.pipeline)),
+            (self.priority_spin, self.priority_spin.setValue, self.workflow.priority or 0),
+        ):
+            widget.blockSignals(True)
+            setter(value)
+            widget.blockSignals(False)
+
+    def repositoryChanged(self, change):
+        if change.kind != "workflow" or (change.ids and self.workflow.id not in change.ids):
+            return
+        if change.action == "invalidated":
+            self.workflow = self.repository.workflow(self.workflow.id) or self.workflow
+            self.step_list.workflow = self.workflow
+        self.showSettings()
+
+    def setMaxParallel(self, value):
+        # Obergrenze paralleler Steps für diesen Workflow speichern
+        self.repository.update_workflow(self.workflow.id, max_parallel=value or None)
+
+    def setPipeline(self, checked):
+        self.repository.update_workflow(self.workflow.id, pipeline=checked)
+
+    def setPriority(self, value):
+        self.repository.update_workflow(self.workflow.id, priority=value)
+
     def runModule(self, step):
         # Modul in eigenem Thread starten und Logs anzeigen
         self.status_label.setText(f"Status: Running {step.module.name}")
         self.run_thread = SingleModuleRunThread(step)
-        self.run_thread.log_signal.connect(self.log_text.append)
-        self.run_thread.error_signal.connect(lambda e: self.log_text.append(f"ERROR: {e}"))
+        self.log_text.attach(self.run_thread)
         self.run_thread.finished_signal.connect(lambda: self.status_label.setText("Status: Idle"))
         self.run_thread.start()
 
 
     def addModule(self):
         # Neues Modul direkt anlegen (Name, Input, Output, Info)
-        session = SessionLocal()
-
         name, ok = QInputDialog.getText(self, 'Add Module', 'Module Name:')
         if not ok or not name:
             return
@@ -72,26 +119,14 @@ class ModuleTab(QWidget):
         if not ok:
             return
 
-        # Modul in DB speichern
-        module = Module(name=name, description=info.strip(),
-                        input_type=input_value, output_type=output_value)
-        session.add(module)
-        session.commit()
-
-        # Schritt in Workflow einfügen
-        step = WorkflowStep(workflow_id=self.workflow.id, module_id=module.id,
-                            position=len(self.workflow.steps) + 1, parameters={})
-        session.add(step)
-        session.commit()
-        session.close()
-
-        self.step_list.loadSteps()
+        # Modul in DB speichern und als Schritt anhängen (die Liste aktualisiert sich über das Repository)
+        module = self.repository.create_module(name=name, description=info.strip(),
+                                               input_type=input_value, output_type=output_value)
+        self.repository.add_step(self.workflow.id, module.id)
 
     def addExistingModule(self):
-        # Modul aus DB auswählen und anhängen
-        session = SessionLocal()
-        modules = session.query(Module).all()
-        session.close()
+        # Modul aus dem Cache auswählen und anhängen
+        modules = self.repository.modules()
 
         if not modules:
             QMessageBox.warning(self, "Keine Module", "Es sind keine Module in der Datenbank vorhanden.")
@@ -105,36 +140,13 @@ class ModuleTab(QWidget):
         if not ok or not name:
             return
 
-        
-        session = SessionLocal()
-        module = session.query(Module).filter_by(name=name).first()
-
-        
-        step = WorkflowStep(
-            workflow_id=self.workflow.id,
-            module_id=module.id,
-            position=len(self.workflow.steps) + 1,
-            parameters={}
-        )
-        session.add(step)
-        session.commit()
-        session.close()
-
-        self.step_list.loadSteps()
+        module = modules[module_names.index(name)]
+        self.repository.add_step(self.workflow.id, module.id)
 
 
     def deleteModule(self, step):
         # Schritt + zugehöriges Modul löschen
-        session = SessionLocal()
-        step = session.query(WorkflowStep).filter_by(id=step.id).first()
-        if step:
-            module = session.query(Module).filter_by(id=step.module_id).first()
-            session.delete(step)
-            if module:
-                session.delete(module)
-            session.commit()
-        session.close()
-        self.step_list.loadSteps()
+        self.repository.delete_step(step.id, delete_module=True)
 
     def openEditTab(self, module):
         # Extra-Tab zum Bearbeiten des Moduls öffnen
@@ -142,93 +154,226 @@ class ModuleTab(QWidget):
         self.workflow_window.tabs.addTab(edit_tab, f"Edit {module.name}")
         self.workflow_window.tabs.setCurrentWidget(edit_tab)
 
+    def openProfileTab(self, module, after=None):
+        # Hotspots der profilierten Läufe, direkt neben dem aufrufenden Tab
+        tabs = self.workflow_window.tabs
+        profile_tab = ProfileTab(module)
+        index = tabs.indexOf(after) if after is not None else -1
+        if index == -1:
+            tabs.addTab(profile_tab, f"Profile {module.name}")
+        else:
+            tabs.insertTab(index + 1, profile_tab, f"Profile {module.name}")
+        tabs.setCurrentWidget(profile_tab)
+
+
+class StepListWidget(QListWidget):
+    # Liste mit Drag & Drop: die Zeilen werden nicht von Qt verschoben (Item-Widgets gingen
+    # dabei verloren), sondern die neue Reihenfolge wird gemeldet und über das Repository gespeichert
+    rowsDropped = pyqtSignal(list, int) # verschobene Zeilen, Ziel-Zeile (vor dieser einfügen)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.setDragDropMode(QAbstractItemView.InternalMove)
+        self.setDefaultDropAction(Qt.MoveAction)
+
+    def dropEvent(self, event):
+        rows = sorted(index.row() for index in self.selectedIndexes())
+        index = self.indexAt(event.pos())
+        if not index.isValid():
+            target = self.count()
+        elif self.dropIndicatorPosition() == QAbstractItemView.BelowItem:
+            target = index.row() + 1
+        else:
+            target = index.row()
+        event.setDropAction(Qt.IgnoreAction)
+        event.accept()
+        if rows:
+            self.rowsDropped.emit(rows, target)
+
+
+class StepRow(QWidget):
+    # Eine Zeile der Step-Liste; bei Änderungen wird sie neu befüllt statt neu erzeugt
+    def __init__(self, step_list, number, parent=None):
+        super().__init__(parent)
+        self.step_list = step_list
+        self.number = number # Zeilennummer (Positionen selbst sind nur Sortierschlüssel)
+        self.step = None
+        self.key = None # (step_id, Step-Version, Modul-Version) des angezeigten Stands
+
+        layout = QHBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        self.label = QLabel()
+        self.play_btn = QPushButton("▶")
+        self.play_btn.setMaximumWidth(60)
+
+        self.status_label = QLabel("Idle")
+        self.status_label.setFixedWidth(60)
+
+        # Step bei jedem Lauf profilieren (Parameter "profile", Ergebnis im Profil-Tab des Moduls)
+        self.profile_checkbox = QCheckBox("Profil")
+        self.profile_checkbox.toggled.connect(lambda checked: self.step_list.setProfile(self.step, checked))
+
+        # Verbrauch des letzten Workflow-Laufs dieses Steps
+        self.usage_label = QLabel()
+        self.usage_label.setStyleSheet("color: gray")
+
+        # Start/Stopp-Logik für das Modul
+        self.play_btn.clicked.connect(lambda checked: self.step_list.toggleRun(self.step))
+
+        layout.addWidget(self.label)
+        layout.addStretch()
+        layout.addWidget(self.usage_label)
+        layout.addWidget(self.profile_checkbox)
+        layout.addWidget(self.status_label)
+        layout.addWidget(self.play_btn)
+        self.setLayout(layout)
+
+    def setStep(self, step, key, usage):
+        self.step = step
+        self.key = key
+        self.label.setText(f"{self.number}. {step.module.name}")
+        self.usage_label.setText(format_usage(usage) if usage is not None else "")
+        self.profile_checkbox.blockSignals(True)
+        self.profile_checkbox.setChecked(bool((step.parameters or {}).get("profile")))
+        self.profile_checkbox.blockSignals(False)
+        self.updateRunState()
+
+    def updateRunState(self):
+        thread = getattr(self.step, "_thread", None)
+        self.play_btn.setText("■" if thread is not None and thread.isRunning() else "▶")
+        self.status_label.setText(self.step_list.status.get(self.step.id, "Idle"))
+
 
 class WorkflowStepList(QWidget):
     def __init__(self, workflow, module_tab, parent=None):
         super().__init__(parent)
         self.workflow = workflow
         self.module_tab = module_tab
+        self.repository = module_tab.repository
+        self.steps = []
+        self.rows = [] # StepRow je Zeile der Liste
+        self.status = {} # step_id -> Status-Text
+        self.usage = {}
 
         self.setLayout(QVBoxLayout())
 
-        # UI: Liste + Buttons
-        self.listWidget = QListWidget()
+        # UI: Liste (Reihenfolge auch per Drag & Drop) + Buttons
+        self.listWidget = StepListWidget()
+        self.listWidget.rowsDropped.connect(self.dropSteps)
         self.layout().addWidget(self.listWidget)
+
+        # Ressourcenverbrauch der letzten Läufe (für die Dimensionierung der Maschinen)
+        self.usage_label = QLabel()
+        self.layout().addWidget(self.usage_label)
+
         btn_layout = QHBoxLayout()
         self.up_btn = QPushButton("↑")
         self.down_btn = QPushButton("↓")
         self.delete_btn = QPushButton("🗑️")
+        self.deps_btn = QPushButton("Abhängigkeiten…")
 
         btn_layout.addWidget(self.up_btn)
         btn_layout.addWidget(self.down_btn)
         btn_layout.addWidget(self.delete_btn)
+        btn_layout.addWidget(self.deps_btn)
         self.layout().addLayout(btn_layout)
 
         # Button-Events
         self.up_btn.clicked.connect(self.moveUp)
         self.down_btn.clicked.connect(self.moveDown)
         self.delete_btn.clicked.connect(self.deleteStep)
+        self.deps_btn.clicked.connect(self.editDependencies)
         self.listWidget.itemDoubleClicked.connect(self.editStepModule)
 
 
         self.loadSteps()
+        self.repository.subscribe(self.repositoryChanged)
 
     def loadSteps(self):
-        # Alle Steps aus DB laden und in Liste darstellen
-        session = SessionLocal()
-        self.steps = (
-            session.query(WorkflowStep)
-            .options(joinedload(WorkflowStep.module))
-            .filter_by(workflow_id=self.workflow.id)
-            .order_by(WorkflowStep.position)
-            .all()
-        )
-        session.close()
-
-        self.listWidget.clear()
-        for step in self.steps:
-            item_widget = QWidget()
-            layout = QHBoxLayout()
-            layout.setContentsMargins(0, 0, 0, 0)
-
-            label = QLabel(f"{step.position}. {step.module.name}")
-            play_btn = QPushButton("▶")
-            play_btn.setMaximumWidth(60)
-
-            status_label = QLabel("Idle")
-            status_label.setFixedWidth(60)
-
-            # Start/Stopp-Logik für das Modul
-            def toggle_run(step_obj, btn=play_btn, status=status_label):
-                if hasattr(step_obj, "_thread") and step_obj._thread.isRunning():
-                    step_obj._thread.stop()
-                    status.setText("Stopping...")
-                else:
-                    thread = SingleModuleRunThread(step_obj)
-                    step_obj._thread = thread
-                    thread.log_signal.connect(self.module_tab.log_text.append)
-                    thread.error_signal.connect(lambda e: self.module_tab.log_text.append(f"ERROR: {e}"))
-                    
-                    def finished():
-                        status.setText("Finished")
-                        btn.setText("▶")
-                    thread.finished_signal.connect(finished)
-
-                    thread.start()
-                    status.setText("Running")
-                    btn.setText("■")
-
-            play_btn.clicked.connect(lambda checked, s=step, b=play_btn, st=status_label: toggle_run(s, b, st))
-
-            layout.addWidget(label)
-            layout.addWidget(status_label)
-            layout.addWidget(play_btn)
-
-            item_widget.setLayout(layout)
+        # Steps aus dem Repository (lädt nur beim ersten Mal bzw. nach invalidate() aus der DB)
+        # und Verbrauchswerte der letzten Läufe holen, dann alle Zeilen neu befüllen
+        self.usage = latest_step_usage(self.workflow.id)
+        self.updateUsageSummary()
+        for row in self.rows:
+            row.key = None
+        self.showSteps()
+
+    def showSteps(self):
+        # Zeilen an den Stand im Repository angleichen: nur Zeilen, deren Step oder Modul
+        # sich geändert hat (Version), werden neu befüllt; Zeilen am Ende kommen hinzu/fallen weg
+        self.steps = self.repository.steps(self.workflow.id)
+        while len(self.rows) < len(self.steps):
+            row = StepRow(self, len(self.rows) + 1)
             list_item = QListWidgetItem()
-            list_item.setSizeHint(item_widget.sizeHint())
+            list_item.setSizeHint(row.sizeHint())
             self.listWidget.addItem(list_item)
-            self.listWidget.setItemWidget(list_item, item_widget)
+            self.listWidget.setItemWidget(list_item, row)
+            self.rows.append(row)
+        while len(self.rows) > len(self.steps):
+            row = self.rows.pop()
+            self.listWidget.takeItem(len(self.rows))
+            row.deleteLater()
+
+        for row, step in zip(self.rows, self.steps):
+            key = (step.id, self.repository.version("step", step.id), self.repository.version("module", step.module_id))
+            if row.key != key:
+                row.setStep(step, key, self.usage.get(step.id))
+
+    def repositoryChanged(self, change):
+        if change.action == "invalidated":
+            self.loadSteps()
+        elif change.kind == "module" or (change.kind == "step" and change.workflow_id == self.workflow.id):
+            self.showSteps()
+
+    def rowOf(self, step):
+        for row in self.rows:
+            if row.step is step:
+                return row
+        return None
+
+    def setStatus(self, step, text):
+        self.status[step.id] = text
+        row = self.rowOf(step)
+        if row is not None:
+            row.updateRunState()
+
+    def toggleRun(self, step):
+        # Step-Objekte kommen aus dem Repository-Cache, der laufende Thread bleibt daher
+        # auch nach Änderungen an der Liste am Step erreichbar
+        thread = getattr(step, "_thread", None)
+        if thread is not None and thread.isRunning():
+            thread.stop()
+            self.setStatus(step, "Stopping...")
+            return
+
+        thread = SingleModuleRunThread(step)
+        step._thread = thread
+        self.module_tab.log_text.attach(thread)
+        thread.finished_signal.connect(lambda: self.setStatus(step, "Finished"))
+        thread.start()
+        self.setStatus(step, "Running")
+
+    def setProfile(self, step, checked):
+        params = dict(step.parameters or {})
+        if checked:
+            params["profile"] = params.get("profile") or "cprofile"
+        else:
+            params.pop("profile", None)
+        self.repository.update_step(step.id, parameters=params)
+
+    def updateUsageSummary(self):
+        summary = workflow_usage_summary(self.workflow.id)
+        if summary is None:
+            self.usage_label.setText("Verbrauch: noch keine Messwerte")
+            return
+        wall = f"{summary['wall_time']:.1f}s, " if summary["wall_time"] is not None else ""
+        self.usage_label.setText(
+            f"Verbrauch pro Lauf (Ø {summary['instances']} Läufe): {wall}"
+            f"CPU {summary['cpu']:.1f}s, Peak-RSS {summary['max_rss_kb'] / 1024:.0f} MB, "
+            f"I/O {summary['io_bytes'] / (1024 * 1024):.1f} MB"
+        )
 
 
     def moduleFinished(self, step, btn, status_label):
@@ -239,39 +384,54 @@ class WorkflowStepList(QWidget):
         # Step eine Position nach oben verschieben
         current = self.listWidget.currentRow()
         if current > 0:
-            session = SessionLocal()
-            steps = session.query(WorkflowStep).filter_by(workflow_id=self.workflow.id).order_by(WorkflowStep.position).all()
-            steps[current].position, steps[current-1].position = steps[current-1].position, steps[current].position
-            session.commit()
-            session.close()
-            self.loadSteps()
+            self.listWidget.setCurrentRow(self.repository.move_step(self.steps[current].id, -1))
 
     def moveDown(self):
         # Step eine Position nach unten verschieben
         current = self.listWidget.currentRow()
-        if current < len(self.steps) - 1:
-            session = SessionLocal()
-            steps = session.query(WorkflowStep).filter_by(workflow_id=self.workflow.id).order_by(WorkflowStep.position).all()
-            steps[current].position, steps[current + 1].position = steps[current + 1].position, steps[current].position
-            session.commit()
-            session.close()
-            self.loadSteps()
+        if 0 <= current < len(self.steps) - 1:
+            self.listWidget.setCurrentRow(self.repository.move_step(self.steps[current].id, 1))
+
+    def dropSteps(self, rows, target):
+        # Gezogene Zeilen vor Zeile target einfügen: ein Step → eine geänderte Zeile,
+        # mehrere → eine UPDATE-Anweisung für die neue Reihenfolge
+        moved = [self.steps[row].id for row in rows]
+        if len(moved) == 1:
+            target -= rows[0] < target
+            self.listWidget.setCurrentRow(self.repository.move_step_to(moved[0], target))
+            return
+        ids = [step.id for step in self.steps]
+        target -= sum(row < target for row in rows)
+        remaining = [id for id in ids if id not in set(moved)]
+        remaining[target:target] = moved
+        self.repository.reorder_steps(self.workflow.id, remaining)
+        self.listWidget.clearSelection()
+        for row in range(target, target + len(moved)):
+            self.listWidget.item(row).setSelected(True)
 
     def deleteStep(self):
-        # Step löschen + Positionen neu ordnen
+        # Step löschen (die übrigen Steps behalten ihre Positionen)
         current = self.listWidget.currentRow()
         if current >= 0:
-            session = SessionLocal()
-            steps = session.query(WorkflowStep).filter_by(workflow_id=self.workflow.id).order_by(WorkflowStep.position).all()
-            session.delete(steps[current])
-            session.commit()
-
-            # Positionen neu nummerieren
-            for i, step in enumerate(session.query(WorkflowStep).filter_by(workflow_id=self.workflow.id).order_by(WorkflowStep.position).all(), start=1):
-                step.position = i
-            session.commit()
-            session.close()
-            self.loadSteps()
+            self.repository.delete_step(self.steps[current].id)
+
+    def editDependencies(self):
+        # Vorgänger des ausgewählten Steps festlegen (steuert die parallele Ausführung)
+        current = self.listWidget.currentRow()
+        if current < 0:
+            return
+        step = self.steps[current]
+        dialog = StepDependencyDialog(step, self.steps, self)
+        if dialog.exec_() != QDialog.Accepted:
+            return
+
+        params = dict(step.parameters or {})
+        depends_on = dialog.dependsOn()
+        if depends_on is None:
+            params.pop("depends_on", None)
+        else:
+            params["depends_on"] = depends_on
+        self.repository.update_step(step.id, parameters=params) # neues Dict, damit die JSON-Änderung erkannt wird
 
     def editStepModule(self, item):
         # Doppelklick → Modul im Edit-Tab öffnen
@@ -284,6 +444,49 @@ class WorkflowStepList(QWidget):
 
 
 
+class StepDependencyDialog(QDialog):
+    def __init__(self, step, steps, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(f"Abhängigkeiten: {step.module.name}")
+        self.setLayout(QVBoxLayout())
+
+        depends_on = (step.parameters or {}).get("depends_on")
+
+        # Standard = vom vorherigen Step abhängig (lineare Kette)
+        self.default_checkbox = QCheckBox("Standard: nach dem vorherigen Step ausführen")
+        self.default_checkbox.setChecked(depends_on is None)
+        self.layout().addWidget(self.default_checkbox)
+
+        self.listWidget = QListWidget()
+        for number, other in enumerate(steps, start=1):
+            if other.id == step.id:
+                continue
+            item = QListWidgetItem(f"{number}. {other.module.name}")
+            item.setData(Qt.UserRole, other.id)
+            item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+            item.setCheckState(Qt.Checked if depends_on and other.id in depends_on else Qt.Unchecked)
+            self.listWidget.addItem(item)
+        self.listWidget.setEnabled(depends_on is not None)
+        self.default_checkbox.toggled.connect(lambda checked: self.listWidget.setEnabled(not checked))
+        self.layout().addWidget(QLabel("Läuft nach (leer = sofort startbar):"))
+        self.layout().addWidget(self.listWidget)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        self.layout().addWidget(buttons)
+
+    def dependsOn(self):
+        # None = Standard-Kette, sonst Liste der Vorgänger-IDs
+        if self.default_checkbox.isChecked():
+            return None
+        return [
+            self.listWidget.item(i).data(Qt.UserRole)
+            for i in range(self.listWidget.count())
+            if self.listWidget.item(i).checkState() == Qt.Checked
+        ]
+
+
 class ModuleEditTab(QWidget):
     def __init__(self, module_data, module_tab, parent=None):
         super().__init__(parent)
@@ -338,11 +541,39 @@ class ModuleEditTab(QWidget):
         self.needs_output_checkbox.setChecked(module_data.needs_output)
         self.layout().addWidget(self.needs_output_checkbox)
 
+        # Ausführung in vorgestartetem Worker (spart Interpreter-Start und Imports)
+        self.pool_checkbox = QCheckBox("Warm-Pool verwenden (vorgestartete Worker)")
+        self.pool_checkbox.setChecked(module_data.backend == "pool")
+        self.layout().addWidget(self.pool_checkbox)
+
+        # Grenzen pro Lauf, 0 = unbegrenzt (Prozess wird samt Kindprozessen beendet)
+        limits_layout = QHBoxLayout()
+        self.timeout_spin = self.limitSpin(module_data.timeout, " s")
+        self.cpu_spin = self.limitSpin(module_data.cpu_limit, " s")
+        self.memory_spin = self.limitSpin(module_data.memory_limit_mb, " MB")
+        for text, spin in (("Timeout:", self.timeout_spin), ("CPU-Zeit:", self.cpu_spin), ("Speicher:", self.memory_spin)):
+            limits_layout.addWidget(QLabel(text))
+            limits_layout.addWidget(spin)
+        self.layout().addLayout(limits_layout)
+
         # Save
         self.save_btn = QPushButton("Save")
         self.save_btn.clicked.connect(self.saveChanges)
         self.layout().addWidget(self.save_btn)
 
+        # Hotspots profilierter Läufe (Step-Option "Profil" oder run --profile)
+        self.profile_btn = QPushButton("Profile…")
+        self.profile_btn.clicked.connect(lambda: self.module_tab.openProfileTab(self.module_data, self))
+        self.layout().addWidget(self.profile_btn)
+
+    def limitSpin(self, value, suffix):
+        spin = QSpinBox()
+        spin.setRange(0, 10 ** 6)
+        spin.setSuffix(suffix)
+        spin.setSpecialValueText("unbegrenzt")
+        spin.setValue(value or 0)
+        return spin
+
     def browseCode(self):
         # Dateiauswahl für Modulcode
         path, _ = QFileDialog.getOpenFileName(self, "Select Code File")
@@ -350,26 +581,25 @@ class ModuleEditTab(QWidget):
             self.code_edit.setText(path)
 
     def saveChanges(self):
-        # Änderungen ins DB-Modul übernehmen
-        session = SessionLocal()
-        module = session.query(Module).filter_by(id=self.module_data.id).first()
-        module.name = self.name_edit.text()
-        module.input_type = self.input_edit.text()
-        module.output_type = self.output_edit.text()
-        module.description = self.info_edit.text()
-        module.code_path = self.code_edit.text()
-        module.needs_input = self.needs_input_checkbox.isChecked()
-        module.needs_output = self.needs_output_checkbox.isChecked()
-        session.commit()
-        session.close()
-
-        # UI aktualisieren
-        self.module_tab.step_list.loadSteps()
+        # Änderungen über das Repository speichern: das gecachte Modul wird aktualisiert,
+        # alle offenen Step-Listen mit diesem Modul erneuern ihre betroffenen Zeilen
+        self.module_tab.repository.update_module(
+            self.module_data.id,
+            name=self.name_edit.text(),
+            input_type=self.input_edit.text(),
+            output_type=self.output_edit.text(),
+            description=self.info_edit.text(),
+            code_path=self.code_edit.text(),
+            needs_input=self.needs_input_checkbox.isChecked(),
+            needs_output=self.needs_output_checkbox.isChecked(),
+            backend="pool" if self.pool_checkbox.isChecked() else "subprocess",
+            timeout=self.timeout_spin.value() or None,
+            cpu_limit=self.cpu_spin.value() or None,
+            memory_limit_mb=self.memory_spin.value() or None,
+        )
         QMessageBox.information(self, "Gespeichert", "Änderungen wurden übernommen.")
 
         tabs = self.module_tab.workflow_window.tabs
         index = tabs.indexOf(self)
         if index != -1:
             tabs.removeTab(index)
-        self.module_tab.step_list.loadSteps()
-
@@ -0,0 +1,121 @@
+from PyQt5.QtWidgets import QVBoxLayout, QHBoxLayout, QWidget, QLabel, QPushButton, QComboBox, QSpinBox, QTableWidget, QTableWidgetItem, QHeaderView, QSplitter
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QColor
+
+from workflows.profiles import TOP_N, SORT_KEYS, hotspots, compare_hotspots, function_label, profiled_runs
+
+
+class ProfileTab(QWidget):
+    # Hotspots der profilierten Läufe eines Moduls: zwei Läufe nebeneinander und ein Vergleich
+    # (Differenz B - A je Funktion), z.B. vor und nach einer Code-Änderung
+    def __init__(self, module, parent=None):
+        super().__init__(parent)
+        self.module = module
+        self.setLayout(QVBoxLayout())
+
+        # Auswahl der Läufe und der Darstellung
+        controls = QHBoxLayout()
+        self.run_a = QComboBox()
+        self.run_b = QComboBox()
+        self.top_spin = QSpinBox()
+        self.top_spin.setRange(5, 500)
+        self.top_spin.setValue(TOP_N)
+        self.sort_combo = QComboBox()
+        self.sort_combo.addItems(SORT_KEYS)
+        self.reload_btn = QPushButton("Aktualisieren")
+        for text, widget in (("Lauf A:", self.run_a), ("Lauf B:", self.run_b), ("Top:", self.top_spin), ("Sortierung:", self.sort_combo)):
+            controls.addWidget(QLabel(text))
+            controls.addWidget(widget)
+        controls.addStretch()
+        controls.addWidget(self.reload_btn)
+        self.layout().addLayout(controls)
+
+        self.summary_label = QLabel()
+        self.layout().addWidget(self.summary_label)
+
+        # Oben die Top-N beider Läufe, unten der Vergleich
+        splitter = QSplitter(Qt.Vertical)
+        side_by_side = QSplitter(Qt.Horizontal)
+        self.table_a = self.hotspotTable(("Funktion", "Aufrufe", "Eigenzeit", "Gesamtzeit"))
+        self.table_b = self.hotspotTable(("Funktion", "Aufrufe", "Eigenzeit", "Gesamtzeit"))
+        side_by_side.addWidget(self.table_a)
+        side_by_side.addWidget(self.table_b)
+        splitter.addWidget(side_by_side)
+        self.compare_table = self.hotspotTable(("Funktion", "A", "B", "B - A"))
+        splitter.addWidget(self.compare_table)
+        self.layout().addWidget(splitter)
+
+        self.run_a.currentIndexChanged.connect(self.showProfiles)
+        self.run_b.currentIndexChanged.connect(self.showProfiles)
+        self.top_spin.valueChanged.connect(self.showProfiles)
+        self.sort_combo.currentIndexChanged.connect(self.showProfiles)
+        self.reload_btn.clicked.connect(self.loadRuns)
+
+        self.loadRuns()
+
+    def hotspotTable(self, headers):
+        table = QTableWidget(0, len(headers))
+        table.setHorizontalHeaderLabels(headers)
+        table.setEditTriggers(QTableWidget.NoEditTriggers)
+        table.verticalHeader().setVisible(False)
+        table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        return table
+
+    def loadRuns(self):
+        # Profilierte Läufe neu laden, die Auswahl bleibt erhalten, solange der Lauf noch existiert
+        selected = (self.run_a.currentData(), self.run_b.currentData())
+        runs = profiled_runs(self.module.id)
+        for combo, run_id, default in ((self.run_a, selected[0], 1), (self.run_b, selected[1], 0)):
+            combo.blockSignals(True)
+            combo.clear()
+            for run, workflow_name in runs:
+                started = run.started_at.strftime("%Y-%m-%d %H:%M:%S") if run.started_at else "-"
+                combo.addItem(f"#{run.id} {started} ({workflow_name}, {run.profile_mode})", (run.id, run.profile_ref))
+            index = combo.findData(run_id) if run_id is not None else -1
+            combo.setCurrentIndex(index if index != -1 else min(default, combo.count() - 1))
+            combo.blockSignals(False)
+        self.showProfiles()
+
+    def showProfiles(self):
+        n = self.top_spin.value()
+        sort = self.sort_combo.currentText()
+        a, b = self.run_a.currentData(), self.run_b.currentData()
+        if a is None:
+            self.summary_label.setText(f"Keine profilierten Läufe für {self.module.name} (Step-Option \"Profil\" oder run --profile).")
+            for table in (self.table_a, self.table_b, self.compare_table):
+                table.setRowCount(0)
+            return
+
+        # Profile können fehlen, wenn das Artefakt inzwischen verdrängt wurde
+        try:
+            rows_a, total_a = hotspots(a[1], n, sort)
+            rows_b, total_b = hotspots(b[1], n, sort)
+            compared, _, _ = compare_hotspots(a[1], b[1], n, sort)
+        except (OSError, ValueError, EOFError) as e:
+            self.summary_label.setText(f"Profil kann nicht gelesen werden: {e}")
+            return
+
+        self.summary_label.setText(f"Gesamtzeit A (#{a[0]}): {total_a:.3f}s, B (#{b[0]}): {total_b:.3f}s")
+        self.fillTable(self.table_a, [
+            (function_label(row), row["calls"], row["tottime"], row["cumtime"]) for row in rows_a
+        ])
+        self.fillTable(self.table_b, [
+            (function_label(row), row["calls"], row["tottime"], row["cumtime"]) for row in rows_b
+        ])
+        self.fillTable(self.compare_table, [
+            (row["label"], row["base"], row["other"], row["delta"]) for row in compared
+        ], delta_column=3)
+
+    def fillTable(self, table, rows, delta_column=None):
+        table.setRowCount(len(rows))
+        for r, row in enumerate(rows):
+            for c, value in enumerate(row):
+                text = value if isinstance(value, str) else (f"{value:+.4f}" if c == delta_column else
+                                                             f"{value:.4f}" if isinstance(value, float) else str(value))
+                item = QTableWidgetItem(text)
+                if c:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                # B langsamer als A rot, schneller grün
+                if c == delta_column and value:
+                    item.setForeground(QColor("red") if value > 0 else QColor("darkgreen"))
+                table.setItem(r, c, item)
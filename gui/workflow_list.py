@@ -0,0 +1,157 @@
+from bisect import bisect_left
+
+from PyQt5.QtWidgets import QStyledItemDelegate, QStyleOptionViewItem, QStyleOptionButton, QStyle, QApplication
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QVariant, QRect, QSize, QEvent
+
+from db.db_setup import Workflow, SessionLocal
+
+# Rollen für WorkflowListModel.data()
+WorkflowIdRole = Qt.UserRole
+StatusRole = Qt.UserRole + 1
+RunningRole = Qt.UserRole + 2
+
+
+class WorkflowListModel(QAbstractListModel):
+    # Workflow-Liste ohne Steps/Module: lädt nur ID + Name seitenweise (nach ID, per Keyset),
+    # weitere Seiten holt die View beim Scrollen über canFetchMore/fetchMore.
+    # Status und Run-Zustand liegen je Workflow-ID daneben und werden zeilenweise aktualisiert.
+    def __init__(self, page_size=200, parent=None):
+        super().__init__(parent)
+        self.page_size = page_size
+        self._ids = [] # aufsteigend, für bisect
+        self._names = []
+        self._state = {} # workflow_id -> (Status-Text, läuft?)
+        self._exhausted = False
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._ids)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return QVariant()
+        workflow_id = self._ids[index.row()]
+        if role == Qt.DisplayRole:
+            return self._names[index.row()]
+        if role == WorkflowIdRole:
+            return workflow_id
+        if role == StatusRole:
+            return self._state.get(workflow_id, ("Idle", False))[0]
+        if role == RunningRole:
+            return self._state.get(workflow_id, ("Idle", False))[1]
+        return QVariant()
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._exhausted:
+            return
+        session = SessionLocal()
+        try:
+            query = session.query(Workflow.id, Workflow.name)
+            if self._ids:
+                query = query.filter(Workflow.id > self._ids[-1])
+            rows = query.order_by(Workflow.id).limit(self.page_size).all()
+        finally:
+            session.close()
+        if len(rows) < self.page_size:
+            self._exhausted = True
+        if not rows:
+            return
+        first = len(self._ids)
+        self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+        self._ids.extend(row.id for row in rows)
+        self._names.extend(row.name for row in rows)
+        self.endInsertRows()
+
+    def reload(self):
+        # Von vorn laden (erste Seite), Status bleibt erhalten
+        self.beginResetModel()
+        self._ids, self._names = [], []
+        self._exhausted = False
+        self.endResetModel()
+        self.fetchMore()
+
+    def row(self, workflow_id):
+        # Zeile eines Workflows oder None, wenn (noch) nicht geladen
+        i = bisect_left(self._ids, workflow_id)
+        return i if i < len(self._ids) and self._ids[i] == workflow_id else None
+
+    def addWorkflow(self, workflow_id, name):
+        # Neuer Workflow: einfügen, wenn er im geladenen Bereich liegt, sonst kommt er mit der nächsten Seite
+        if not self._exhausted and (not self._ids or workflow_id > self._ids[-1]):
+            return
+        i = bisect_left(self._ids, workflow_id)
+        self.beginInsertRows(QModelIndex(), i, i)
+        self._ids.insert(i, workflow_id)
+        self._names.insert(i, name)
+        self.endInsertRows()
+
+    def setState(self, workflow_id, status, running=None):
+        if running is None:
+            running = self._state.get(workflow_id, ("Idle", False))[1]
+        if self._state.get(workflow_id) == (status, running):
+            return
+        self._state[workflow_id] = (status, running)
+        row = self.row(workflow_id)
+        if row is not None:
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [StatusRole, RunningRole])
+
+
+class WorkflowDelegate(QStyledItemDelegate):
+    # Zeichnet Name, Status und den Run/Stop-Button einer Zeile, ohne Widgets pro Zeile
+    STATUS_WIDTH = 120
+    BUTTON_WIDTH = 60
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.last_click = None
+
+    def editorEvent(self, event, model, option, index):
+        # Position des letzten Klicks merken (kommt vor dem clicked-Signal der View),
+        # damit zwischen Button und Zeile unterschieden werden kann
+        if event.type() == QEvent.MouseButtonRelease:
+            self.last_click = event.pos()
+        return super().editorEvent(event, model, option, index)
+
+    def hitButton(self, rect):
+        return self.last_click is not None and self.buttonRect(rect).contains(self.last_click)
+
+    def buttonRect(self, rect):
+        return QRect(rect.right() - self.BUTTON_WIDTH, rect.top() + 2, self.BUTTON_WIDTH, rect.height() - 4)
+
+    def statusRect(self, rect):
+        return QRect(rect.right() - self.BUTTON_WIDTH - self.STATUS_WIDTH - 6, rect.top(), self.STATUS_WIDTH, rect.height())
+
+    def paint(self, painter, option, index):
+        opt = QStyleOptionViewItem(option)
+        self.initStyleOption(opt, index)
+        widget = opt.widget
+        style = widget.style() if widget is not None else QApplication.style()
+
+        # Hintergrund/Auswahl wie ein normales Item, Text selbst zeichnen
+        name = opt.text
+        opt.text = ""
+        style.drawControl(QStyle.CE_ItemViewItem, opt, painter, widget)
+
+        rect = option.rect
+        status_rect = self.statusRect(rect)
+        name_rect = QRect(rect.left() + 6, rect.top(), status_rect.left() - rect.left() - 12, rect.height())
+
+        painter.save()
+        if option.state & QStyle.State_Selected:
+            painter.setPen(option.palette.highlightedText().color())
+        painter.drawText(name_rect, Qt.AlignVCenter | Qt.AlignLeft,
+                         option.fontMetrics.elidedText(name, Qt.ElideRight, name_rect.width()))
+        painter.drawText(status_rect, Qt.AlignVCenter | Qt.AlignLeft, index.data(StatusRole))
+        painter.restore()
+
+        button = QStyleOptionButton()
+        button.rect = self.buttonRect(rect)
+        button.text = "■" if index.data(RunningRole) else "▶"
+        button.state = QStyle.State_Enabled | QStyle.State_Raised
+        style.drawControl(QStyle.CE_PushButton, button, painter, widget)
+
+    def sizeHint(self, option, index):
+        return QSize(option.rect.width(), max(option.fontMetrics.height() + 12, 30))
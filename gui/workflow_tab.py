@@ -1,11 +1,14 @@
-from PyQt5.QtWidgets import QVBoxLayout, QWidget, QPushButton, QListWidget, QInputDialog, QLabel, QTextEdit, QHBoxLayout, QListWidgetItem
-from PyQt5.QtCore import Qt
-
-from db.db_setup import Workflow, SessionLocal, WorkflowInstance
-from .module_run import ModuleRunThread
-from .module_tab import WorkflowStep, ModuleTab
-from sqlalchemy.orm import joinedload
-from datetime import datetime
+from PyQt5.QtWidgets import QVBoxLayout, QWidget, QPushButton, QListView, QInputDialog, QLabel, QHBoxLayout, QMenu, QMessageBox
+from PyQt5.QtCore import Qt, QTimer
+
+from db.repository import get_repository
+from .module_run import create_workflow_run
+from .log_view import LogView
+from workflows.artifacts import get_artifact_store
+from workflows.engine import finish_workflow_instance, load_workflow, resumable_instance, resume_plan, adopt_results
+from workflows.scheduler import get_scheduler
+from .module_tab import ModuleTab
+from .workflow_list import WorkflowListModel, WorkflowDelegate, WorkflowIdRole, RunningRole
 
 class UseCaseTab(QWidget):
     def __init__(self, workflow_window, parent=None):
@@ -13,8 +16,13 @@ class UseCaseTab(QWidget):
         self.workflow_window = workflow_window
         self.setLayout(QVBoxLayout())
 
-        # Liste mit allen Workflows
-        self.useCaseList = QListWidget()
+        # Liste mit allen Workflows (Model/View, seitenweise geladen)
+        self.useCaseModel = WorkflowListModel(parent=self)
+        self.useCaseDelegate = WorkflowDelegate(self)
+        self.useCaseList = QListView()
+        self.useCaseList.setModel(self.useCaseModel)
+        self.useCaseList.setItemDelegate(self.useCaseDelegate)
+        self.useCaseList.setUniformItemSizes(True)
         self.layout().addWidget(self.useCaseList)
 
         # Button zum neuen Workflow anlegen
@@ -22,157 +30,188 @@ class UseCaseTab(QWidget):
         self.layout().addWidget(self.addUseCaseBtn)
         self.addUseCaseBtn.clicked.connect(self.addUseCase)
 
-        # Logs (Ausgaben beim Ausführen)
-        self.log_text = QTextEdit()
-        self.log_text.setReadOnly(True)
+        # Logs (Ausgaben beim Ausführen), gebündelt und mit begrenztem Speicher
+        self.log_text = LogView()
 
         h_layout = QHBoxLayout()
 
+        # Statistik des Ergebnis-Caches
+        self.cache_label = QLabel()
+        h_layout.addWidget(self.cache_label)
+        h_layout.addStretch()
+        self.updateCacheStats()
+
         self.layout().addLayout(h_layout)
         self.layout().addWidget(QLabel("Logs:"))
         self.layout().addWidget(self.log_text)
 
-        # Thread-Handle für laufende Workflows
-        self.run_thread = None
-        self.current_workflow = None
+        # Läufe je Workflow-ID
+        self.tickets = {} # workflow_id -> RunTicket
+        self.threads = {} # workflow_id -> Run-Thread
+
+        # Wartende Läufe: Position und Wartezeit in der Status-Spalte anzeigen
+        self.queued = {} # RunTicket -> workflow_id
+        self.queue_timer = QTimer(self)
+        self.queue_timer.timeout.connect(self.updateQueueStatus)
+        self.queue_timer.start(1000)
 
         # Workflows beim Start laden
         self.loadUseCases()
-        self.useCaseList.itemClicked.connect(self.selectUseCase)
-
-    def get_or_create_workflow_instance(self, workflow_id):
-        #Sorgt dafür, dass es eine Workflow-Instanz in der DB gibt (neu oder reaktiviert)
-        session = SessionLocal()
-        instance = (
-            session.query(WorkflowInstance)
-            .filter_by(workflow_id=workflow_id)
-            .order_by(WorkflowInstance.started_at.desc())
-            .first()
+        self.useCaseList.clicked.connect(self.useCaseClicked)
+        # Kontextmenü: Starten, Fortsetzen nach Fehler
+        self.useCaseList.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.useCaseList.customContextMenuRequested.connect(self.useCaseMenu)
+        get_repository().subscribe(self.repositoryChanged)
+
+    def updateQueueStatus(self):
+        scheduler = get_scheduler()
+        for ticket, workflow_id in list(self.queued.items()):
+            if ticket.state != "pending":
+                del self.queued[ticket]
+                continue
+            position = scheduler.position(ticket)
+            self.useCaseModel.setState(workflow_id, f"Queued #{position} ({ticket.wait_time():.0f}s)")
+
+    def updateCacheStats(self):
+        stats = get_artifact_store().stats()
+        self.cache_label.setText(
+            f"Cache: {stats['hits']} Treffer / {stats['misses']} Fehlzugriffe "
+            f"({stats['hit_rate']:.0%}), {stats['bytes'] / (1024 * 1024):.1f} MB"
         )
-        if instance:
-            # Falls schon vorhanden → neu starten
-            instance.status = "running"
-            instance.started_at = datetime.now()
-            instance.finished_at = None
-            session.commit()
-        else:
-            # Neue Instanz anlegen
-            instance = WorkflowInstance(
-                workflow_id=workflow_id,
-                status="running",
-                started_at=datetime.now()
-            )
-            session.add(instance)
-            session.commit()
-        workflow_instance_id = instance.id
-        session.expunge(instance) # DB-Objekt vom Session-Kontext lösen
-        session.close()
-        return workflow_instance_id
-
-    
+
     def loadUseCases(self):
-        #Alle Workflows aus der DB laden und in die Liste eintragen
-        self.useCaseList.clear()
-        session = SessionLocal()
-        workflows = (
-            session.query(Workflow)
-            .options(joinedload(Workflow.steps).joinedload(WorkflowStep.module))
-            .all()
-        )
-        session.expunge_all()
-        session.close()
-
-        for wf in workflows:
-            item_widget = QWidget()
-            layout = QHBoxLayout()
-            layout.setContentsMargins(0, 0, 0, 0)
-
-            # Name + Status-Label
-            label = QLabel(wf.name)
-            status_label = QLabel("Idle")
-            status_label.setFixedWidth(80)
-
-            # Run/Stop-Button
-            run_btn = QPushButton("▶")
-            run_btn.setMaximumWidth(60)
-
-            def toggle_run(checked=False, workflow=wf, btn=run_btn, status=status_label):
-                
-                # Wenn Workflow schon läuft → abbrechen
-                if hasattr(workflow, "_thread") and workflow._thread.isRunning():
-                    workflow._thread.stop()
-                    status.setText("Stopping...")
-                    return
-
-                # Neue Workflow-Instanz besorgen
-                workflow_instance_id = self.get_or_create_workflow_instance(workflow.id)
-
-                # Steps sortieren
-                steps = sorted(workflow.steps, key=lambda s: s.position)
-
-                # Thread starten
-                thread = ModuleRunThread(steps, workflow_instance_id)
-                workflow._thread = thread
-                thread.log_signal.connect(self.log_text.append)
-                thread.error_signal.connect(lambda e: self.log_text.append(f"ERROR: {e}"))
-
-                def finished():
-                    # Status aktualisieren, DB-Eintrag fertigstellen
-                    status.setText("Finished")
-                    btn.setText("▶")
-                    session = SessionLocal()
-                    inst = session.get(WorkflowInstance, workflow_instance_id)
-                    inst.status = "finished"
-                    inst.finished_at = datetime.now()
-                    session.commit()
-                    session.close()
-                thread.finished_signal.connect(finished)
-
-                # Workflow starten
-                thread.start()
-                status.setText("Running")
-                btn.setText("■")
-
-            run_btn.clicked.connect(toggle_run)
-
-            layout.addWidget(label)
-            layout.addWidget(status_label)
-            layout.addWidget(run_btn)
-
-            item_widget.setLayout(layout)
-            list_item = QListWidgetItem()
-            list_item.setSizeHint(item_widget.sizeHint())
-            list_item.setData(Qt.UserRole, wf) # Workflow-Objekt ins Item hängen
-            self.useCaseList.addItem(list_item)
-            self.useCaseList.setItemWidget(list_item, item_widget)
-        
+        # Erste Seite der Workflows laden, weitere holt die View beim Scrollen
+        self.useCaseModel.reload()
+
+    def useCaseClicked(self, index):
+        # Klick auf den Button startet/stoppt, sonst wird der Workflow geöffnet
+        if self.useCaseDelegate.hitButton(self.useCaseList.visualRect(index)):
+            self.toggleRun(index.data(WorkflowIdRole))
+        else:
+            self.selectUseCase(index)
+
+    def toggleRun(self, workflow_id):
+        model = self.useCaseModel
+
+        # Wartet der Workflow noch in der Warteschlange → herausnehmen
+        ticket = self.tickets.get(workflow_id)
+        if ticket is not None and ticket.state == "pending":
+            get_scheduler().cancel(ticket)
+            model.setState(workflow_id, "Cancelled", running=False)
+            return
+
+        # Wenn Workflow schon läuft → abbrechen
+        thread = self.threads.get(workflow_id)
+        if thread is not None and thread.isRunning():
+            thread.stop()
+            model.setState(workflow_id, "Stopping...")
+            return
+
+        self.startRun(workflow_id)
+
+    def useCaseMenu(self, pos):
+        index = self.useCaseList.indexAt(pos)
+        if not index.isValid():
+            return
+        workflow_id = index.data(WorkflowIdRole)
+        busy = index.data(RunningRole)
+        menu = QMenu(self)
+        start_action = menu.addAction("Starten")
+        start_action.setEnabled(not busy)
+        # Fortsetzen nur, wenn der letzte Lauf fehlgeschlagen ist
+        failed_instance = None if busy else resumable_instance(workflow_id)
+        resume_action = menu.addAction(
+            f"Ab Fehler fortsetzen (Instanz {failed_instance})" if failed_instance else "Ab Fehler fortsetzen")
+        resume_action.setEnabled(failed_instance is not None)
+        menu.addSeparator()
+        open_action = menu.addAction("Öffnen")
+
+        action = menu.exec_(self.useCaseList.viewport().mapToGlobal(pos))
+        if action is start_action:
+            self.startRun(workflow_id)
+        elif action is resume_action:
+            self.startRun(workflow_id, resume_from=failed_instance)
+        elif action is open_action:
+            self.selectUseCase(index)
+
+    def startRun(self, workflow_id, resume_from=None):
+        # resume_from: fehlgeschlagene Instanz, deren fertige Steps übernommen werden
+        model = self.useCaseModel
+        reused = {}
+        if resume_from is not None:
+            try:
+                workflow, reused = resume_plan(resume_from)
+            except (LookupError, ValueError) as e:
+                QMessageBox.warning(self, "Fortsetzen nicht möglich", str(e))
+                return
+        else:
+            # Steps + Module erst jetzt laden (aktueller Stand aus der DB)
+            workflow = load_workflow(workflow_id)
+        if workflow is None:
+            print(f"Workflow {workflow_id} nicht gefunden!")
+            return
+
+        def start(ticket):
+            # Vom Scheduler aufgerufen, sobald genug Prozess-Slots frei sind
+            steps = sorted(workflow.steps, key=lambda s: s.position)
+            completed = None
+            if resume_from is not None:
+                completed = adopt_results(ticket.instance_id, steps, reused, resume_from)
+                self.log_text.append(
+                    f"Fortsetzung von Instanz {resume_from}: {len(completed)} von {len(steps)} Steps übernommen.")
+            thread = create_workflow_run(steps, ticket.instance_id, workflow.max_parallel, bool(workflow.pipeline),
+                                         completed=completed)
+            self.threads[workflow_id] = thread
+            self.log_text.attach(thread)
+
+            def finished():
+                # Status aktualisieren, DB-Eintrag fertigstellen, Slots freigeben
+                result = finish_workflow_instance(ticket.instance_id, thread.step_status)
+                model.setState(workflow_id, "Finished" if result == "finished" else "Failed", running=False)
+                if self.threads.get(workflow_id) is thread:
+                    del self.threads[workflow_id]
+                    self.tickets.pop(workflow_id, None)
+                self.updateCacheStats()
+                get_scheduler().release(ticket)
+            thread.finished_signal.connect(finished)
+
+            # Workflow starten
+            thread.start()
+            model.setState(workflow_id, "Running")
+
+        # In die Warteschlange einreihen (startet sofort, wenn Kapazität frei ist)
+        model.setState(workflow_id, "Queued", running=True)
+        ticket = get_scheduler().submit(workflow, start, resumed_from_id=resume_from)
+        self.tickets[workflow_id] = ticket
+        self.queued[ticket] = workflow_id
 
     def addUseCase(self):
         #Dialog öffnen, neuen Workflow-Namen abfragen und in DB speichern
         usecase_name, ok = QInputDialog.getText(self, 'New Workflow', 'Workflow Name:')
         if ok and usecase_name:
-            session = SessionLocal()
-            new_workflow = Workflow(name=usecase_name)
-            session.add(new_workflow)
-            session.commit()
-            session.close()
+            get_repository().create_workflow(usecase_name) # Liste wird über repositoryChanged ergänzt
+
+    def repositoryChanged(self, change):
+        # Neue Workflows (auch aus anderen Fenstern) in die Liste übernehmen
+        if change.kind != "workflow":
+            return
+        if change.action == "added":
+            repository = get_repository()
+            for workflow_id in change.ids:
+                self.useCaseModel.addWorkflow(workflow_id, repository.workflow(workflow_id).name)
+        elif change.action == "invalidated" and not change.ids:
             self.loadUseCases()
-    
-    def selectUseCase(self, item):
-        #Wenn Workflow in der Liste angeklickt wird → im neuen Tab öffnen
-        workflow = item.data(Qt.UserRole)  # Direkt aus dem Item holen
 
-        if not workflow:
+    def selectUseCase(self, index):
+        #Wenn Workflow in der Liste angeklickt wird → im neuen Tab öffnen
+        if not index.isValid():
             print("Kein Workflow gefunden!")
             return
 
-        self.current_workflow = workflow
+        name = index.data(Qt.DisplayRole)
         self.log_text.clear()
 
-        # ModuleTab für diesen Workflow öffnen
-        module_tab = ModuleTab(workflow.name, self.workflow_window)
-        self.workflow_window.tabs.addTab(module_tab, f"Modules: {workflow.name}")
+        # ModuleTab für diesen Workflow öffnen (lädt Steps selbst)
+        module_tab = ModuleTab(name, self.workflow_window)
+        self.workflow_window.tabs.addTab(module_tab, f"Modules: {name}")
         self.workflow_window.tabs.setCurrentWidget(module_tab)
-
-    
-
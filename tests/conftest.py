@@ -0,0 +1,66 @@
+import os
+import sys
+import tempfile
+
+# Eigene SQLite-DB, Artefakt- und Blob-Verzeichnisse für die Tests, bevor db/workflows importiert werden
+TEST_DIR = tempfile.mkdtemp(prefix="workflow-tests-")
+os.environ["WORKFLOWS_DB_URL"] = f"sqlite:///{os.path.join(TEST_DIR, 'test.db')}"
+os.environ["WORKFLOW_ARTIFACT_DIR"] = os.path.join(TEST_DIR, "artifacts")
+os.environ["WORKFLOW_BLOB_DIR"] = os.path.join(TEST_DIR, "blobs")
+os.environ["WORKFLOW_POOL_PRELOAD"] = ""
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def database():
+    from db.db_setup import init_db, engine
+    init_db()
+    return engine
+
+
+@pytest.fixture
+def module_run(database):
+    # Leerer ModuleRun (Status running) für Log-/Status-Tests
+    from db.db_setup import SessionLocal, ModuleRun
+    session = SessionLocal()
+    try:
+        run = ModuleRun(status="running")
+        session.add(run)
+        session.commit()
+        return run.id
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def make_workflow(database, tmp_path):
+    # Workflow mit einem Step je Modul-Skript anlegen; steps: [(Code, Step-Parameter)], Rückgabe: Workflow-ID
+    from db.db_setup import SessionLocal, Workflow, WorkflowStep, Module
+    counter = iter(range(10 ** 6))
+
+    def make(steps, needs_input=(), backend="subprocess", **values):
+        # needs_input: Nummern (ab 1) der Steps, die Eingaben lesen
+        session = SessionLocal()
+        try:
+            n = next(counter)
+            workflow = Workflow(name=f"{tmp_path.name}-{n}", **values)
+            session.add(workflow)
+            session.flush()
+            for i, (code, parameters) in enumerate(steps, start=1):
+                path = tmp_path / f"module_{n}_{i}.py"
+                path.write_text(code)
+                module = Module(name=f"m{i}", code_path=str(path), needs_input=i in needs_input,
+                                needs_output=True, backend=backend)
+                session.add(module)
+                session.flush()
+                session.add(WorkflowStep(workflow_id=workflow.id, module_id=module.id, position=i * 1024,
+                                         parameters=parameters))
+            session.commit()
+            return workflow.id
+        finally:
+            session.close()
+    return make
@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta
+
+from db import archive
+from db.db_setup import SessionLocal, WorkflowInstance, ModuleRun, ModuleRunLogChunk
+from db.log_store import iter_lines
+from workflows.engine import run_workflow
+
+
+def quiet(line):
+    pass
+
+
+def instance_ids(workflow_id):
+    session = SessionLocal()
+    try:
+        return [row.id for row in session.query(WorkflowInstance.id)
+                .filter(WorkflowInstance.workflow_id == workflow_id).order_by(WorkflowInstance.id)]
+    finally:
+        session.close()
+
+
+def runs_of(instance_ids):
+    session = SessionLocal()
+    try:
+        return [row.id for row in session.query(ModuleRun.id).filter(ModuleRun.workflow_instance_id.in_(instance_ids))]
+    finally:
+        session.close()
+
+
+def test_retention_archives_in_batches(make_workflow, tmp_path, monkeypatch):
+    workflow_id = make_workflow([("print('eins')\nprint('zwei')\n", {"cache": False})])
+    for _ in range(5):
+        assert run_workflow(workflow_id, emit=quiet)[1] == "finished"
+    ids = instance_ids(workflow_id)
+    old_runs = runs_of(ids[:3])
+
+    # Probelauf zählt nur
+    assert archive.apply_retention(workflow_id, keep_runs=2, keep_days=0, root=str(tmp_path), dry_run=True) == {workflow_id: 3}
+    assert instance_ids(workflow_id) == ids
+
+    batches = []
+    archive_instances = archive.archive_instances
+    monkeypatch.setattr(archive, "archive_instances", lambda batch, root: batches.append(list(batch)) or archive_instances(batch, root))
+    assert archive.apply_retention(workflow_id, keep_runs=2, keep_days=0, root=str(tmp_path), batch_size=2) == {workflow_id: 3}
+    assert batches == [ids[:2], ids[2:3]]
+
+    # Nur die neuesten zwei bleiben in der DB, Runs und Log-Chunks der übrigen sind gelöscht
+    assert instance_ids(workflow_id) == ids[3:]
+    assert runs_of(ids[:3]) == []
+    session = SessionLocal()
+    try:
+        assert session.query(ModuleRunLogChunk).filter(ModuleRunLogChunk.module_run_id.in_(old_runs)).count() == 0
+    finally:
+        session.close()
+    assert list(iter_lines(runs_of(ids[3:4])[0])) == ["eins", "zwei"]
+
+    # ... und lassen sich aus dem Archiv zurücklesen
+    entries = archive.archived_instances(workflow_id)
+    assert [entry.instance_id for entry in entries] == sorted(ids[:3], reverse=True)
+    entry = archive.find_archive(ids[0])
+    assert (entry.status, entry.run_count) == ("finished", 1)
+    instance, runs = archive.read_archive(entry.path, logs=True)
+    assert (instance["id"], instance["status"]) == (ids[0], "finished")
+    assert [run["id"] for run in runs] == old_runs[:1]
+    assert runs[0]["log"] == ["eins", "zwei"]
+    assert list(archive.iter_archived_log(entry.path, old_runs[0])) == ["eins", "zwei"]
+
+
+def test_running_and_recent_instances_are_kept(make_workflow, tmp_path):
+    workflow_id = make_workflow([("print(1)\n", {"cache": False})])
+    for _ in range(3):
+        run_workflow(workflow_id, emit=quiet)
+    ids = instance_ids(workflow_id)
+    session = SessionLocal()
+    try:
+        # Älteste Instanz läuft noch, die zweite ist jünger als keep_days
+        session.query(WorkflowInstance).filter(WorkflowInstance.id == ids[0]).update(
+            {"status": "running", "started_at": datetime.now() - timedelta(days=10)})
+        session.query(WorkflowInstance).filter(WorkflowInstance.id == ids[1]).update(
+            {"started_at": datetime.now() - timedelta(days=1)})
+        session.commit()
+    finally:
+        session.close()
+    session = SessionLocal()
+    try:
+        assert archive.expired_instances(session, workflow_id, keep_runs=1, keep_days=0) == [ids[1]]
+        assert archive.expired_instances(session, workflow_id, keep_runs=0, keep_days=5) == []
+    finally:
+        session.close()
+    assert archive.apply_retention(workflow_id, keep_runs=0, keep_days=5, root=str(tmp_path)) == {}
@@ -0,0 +1,56 @@
+import os
+
+from workflows.artifacts import ArtifactStore
+
+
+def test_cache_key_composition(tmp_path):
+    store = ArtifactStore(str(tmp_path / "store"))
+    code = tmp_path / "module.py"
+    code.write_text("print(1)\n")
+    key = store.cache_key(str(code), "abc", {"n": 1, "mode": "x"})
+
+    # Parameter-Reihenfolge und reine Steuer-Parameter ändern den Schlüssel nicht
+    assert store.cache_key(str(code), "abc", {"mode": "x", "n": 1, "timeout": 5, "profile": "sample"}) == key
+    assert store.cache_key(str(code), "abc", {"n": 2, "mode": "x"}) != key
+    assert store.cache_key(str(code), "abd", {"n": 1, "mode": "x"}) != key
+    assert store.cache_key(str(code), None, {"n": 1, "mode": "x"}) != key
+    code.write_text("print(2)\n")
+    assert store.cache_key(str(code), "abc", {"n": 1, "mode": "x"}) != key
+
+
+def test_lru_eviction_by_size(tmp_path):
+    store = ArtifactStore(str(tmp_path / "store"), max_bytes=300)
+    first, second, third = (store.put_bytes(bytes([i]) * 100) for i in range(3))
+    for age, digest in enumerate((first, second, third)):
+        os.utime(store.path(digest), (1000 + age, 1000 + age))
+    assert store.stats()["bytes"] == 300
+
+    # Zugriff über den Cache macht first zum zuletzt benutzten Objekt
+    store.record("key", first)
+    assert store.lookup("key") == first
+    fourth = store.put_bytes(b"x" * 100)
+
+    # über der Grenze -> bis auf 90 % verdrängen, die am längsten unbenutzten zuerst
+    assert [store.exists(d) for d in (first, second, third, fourth)] == [True, False, False, True]
+    assert store.stats()["bytes"] == 200
+    assert store.stats()["evictions"] == 2
+    # verdrängtes Objekt: Schlüssel zeigt ins Leere -> Fehlzugriff
+    store.record("old", second)
+    assert store.lookup("old") is None
+
+
+def test_hit_miss_stats_persist(tmp_path):
+    root = str(tmp_path / "store")
+    store = ArtifactStore(root)
+    digest = store.put_bytes(b"ergebnis")
+    store.record("key", digest)
+    assert store.lookup("key") == digest
+    assert store.lookup("unbekannt") is None
+    assert store.lookup("key") == digest
+    stats = store.stats()
+    assert (stats["hits"], stats["misses"]) == (2, 1)
+    assert abs(stats["hit_rate"] - 2 / 3) < 1e-9
+
+    reopened = ArtifactStore(root)
+    assert (reopened.stats()["hits"], reopened.stats()["misses"]) == (2, 1)
+    assert reopened.stats()["bytes"] == len(b"ergebnis")
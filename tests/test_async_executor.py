@@ -0,0 +1,35 @@
+import asyncio
+import io
+import time
+from types import SimpleNamespace
+
+from workflows.async_executor import execute_subprocess
+from workflows.limits import Limits
+
+
+def execute(tmp_path, code, limits=None, output=None):
+    path = tmp_path / "module.py"
+    path.write_text(code)
+    lines = []
+    result = asyncio.run(execute_subprocess(SimpleNamespace(code_path=str(path)), [], None, output,
+                                            lines.extend, limits))
+    return result, lines
+
+
+def test_output_written_in_order(tmp_path):
+    output = io.BytesIO()
+    (return_code, reason, _), lines = execute(tmp_path, "for i in range(20000):\n    print(f'{i:08d}')\n",
+                                              output=output)
+    assert (return_code, reason) == (0, None)
+    assert output.getvalue() == "".join(f"{i:08d}\n" for i in range(20000)).encode()
+    assert len(lines) == 20000
+
+
+def test_timeout_after_streams_closed(tmp_path):
+    # Modul schließt stdout/stderr und läuft weiter: das Timeout muss trotzdem greifen
+    code = "import os, time\nos.close(1)\nos.close(2)\ntime.sleep(60)\n"
+    started = time.monotonic()
+    (return_code, reason, _), _ = execute(tmp_path, code, Limits(timeout=1))
+    assert reason == "timeout"
+    assert return_code is not None
+    assert time.monotonic() - started < 15
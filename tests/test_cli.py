@@ -0,0 +1,24 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Prüft im frischen Interpreter, welche schweren Module geladen wurden
+PROBE = """
+import sys
+from workflows.cli import main
+try:
+    main(sys.argv[1:])
+except SystemExit:
+    pass
+print(sorted({m.split(".")[0] for m in sys.modules} & {"sqlalchemy", "db", "PyQt5"}))
+"""
+
+
+@pytest.mark.parametrize("argv", [["--help"], ["run", "--help"], ["unbekannt"]])
+def test_help_and_usage_errors_do_not_import_db(argv):
+    result = subprocess.run([sys.executable, "-c", PROBE, *argv], cwd=ROOT, capture_output=True, text=True)
+    assert result.stdout.splitlines()[-1] == "[]"
@@ -0,0 +1,72 @@
+import pytest
+from sqlalchemy import create_engine
+
+from db.db_setup import Base
+from db.job_queue import runs, claim_jobs, heartbeat, update_job, release_job, requeue_expired, cancel_job, job_state
+
+
+@pytest.fixture
+def bind(tmp_path):
+    # Eigene Datenbank: die Warteschlange soll nur die Jobs dieses Tests sehen
+    bind = create_engine(f"sqlite:///{tmp_path / 'queue.db'}")
+    Base.metadata.create_all(bind)
+    return bind
+
+
+def add_jobs(bind, n):
+    with bind.begin() as conn:
+        return [
+            conn.execute(runs.insert().values(status="pending", job={"inputs": [], "parameters": None},
+                                              attempts=0, cancel_requested=False)).inserted_primary_key[0]
+            for _ in range(n)
+        ]
+
+
+def attempts(bind, run_id):
+    with bind.connect() as conn:
+        return conn.execute(runs.select().where(runs.c.id == run_id)).one().attempts
+
+
+def test_claim_oldest_first_once(bind):
+    first, second, third = add_jobs(bind, 3)
+    assert claim_jobs("a", limit=2, bind=bind) == [first, second]
+    assert claim_jobs("b", limit=2, bind=bind) == [third]
+    assert claim_jobs("b", bind=bind) == []
+
+    assert job_state(first, bind=bind) == ("running", None, "a")
+    assert attempts(bind, first) == 1
+    # Heartbeat gilt nur für eigene Claims
+    assert heartbeat("a", [first, third], bind=bind) == ({first}, set())
+    assert not update_job(third, "a", bind=bind, output_ref="x")
+
+
+def test_expired_claim_is_requeued(bind):
+    (job,) = add_jobs(bind, 1)
+    assert claim_jobs("a", lease=-1, bind=bind) == [job]
+    assert requeue_expired(max_attempts=2, bind=bind) == [(job, "pending", "a")]
+    assert job_state(job, bind=bind) == ("pending", None, None)
+
+    # Der alte Agent hat den Job verloren, ein anderer übernimmt ihn
+    assert heartbeat("a", [job], bind=bind) == (set(), set())
+    assert claim_jobs("b", lease=-1, bind=bind) == [job]
+    assert not update_job(job, "a", bind=bind, status="finished")
+    assert attempts(bind, job) == 2
+
+    # Nach max_attempts Versuchen nicht mehr einreihen
+    assert requeue_expired(max_attempts=2, bind=bind) == [(job, "failed", "b")]
+    assert claim_jobs("c", bind=bind) == []
+
+
+def test_release_and_cancel(bind):
+    released, cancelled = add_jobs(bind, 2)
+    assert claim_jobs("a", limit=2, bind=bind) == [released, cancelled]
+
+    # Zurückgegebene Jobs zählen nicht als Versuch
+    assert release_job(released, "a", bind=bind)
+    assert job_state(released, bind=bind) == ("pending", None, None)
+    assert attempts(bind, released) == 0
+
+    # Abbruch eines laufenden Jobs: der Agent erfährt es beim Heartbeat, ein toter Agent per Ablauf
+    cancel_job(cancelled, bind=bind)
+    assert heartbeat("a", [cancelled], lease=-1, bind=bind) == ({cancelled}, {cancelled})
+    assert requeue_expired(bind=bind) == [(cancelled, "cancelled", "a")]
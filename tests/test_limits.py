@@ -0,0 +1,64 @@
+import io
+import signal
+import subprocess
+import sys
+from types import SimpleNamespace
+
+from workflows.limits import Limits, rlimit_preexec, classify
+from workflows.runner import _execute_in_pool
+from workflows.usage import track, wait_exit, reap
+
+
+def test_classify_basic():
+    assert classify(0, None) == "finished"
+    assert classify(1, None) == "failed"
+    assert classify(-signal.SIGTERM, "cancelled") == "cancelled"
+    assert classify(1, None, ["MemoryError"]) == "oom"
+    assert classify(-signal.SIGXCPU, None, (), Limits(cpu=1)) == "timeout"
+
+
+def test_sigkill_is_not_oom_without_evidence():
+    usage = {"cpu_user": 0.2, "cpu_system": 0.0, "max_rss_kb": 50 * 1024}
+    assert classify(-signal.SIGKILL, None, (), Limits(), usage) == "failed"
+    assert classify(-signal.SIGKILL, None, (), Limits(memory_mb=1000), usage) == "failed"
+    assert classify(-signal.SIGKILL, None, (), Limits(memory_mb=50), usage) == "oom"
+
+
+def test_sigkill_at_cpu_limit_is_timeout():
+    usage = {"cpu_user": 2.0, "cpu_system": 0.05, "max_rss_kb": None}
+    assert classify(-signal.SIGKILL, None, (), Limits(cpu=2, memory_mb=100), usage) == "timeout"
+
+
+def test_hard_cpu_limit_kill():
+    # Modul ignoriert SIGXCPU, der Kernel beendet es an der harten Grenze (cpu + 1) mit SIGKILL
+    code = "import signal\nsignal.signal(signal.SIGXCPU, signal.SIG_IGN)\nwhile True:\n    pass\n"
+    limits = Limits(cpu=1, memory_mb=4096)
+    process = subprocess.Popen([sys.executable, "-c", code], start_new_session=True, preexec_fn=rlimit_preexec(limits))
+    track(process)
+    wait_exit(process, 30)
+    usage = reap(process)
+    assert process.returncode == -signal.SIGKILL
+    assert classify(process.returncode, None, (), limits, usage) == "timeout"
+
+
+def test_limits_apply_from_the_start_and_to_children():
+    # Ein sofort gestarteter Kindprozess sieht die Grenzen schon (kein Fenster nach dem Start)
+    code = ("import resource, subprocess, sys\n"
+            "print(resource.getrlimit(resource.RLIMIT_CPU)[0])\n"
+            "subprocess.run([sys.executable, '-c', 'import resource; print(resource.getrlimit(resource.RLIMIT_AS)[0])'])\n")
+    limits = Limits(cpu=7, memory_mb=2048)
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                            preexec_fn=rlimit_preexec(limits)).stdout.split()
+    assert output == ["7", str(2048 * 1024 * 1024)]
+    assert rlimit_preexec(Limits(timeout=5)) is None
+
+
+def test_pool_backend_warns_about_ignored_limits(tmp_path):
+    script = tmp_path / "module.py"
+    script.write_text("print('ok')\n")
+    lines = []
+    return_code, reason, _ = _execute_in_pool(SimpleNamespace(code_path=str(script)), [], None, io.BytesIO(),
+                                              lines.extend, None, Limits(memory_mb=256))
+    assert (return_code, reason) == (0, None)
+    assert lines[0].startswith("WARNUNG: CPU-/Speichergrenze")
+    assert lines[-1] == "ok"
@@ -0,0 +1,86 @@
+import time
+
+from db import log_writer
+from db.db_setup import SessionLocal, ModuleRun
+from db.log_store import iter_lines
+from db.log_writer import LogWriter
+
+
+def run_status(run_id):
+    session = SessionLocal()
+    try:
+        return session.get(ModuleRun, run_id).status.value
+    finally:
+        session.close()
+
+
+def wait_for(condition, timeout=10):
+    end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < end
+        time.sleep(0.01)
+
+
+def failing(times, function):
+    # function, die die ersten times Aufrufe mit einem (vorübergehenden) DB-Fehler abbricht
+    calls = []
+    def wrapper(*args, **kwargs):
+        calls.append(1)
+        if len(calls) <= times:
+            raise RuntimeError("database is locked")
+        return function(*args, **kwargs)
+    return wrapper
+
+
+def test_transient_log_error_keeps_lines_and_status(database, module_run, monkeypatch):
+    monkeypatch.setattr(log_writer, "RETRY_DELAY", 0.2)
+    monkeypatch.setattr(log_writer, "append_lines", failing(2, log_writer.append_lines))
+    writer = LogWriter(bind=database, flush_interval=0.01)
+    writer.start()
+    try:
+        writer.append_lines(module_run, ["eins", "zwei"])
+        writer.finish_run(module_run, status="finished")
+        # Der Endstatus wartet auf die Log-Zeilen
+        assert run_status(module_run) == "running"
+        # Wer den Endstatus sieht, findet auch das vollständige Log
+        wait_for(lambda: run_status(module_run) == "finished")
+        assert list(iter_lines(module_run)) == ["eins", "zwei"]
+        writer.append_log(module_run, "drei")
+        wait_for(lambda: list(iter_lines(module_run)) == ["eins", "zwei", "drei"])
+    finally:
+        writer.stop()
+    assert writer.counters()["retries"] >= 2
+    assert writer.counters()["dropped_lines"] == 0
+
+
+def test_spilled_lines_survive_failure(database, module_run, monkeypatch):
+    monkeypatch.setattr(log_writer, "RETRY_DELAY", 0.01)
+    monkeypatch.setattr(log_writer, "SPILL_BLOCK", 64)
+    monkeypatch.setattr(log_writer, "append_lines", failing(3, log_writer.append_lines))
+    writer = LogWriter(bind=database, flush_interval=0.01, max_buffer=200)
+    lines = [f"zeile {i}" for i in range(100)]
+    for i in range(0, 100, 10):
+        writer.append_lines(module_run, lines[i:i + 10]) # über max_buffer -> LogSpill
+    writer.set_status(module_run, status="finished")
+    writer.start()
+    try:
+        wait_for(lambda: list(iter_lines(module_run)) == lines)
+    finally:
+        writer.stop()
+    assert run_status(module_run) == "finished"
+
+
+def test_lines_dropped_after_max_retries(database, module_run, monkeypatch):
+    monkeypatch.setattr(log_writer, "RETRY_DELAY", 0.001)
+    monkeypatch.setattr(log_writer, "MAX_RETRIES", 3)
+    monkeypatch.setattr(log_writer, "append_lines", failing(10 ** 6, log_writer.append_lines))
+    writer = LogWriter(bind=database, flush_interval=0.001)
+    writer.start()
+    try:
+        writer.append_lines(module_run, ["a", "b"])
+        writer.finish_run(module_run, status="failed")
+        wait_for(lambda: writer.counters()["dropped_lines"])
+    finally:
+        writer.stop()
+    assert writer.counters()["dropped_lines"] == 2
+    assert run_status(module_run) == "failed"
@@ -0,0 +1,100 @@
+from sqlalchemy import create_engine, inspect, text
+
+from db.db_setup import Base
+from db.log_store import iter_lines
+from db.migrations import MIGRATIONS, migrate, schema_drift, applied_versions, check_query_plans
+
+
+# Schema des ersten Stands (vor Warm-Pool, Limits, Usage, Job-Queue, ...), so wie bestehende Datenbanken aussehen
+BASELINE = """
+CREATE TABLE modules (
+    id INTEGER PRIMARY KEY, name VARCHAR(255) NOT NULL, description TEXT, input_type VARCHAR(255),
+    output_type VARCHAR(255), code_path VARCHAR(255) NOT NULL, needs_input BOOLEAN, needs_output BOOLEAN);
+CREATE TABLE workflows (
+    id INTEGER PRIMARY KEY, name VARCHAR(255) NOT NULL UNIQUE, description TEXT, created_at DATETIME);
+CREATE TABLE workflow_steps (
+    id INTEGER PRIMARY KEY, workflow_id INTEGER REFERENCES workflows(id), module_id INTEGER REFERENCES modules(id),
+    position INTEGER, parameters JSON);
+CREATE TABLE workflow_instances (
+    id INTEGER PRIMARY KEY, workflow_id INTEGER REFERENCES workflows(id),
+    status VARCHAR(8), started_at DATETIME, finished_at DATETIME);
+CREATE TABLE module_runs (
+    id INTEGER PRIMARY KEY, workflow_instance_id INTEGER REFERENCES workflow_instances(id),
+    workflow_step_id INTEGER REFERENCES workflow_steps(id), status VARCHAR(8), input_ref VARCHAR(255),
+    output_ref VARCHAR(255), started_at DATETIME, finished_at DATETIME, log JSON);
+INSERT INTO modules (id, name, code_path, needs_input, needs_output) VALUES (1, 'alt', '/tmp/alt.py', 0, 1);
+INSERT INTO workflows (id, name) VALUES (1, 'alt');
+INSERT INTO workflow_steps (id, workflow_id, module_id, position, parameters) VALUES (1, 1, 1, 1024, '{"n": 1}');
+INSERT INTO workflow_instances (id, workflow_id, status) VALUES (1, 1, 'failed');
+INSERT INTO module_runs (id, workflow_instance_id, workflow_step_id, status, log)
+    VALUES (1, 1, 1, 'failed', '"zeile 1\\nzeile 2"');
+INSERT INTO module_runs (id, workflow_instance_id, workflow_step_id, status, log)
+    VALUES (2, 1, 1, 'finished', '"eins\\n\\nzwei\\n\\n\\n\\ndrei\\n"');
+"""
+
+
+def baseline_engine(tmp_path, *statements):
+    bind = create_engine(f"sqlite:///{tmp_path / 'baseline.db'}")
+    with bind.begin() as conn:
+        for statement in BASELINE.split(";") + list(statements):
+            if statement.strip():
+                conn.execute(text(statement))
+    return bind
+
+
+def upgrade(bind):
+    # Wie init_db bzw. "python -m db.migrations upgrade"
+    Base.metadata.create_all(bind)
+    return migrate(bind)
+
+
+def test_baseline_upgrade(tmp_path):
+    bind = baseline_engine(tmp_path)
+    assert "modules.backend" in schema_drift(bind)
+
+    assert upgrade(bind) == [version for version, _, _ in MIGRATIONS]
+    assert schema_drift(bind) == []
+    indexes = {ix["name"] for ix in inspect(bind).get_indexes("module_runs")}
+    assert {index.name for index in Base.metadata.tables["module_runs"].indexes} <= indexes
+
+    with bind.connect() as conn:
+        assert conn.execute(text("SELECT name, backend FROM modules")).one() == ("alt", "subprocess")
+        assert conn.execute(text("SELECT parameters FROM workflow_steps")).scalar() == '{"n": 1}'
+        assert conn.execute(text("SELECT count(*) FROM module_runs WHERE log IS NOT NULL")).scalar() == 0
+    assert list(iter_lines(1, bind=bind)) == ["zeile 1", "zeile 2"]
+    # Alter Runner: Zeilen samt "\n" nochmals mit "\n" verbunden, keine Leerzeile dazwischen
+    assert list(iter_lines(2, bind=bind)) == ["eins", "zwei", "", "drei"]
+
+
+def test_migrations_idempotent(tmp_path):
+    bind = baseline_engine(tmp_path)
+    upgrade(bind)
+    assert upgrade(bind) == []
+
+    # Auch ohne Versionstabelle (z.B. nach manuellem Nachziehen) dürfen die Migrationen erneut laufen
+    with bind.begin() as conn:
+        conn.execute(text("DELETE FROM schema_migrations"))
+    assert upgrade(bind) == [version for version, _, _ in MIGRATIONS]
+    assert applied_versions(bind) == {version for version, _, _ in MIGRATIONS}
+    assert schema_drift(bind) == []
+    assert list(iter_lines(1, bind=bind)) == ["zeile 1", "zeile 2"]
+
+
+def test_upgrade_after_manual_alter(tmp_path):
+    # Datenbanken, in denen die Limit-Spalten schon von Hand ergänzt wurden, müssen trotzdem durchmigrieren
+    bind = baseline_engine(tmp_path, "ALTER TABLE modules ADD COLUMN timeout FLOAT",
+                           "ALTER TABLE modules ADD COLUMN cpu_limit FLOAT")
+    upgrade(bind)
+    assert schema_drift(bind) == []
+
+    with bind.begin() as conn:
+        conn.execute(text("INSERT INTO module_runs (workflow_instance_id, status, max_rss_kb, cpu_user)"
+                          " VALUES (1, 'oom', 2048, 0.5)"))
+        conn.execute(text("UPDATE workflow_instances SET status = 'cancelled'"))
+        assert conn.execute(text("SELECT status, max_rss_kb FROM module_runs WHERE status = 'oom'")).one() == ("oom", 2048)
+
+
+def test_hot_queries_use_their_index(database):
+    # Häufige Abfragen müssen ihren Index nutzen, ohne zusätzlich zu sortieren
+    missing = [(name, index, plan) for name, index, ok, plan in check_query_plans(database) if not ok]
+    assert missing == []
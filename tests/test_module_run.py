@@ -0,0 +1,32 @@
+import os
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+QtWidgets = pytest.importorskip("PyQt5.QtWidgets")
+
+from gui.module_run import AsyncWorkflowRun
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+def test_lines_are_batched_and_bounded(app, monkeypatch):
+    monkeypatch.setattr(AsyncWorkflowRun, "MAX_PENDING_LINES", 100)
+    run = AsyncWorkflowRun([], None)
+    received = []
+    run.log_signal.connect(received.append)
+
+    for i in range(250):
+        run.appendLine(f"line {i}")
+    assert run.dropped_lines == 150
+
+    run.flushLines()
+    assert received == ["[150 Log-Zeilen verworfen, Anzeige kommt nicht hinterher]",
+                        "\n".join(f"line {i}" for i in range(150, 250))]
+
+    # Ohne neue Zeilen kein weiteres Signal
+    run.flushLines()
+    assert len(received) == 2
@@ -0,0 +1,32 @@
+import threading
+
+from db.log_store import iter_lines
+from db.db_setup import SessionLocal, ModuleRun
+from workflows.engine import load_workflow, create_workflow_instance
+from workflows.pipeline import run_pipeline
+
+ECHO = "import sys\nfor line in sys.stdin:\n    sys.stdout.write(line)\n"
+COUNT = "import sys\nprint(sum(1 for _ in sys.stdin))\n"
+
+
+def test_large_first_input_does_not_block(make_workflow):
+    # Eingabe größer als der Pipe-Puffer; das Modul schreibt, während es noch liest
+    workflow = load_workflow(make_workflow([(ECHO, {}), (COUNT, {})], needs_input=(1, 2), pipeline=True))
+    lines = 200000
+    workflow.steps[0].input_data = "".join(f"{i:040d}\n" for i in range(lines))
+    instance_id = create_workflow_instance(workflow.id)
+    result = []
+    thread = threading.Thread(target=lambda: result.append(run_pipeline(workflow.steps, instance_id, lambda line: None)),
+                              daemon=True)
+    thread.start()
+    thread.join(30)
+    assert not thread.is_alive()
+    assert set(result[0].values()) == {"finished"}
+
+    session = SessionLocal()
+    try:
+        last = session.query(ModuleRun).filter(ModuleRun.workflow_instance_id == instance_id).order_by(ModuleRun.id.desc()).first()
+        run_id = last.id
+    finally:
+        session.close()
+    assert list(iter_lines(run_id)) == [str(lines)]
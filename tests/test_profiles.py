@@ -0,0 +1,54 @@
+import pytest
+
+from db.db_setup import SessionLocal, ModuleRun
+from workflows.engine import run_workflow
+from workflows.profiles import hotspots, compare_hotspots
+
+# Rechnet lange genug für einige Stichproben (Standard-Intervall 5 ms)
+BUSY = """import time
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    n = 0
+    while time.perf_counter() < end:
+        n += 1
+    return n
+
+print(busy(0.3))
+"""
+
+
+def profiled_run(make_workflow, mode):
+    instance_id, status, _ = run_workflow(make_workflow([(BUSY, {"profile": mode})]), emit=lambda line: None)
+    assert status == "finished"
+    session = SessionLocal()
+    try:
+        run = session.query(ModuleRun).filter(ModuleRun.workflow_instance_id == instance_id).one()
+        session.expunge(run)
+        return run
+    finally:
+        session.close()
+
+
+@pytest.mark.parametrize("mode", ["cprofile", "sample"])
+def test_profile_is_stored(make_workflow, mode):
+    run = profiled_run(make_workflow, mode)
+    assert run.profile_mode == mode
+    assert run.profile_ref
+
+    rows, total = hotspots(run.profile_ref, 10)
+    assert total > 0
+    assert "busy" in {row["function"] for row in rows}
+    assert [row["tottime"] for row in rows] == sorted((row["tottime"] for row in rows), reverse=True)
+
+
+def test_compare_hotspots_sorted(make_workflow):
+    base = profiled_run(make_workflow, "cprofile")
+    other = profiled_run(make_workflow, "sample")
+
+    rows, base_total, other_total = compare_hotspots(base.profile_ref, other.profile_ref, 10)
+    assert rows and base_total > 0 and other_total > 0
+    keys = [max(row["base"], row["other"]) for row in rows]
+    assert keys == sorted(keys, reverse=True)
+    for row in rows:
+        assert row["delta"] == pytest.approx(row["other"] - row["base"])
@@ -0,0 +1,136 @@
+import gc
+
+import pytest
+from sqlalchemy import event
+
+from db.db_setup import engine, SessionLocal, Workflow, WorkflowStep
+from db.repository import Repository, POSITION_GAP
+
+
+class Listener:
+    def __init__(self):
+        self.changes = []
+
+    def changed(self, change):
+        self.changes.append(change)
+
+
+def setup_workflow(repository, tmp_path, name, n=3):
+    workflow = repository.create_workflow(name)
+    module = repository.create_module(name=f"{name}-modul", code_path=str(tmp_path / "m.py"))
+    steps = [repository.add_step(workflow.id, module.id) for _ in range(n)]
+    return workflow, module, steps
+
+
+def db_positions(workflow_id):
+    session = SessionLocal()
+    try:
+        return [(row.id, row.position) for row in session.query(WorkflowStep.id, WorkflowStep.position)
+                .filter(WorkflowStep.workflow_id == workflow_id).order_by(WorkflowStep.position)]
+    finally:
+        session.close()
+
+
+# --- Identity Map und Benachrichtigungen ---
+
+def test_identity_map_shares_objects(database, tmp_path):
+    repository = Repository()
+    workflow, module, steps = setup_workflow(repository, tmp_path, "repo-identity")
+    queries = repository.queries
+    loaded = repository.steps(workflow.id)
+    assert loaded == steps
+    assert all(step.module is repository.module(module.id) for step in loaded)
+    assert repository.workflow(workflow.name) is repository.workflow(workflow.id)
+    assert repository.queries == queries # alles aus dem Cache
+
+    # Änderung am Modul ist über jeden Step sofort sichtbar
+    listener = Listener()
+    repository.subscribe(listener.changed)
+    version = repository.version("module", module.id)
+    repository.update_module(module.id, description="neu")
+    assert loaded[0].module.description == "neu"
+    assert repository.version("module", module.id) == version + 1
+    assert listener.changes[-1] == ("module", "updated", (module.id,), None)
+
+
+def test_invalidate_reloads_external_changes(database, tmp_path):
+    repository = Repository()
+    workflow, _, _ = setup_workflow(repository, tmp_path, "repo-invalidate", 1)
+    listener = Listener()
+    repository.subscribe(listener.changed)
+
+    session = SessionLocal()
+    try:
+        session.query(Workflow).filter(Workflow.id == workflow.id).update({"description": "von außen"})
+        session.commit()
+    finally:
+        session.close()
+    assert repository.workflow(workflow.id).description is None # noch der Cache
+
+    repository.invalidate("workflow", [workflow.id])
+    assert listener.changes[-1] == ("workflow", "invalidated", (workflow.id,), None)
+    assert repository.workflow(workflow.id).description == "von außen"
+
+
+def test_listeners_are_weak(database, tmp_path):
+    repository = Repository()
+    listener = Listener()
+    repository.subscribe(listener.changed)
+    del listener
+    gc.collect()
+    repository.create_workflow("repo-weak")
+    assert repository._listeners == []
+
+
+# --- Positionen mit Lücken ---
+
+def test_move_writes_only_the_moved_step(database, tmp_path):
+    repository = Repository()
+    workflow, _, (a, b, c) = setup_workflow(repository, tmp_path, "repo-move")
+    assert [s.position for s in (a, b, c)] == [POSITION_GAP, 2 * POSITION_GAP, 3 * POSITION_GAP]
+    versions = [repository.version("step", s.id) for s in (a, b, c)]
+
+    assert repository.move_step_to(c.id, 0) == 0
+    assert db_positions(workflow.id) == [(c.id, 0), (a.id, POSITION_GAP), (b.id, 2 * POSITION_GAP)]
+    assert [repository.version("step", s.id) for s in (a, b, c)] == [versions[0], versions[1], versions[2] + 1]
+
+    # zwischen zwei Nachbarn: Mitte der Lücke
+    repository.move_step(a.id, 1)
+    assert db_positions(workflow.id) == [(c.id, 0), (b.id, 2 * POSITION_GAP), (a.id, 3 * POSITION_GAP)]
+    assert [s.id for s in repository.steps(workflow.id)] == [c.id, b.id, a.id]
+
+
+def test_renumber_when_gap_is_used_up(database, tmp_path):
+    # Alte Workflows mit Positionen 1..n: keine Lücke, der Workflow wird neu verteilt
+    repository = Repository()
+    workflow, _, (a, b, c) = setup_workflow(repository, tmp_path, "repo-renumber")
+    for position, step in enumerate((a, b, c), start=1):
+        repository.update_step(step.id, position=position)
+
+    repository.move_step_to(c.id, 1)
+    assert db_positions(workflow.id) == [(a.id, POSITION_GAP), (c.id, 2 * POSITION_GAP), (b.id, 3 * POSITION_GAP)]
+    assert [s.id for s in repository.steps(workflow.id)] == [a.id, c.id, b.id]
+
+
+def test_reorder_is_one_statement(database, tmp_path):
+    repository = Repository()
+    workflow, _, steps = setup_workflow(repository, tmp_path, "repo-reorder", 5)
+    order = [s.id for s in reversed(steps)]
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("UPDATE"):
+            statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        changed = repository.reorder_steps(workflow.id, order)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    assert len(statements) == 1 and "CASE" in statements[0]
+    # der mittlere Step behält seine Position und wird nicht geschrieben
+    assert sorted(changed) == sorted(order[:2] + order[3:])
+    assert [step_id for step_id, _ in db_positions(workflow.id)] == order
+
+    with pytest.raises(ValueError):
+        repository.reorder_steps(workflow.id, order[:-1])
@@ -0,0 +1,94 @@
+import os
+
+import pytest
+
+from db.db_setup import SessionLocal, ModuleRun, WorkflowInstance
+from db.log_store import iter_lines
+from workflows import blobs
+from workflows.artifacts import get_artifact_store
+from workflows.engine import load_workflow, run_workflow, resume_plan, resume_workflow
+
+
+def quiet(line):
+    pass
+
+
+@pytest.fixture
+def failed_run(make_workflow, tmp_path):
+    # a -> b -> c, dazu d ohne Abhängigkeiten; b schlägt fehl, solange die Marker-Datei existiert
+    marker = tmp_path / "fail"
+    marker.write_text("")
+    workflow_id = make_workflow([
+        ("print('a')\n", {}),
+        (f"import os, sys\nif os.path.exists({str(marker)!r}):\n    sys.exit(1)\nprint('b')\n", {}),
+        ("print('c')\n", {}),
+        ("print('d')\n", {"depends_on": []}),
+    ])
+    instance_id, status, _ = run_workflow(workflow_id, emit=quiet)
+    assert status == "failed"
+    a, b, c, d = sorted(load_workflow(workflow_id).steps, key=lambda s: s.position)
+    return instance_id, marker, (a.id, b.id, c.id, d.id)
+
+
+def instance_runs(instance_id):
+    session = SessionLocal()
+    try:
+        runs = session.query(ModuleRun).filter(ModuleRun.workflow_instance_id == instance_id).order_by(ModuleRun.id).all()
+        session.expunge_all()
+        return {run.workflow_step_id: run for run in runs}
+    finally:
+        session.close()
+
+
+def test_resume_adopts_finished_and_reruns_failed(failed_run):
+    instance_id, marker, (a, b, c, d) = failed_run
+    old = instance_runs(instance_id)
+    _, reused = resume_plan(instance_id)
+    assert set(reused) == {a, d}
+
+    marker.unlink()
+    new_id, status, step_status = resume_workflow(instance_id, emit=quiet)
+    assert status == "finished"
+    assert set(step_status.values()) == {"finished"}
+
+    session = SessionLocal()
+    try:
+        assert session.get(WorkflowInstance, new_id).resumed_from_id == instance_id
+    finally:
+        session.close()
+
+    new = instance_runs(new_id)
+    for step_id in (a, d):
+        assert new[step_id].output_ref == old[step_id].output_ref
+        assert "übernommen" in list(iter_lines(new[step_id].id))[0]
+    # b und sein Nachfolger c laufen neu
+    assert list(iter_lines(new[b].id)) == ["b"]
+    assert list(iter_lines(new[c].id)) == ["c"]
+
+
+def test_evicted_artifact_forces_rerun(failed_run):
+    instance_id, _, (a, b, c, d) = failed_run
+    os.remove(get_artifact_store().path(instance_runs(instance_id)[d].output_ref))
+    _, reused = resume_plan(instance_id)
+    assert set(reused) == {a}
+
+
+def test_blob_output_forces_rerun(failed_run):
+    instance_id, _, (a, b, c, d) = failed_run
+    run = instance_runs(instance_id)[a]
+    session = SessionLocal()
+    try:
+        session.query(ModuleRun).filter(ModuleRun.id == run.id).update(
+            {"output_ref": blobs.blob_ref(instance_id, run.id)})
+        session.commit()
+    finally:
+        session.close()
+    _, reused = resume_plan(instance_id)
+    assert set(reused) == {d}
+
+
+def test_finished_instance_cannot_be_resumed(make_workflow):
+    instance_id, status, _ = run_workflow(make_workflow([("print(1)\n", {})]), emit=quiet)
+    assert status == "finished"
+    with pytest.raises(ValueError):
+        resume_plan(instance_id)
@@ -0,0 +1,33 @@
+from db.db_setup import SessionLocal, WorkflowInstance
+from workflows.engine import load_workflow, resumable_instance
+from workflows.scheduler import RunScheduler
+
+
+def instance_status(instance_id):
+    session = SessionLocal()
+    try:
+        return session.get(WorkflowInstance, instance_id).status.value
+    finally:
+        session.close()
+
+
+def test_cancel_pending_run_is_cancelled_not_resumable(make_workflow):
+    first = load_workflow(make_workflow([("print(1)\n", {})]))
+    second = load_workflow(make_workflow([("print(2)\n", {})]))
+    scheduler = RunScheduler(max_processes=1)
+    started = []
+    running = scheduler.submit(first, started.append)
+    waiting = scheduler.submit(second, started.append)
+    assert started == [running]
+    assert waiting.state == "pending"
+
+    assert scheduler.cancel(waiting)
+    assert waiting.state == "cancelled"
+    assert instance_status(waiting.instance_id) == "cancelled"
+    # Nie gestartet: nichts fortzusetzen
+    assert resumable_instance(second.id) is None
+
+    # Laufende Tickets lassen sich hier nicht entfernen
+    assert not scheduler.cancel(running)
+    scheduler.release(running)
+    assert scheduler.counters()["running"] == 0
@@ -0,0 +1,62 @@
+import threading
+
+from db.db_setup import SessionLocal, ModuleRun
+from workflows.artifacts import get_artifact_store
+from workflows.engine import load_workflow, run_workflow, create_workflow_instance
+from workflows.sweep import run_sweep, sweep_status
+
+SHARD = """import os
+shard = int(os.environ["WORKFLOW_PARAM_SHARD"])
+if shard == int(os.environ.get("WORKFLOW_PARAM_FAIL", "-1")):
+    raise SystemExit(1)
+print(f"shard {shard}")
+"""
+
+
+def step_runs(instance_id):
+    # (Status, output_ref, parameters) aller ModuleRuns einer Instanz, der Fan-in-Run zuletzt
+    session = SessionLocal()
+    try:
+        runs = session.query(ModuleRun).filter(ModuleRun.workflow_instance_id == instance_id).order_by(ModuleRun.id).all()
+        return [(run.status.value, run.output_ref, run.parameters) for run in runs]
+    finally:
+        session.close()
+
+
+def test_sweep_gathers_outputs_in_order(make_workflow):
+    workflow_id = make_workflow([(SHARD, {"sweep": {"shard": [0, 1, 2]}})])
+    instance_id, status, _ = run_workflow(workflow_id, emit=lambda line: None)
+    assert status == "finished"
+
+    runs = step_runs(instance_id)
+    assert len(runs) == 4
+    assert sorted(params["shard"] for _, _, params in runs[:3]) == [0, 1, 2]
+    gathered_status, output_ref, params = runs[-1]
+    assert (gathered_status, params) == ("finished", {"sweep_runs": 3})
+    with open(get_artifact_store().path(output_ref)) as f:
+        assert f.read() == "shard 0\nshard 1\nshard 2\n"
+
+
+def test_failed_sub_run_fails_fan_in(make_workflow):
+    workflow_id = make_workflow([(SHARD, {"sweep": {"shard": [0, 1, 2]}, "fail": 1})])
+    instance_id, status, _ = run_workflow(workflow_id, emit=lambda line: None)
+    assert status == "failed"
+
+    runs = step_runs(instance_id)
+    assert sorted(s for s, _, _ in runs[:3]) == ["failed", "finished", "finished"]
+    assert runs[-1][:2] == ("failed", None)
+
+
+def test_stopped_sweep_is_cancelled(make_workflow):
+    workflow = load_workflow(make_workflow([(SHARD, {"sweep": {"shard": [0, 1]}})]))
+    instance_id = create_workflow_instance(workflow.id)
+    stop_event = threading.Event()
+    stop_event.set()
+    assert run_sweep(workflow.steps[0], instance_id, lambda line: None, stop_event) == ("cancelled", None)
+    assert step_runs(instance_id) == [("cancelled", None, {"sweep_runs": 2})]
+
+
+def test_sweep_status():
+    assert sweep_status([("finished", "a"), ("skipped", None)]) == "finished"
+    assert sweep_status([("finished", "a"), ("timeout", None)]) == "failed"
+    assert sweep_status([("failed", None), ("cancelled", None)]) == "cancelled"
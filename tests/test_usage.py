@@ -0,0 +1,27 @@
+import subprocess
+import sys
+import time
+
+from workflows.usage import track, wait_exit, reap
+
+
+def run_tracked(code):
+    started = time.monotonic()
+    process = subprocess.Popen([sys.executable, "-c", code])
+    track(process)
+    wait_exit(process)
+    return reap(process, started)
+
+
+def test_peak_rss_of_module():
+    # 100 MB belegen und länger als ein Messintervall laufen
+    usage = run_tracked("import time\ndata = bytearray(100 * 1024 * 1024)\ntime.sleep(1.5)\n")
+    assert usage["max_rss_kb"] >= 90 * 1024
+    assert usage["wall_time"] >= 1.5
+
+
+def test_short_run_has_no_bogus_rss():
+    # Ohne Messwert während der Laufzeit kein Startwert von wenigen KB, sondern nichts
+    usage = run_tracked("pass")
+    assert usage["max_rss_kb"] is None or usage["max_rss_kb"] >= 1024
+    assert usage["cpu_user"] is not None
@@ -0,0 +1,45 @@
+import threading
+
+from workflows.worker_pool import WorkerPool
+
+
+def run_concurrently(pool, script, n):
+    results = [None] * n
+    def run(i):
+        out = []
+        results[i] = pool.run(str(script), out.append, lambda data: None)[0], b"".join(out)
+    threads = [threading.Thread(target=run, args=(i,), daemon=True) for i in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    return threads, results
+
+
+def test_recycle_under_contention(tmp_path, monkeypatch):
+    # Jeder Worker wird nach einem Auftrag ersetzt; wartende Aufträge dürfen dabei nicht hängen bleiben
+    monkeypatch.setenv("WORKFLOW_POOL_MAX_JOBS", "1")
+    script = tmp_path / "hello.py"
+    script.write_text("print('hallo')\n")
+    pool = WorkerPool(size=1, preload="")
+    try:
+        threads, results = run_concurrently(pool, script, 3)
+        assert not any(thread.is_alive() for thread in threads)
+        assert results == [(0, b"hallo\n")] * 3
+        assert pool.stats["recycled"] == 3
+        assert pool._count <= 1
+    finally:
+        pool.shutdown()
+
+
+def test_failed_job_frees_slot(tmp_path):
+    # Ein Modul, das den Worker beendet, gibt seinen Platz für den nächsten Auftrag frei
+    script = tmp_path / "exit.py"
+    script.write_text("import os\nos._exit(3)\n")
+    pool = WorkerPool(size=1, preload="")
+    try:
+        threads, results = run_concurrently(pool, script, 2)
+        assert not any(thread.is_alive() for thread in threads)
+        assert [rc for rc, _ in results] == [3, 3]
+    finally:
+        pool.shutdown()
@@ -0,0 +1,183 @@
+import os
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from sqlalchemy.orm import joinedload
+
+from db.db_setup import SessionLocal, ModuleRun, WorkflowStep
+from db.job_queue import claim_jobs, heartbeat, update_job, release_job, requeue_expired, LEASE_SECONDS
+from workflows.runner import StepRun, execute_run
+
+# Worker-Agent: holt Jobs aus der Warteschlange (db/job_queue.py), führt sie lokal aus und
+# schreibt Status, Logs und Ergebnis zurück in die DB. Die GUI bzw. "python -m workflows run"
+# reiht mit WORKFLOW_EXECUTOR=queue nur ein und liest mit (runner.run_queued).
+#
+#   python -m workflows agent --concurrency 4
+#
+# Mehrere Agenten dürfen gleichzeitig laufen, auf einem oder mehreren Rechnern. Voraussetzung:
+# alle sehen dieselbe Datenbank und dasselbe Artefakt-Verzeichnis (WORKFLOW_ARTIFACT_DIR,
+# bei mehreren Rechnern z.B. per NFS) und die Modul-Skripte unter demselben Pfad.
+
+AGENT_CONCURRENCY = int(os.environ.get("WORKFLOW_AGENT_CONCURRENCY", os.cpu_count() or 4))
+AGENT_POLL = float(os.environ.get("WORKFLOW_AGENT_POLL", "1.0")) # Sekunden zwischen Abfragen, wenn nichts zu tun ist
+HEARTBEAT_INTERVAL = float(os.environ.get("WORKFLOW_HEARTBEAT_SECONDS", "2")) # höchstens LEASE_SECONDS / 3
+
+
+class JobRun(StepRun):
+    # StepRun für einen übernommenen Job: schreibt in den Job-Eintrag, statt einen neuen ModuleRun
+    # anzulegen, und nur solange der Agent den Claim hält
+    def __init__(self, job, step, worker, emit=print):
+        spec = job.job or {}
+        super().__init__(step, job.workflow_instance_id, emit, spec.get("inputs"), spec.get("parameters"))
+        self.run_id = job.id
+        self.worker = worker
+        self.stop_event = threading.Event()
+        self.requeue = False # Agent wird beendet: Job zurückgeben statt als abgebrochen zu melden
+        self.done = False # Endstatus geschrieben, der Heartbeat ignoriert den Job
+
+    def begin(self):
+        result = super().begin()
+        if result is not None and result[0] == "skipped":
+            # Modul wurde nach dem Einreihen geleert, der Job muss trotzdem abgeschlossen werden
+            self.writer.append_log(self.run_id, "Kein Code hinterlegt.")
+            self.finish(status="failed", finished_at=datetime.now())
+            return "failed", None
+        return result
+
+    def start(self, input_ref, **values):
+        if not update_job(self.run_id, self.worker, input_ref=input_ref, started_at=datetime.now(), **values):
+            raise RuntimeError(f"Job {self.run_id} wird nicht mehr von {self.worker} gehalten")
+        return self.run_id
+
+    def finish(self, wait=True, **values):
+        # Log zuerst schreiben, damit der Koordinator mit dem Endstatus alle Zeilen sieht
+        self.done = True
+        if self.requeue and values.get("status") == "cancelled":
+            self.writer.append_log(self.run_id, f"Agent {self.worker} beendet, Job wieder eingereiht.")
+            self.writer.release(self.run_id)
+            done = release_job(self.run_id, self.worker)
+        else:
+            self.writer.release(self.run_id)
+            done = update_job(self.run_id, self.worker, lease_until=None, **values)
+        if not done:
+            self.emit(f"Claim für Job {self.run_id} verloren, Ergebnis verworfen.")
+
+
+def load_jobs(run_ids):
+    # Übernommene Jobs samt Step und Modul, vom Session-Kontext gelöst
+    if not run_ids:
+        return []
+    session = SessionLocal()
+    try:
+        jobs = session.query(ModuleRun).filter(ModuleRun.id.in_(run_ids)).order_by(ModuleRun.id).all()
+        steps = {
+            step.id: step for step in session.query(WorkflowStep)
+            .options(joinedload(WorkflowStep.module))
+            .filter(WorkflowStep.id.in_({job.workflow_step_id for job in jobs}))
+        }
+        session.expunge_all()
+        return [(job, steps.get(job.workflow_step_id)) for job in jobs]
+    finally:
+        session.close()
+
+
+class WorkerAgent:
+    # Bis zu concurrency Jobs gleichzeitig, je Job ein Thread mit eigenem Modul-Prozess.
+    # Ein Heartbeat-Thread verlängert alle Claims mit einem UPDATE und reicht Abbrüche weiter.
+    # stop(): keine neuen Jobs mehr, laufende werden beendet und wieder eingereiht.
+    def __init__(self, name=None, concurrency=AGENT_CONCURRENCY, lease=LEASE_SECONDS, poll=AGENT_POLL, emit=print):
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.concurrency = max(1, concurrency)
+        self.lease = lease
+        self.poll = poll
+        self.emit = emit
+        self.stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._runs = {} # run_id -> JobRun
+        self._wakeup = threading.Event() # Slot frei geworden
+        self._beat_stop = threading.Event()
+        self.finished = 0
+
+    def stop(self):
+        self.stop_event.set()
+        self._wakeup.set()
+
+    def run(self):
+        self.emit(f"Agent {self.name}: bis zu {self.concurrency} Jobs, Lease {self.lease:g} s")
+        beat = threading.Thread(target=self._heartbeat_loop, name="heartbeat", daemon=True)
+        beat.start()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="job") as pool:
+            while not self.stop_event.is_set():
+                free = self.concurrency - len(self._runs)
+                claimed = []
+                try:
+                    for run_id, status, worker in requeue_expired():
+                        self.emit(f"Job {run_id}: Claim von {worker} abgelaufen -> {status}")
+                    if free > 0:
+                        claimed = claim_jobs(self.name, free, self.lease)
+                    for job, step in load_jobs(claimed):
+                        self._start(pool, job, step)
+                except Exception as e:
+                    self.emit(f"Agent {self.name}: {e}")
+                # Voll ausgelastet oder Warteschlange leer: warten, bis ein Slot frei wird bzw. poll
+                if free <= 0 or len(claimed) < free:
+                    self._wakeup.wait(self.poll)
+                    self._wakeup.clear()
+
+            with self._lock:
+                for run in self._runs.values():
+                    run.requeue = True
+                    run.stop_event.set()
+        self._beat_stop.set()
+        beat.join()
+        self.emit(f"Agent {self.name} beendet ({self.finished} Jobs ausgeführt)")
+
+    def _start(self, pool, job, step):
+        if step is None or step.module is None:
+            self.emit(f"Job {job.id}: Step {job.workflow_step_id} existiert nicht mehr")
+            update_job(job.id, self.name, status="failed", finished_at=datetime.now(), lease_until=None)
+            return
+        name = step.module.name
+        run = JobRun(job, step, self.name, lambda line: self.emit(f"[{job.id} {name}] {line}"))
+        with self._lock:
+            self._runs[job.id] = run
+        pool.submit(self._run_job, run)
+
+    def _run_job(self, run):
+        try:
+            status, _ = execute_run(run, run.stop_event)
+            if run.requeue and status == "cancelled":
+                status = "wieder eingereiht"
+            self.emit(f"Job {run.run_id} ({run.mod.name}): {status}")
+        finally:
+            with self._lock:
+                self._runs.pop(run.run_id, None)
+                self.finished += 1
+            self._wakeup.set()
+
+    def _heartbeat_loop(self):
+        interval = min(HEARTBEAT_INTERVAL, self.lease / 3)
+        while not self._beat_stop.wait(interval):
+            with self._lock:
+                run_ids = list(self._runs)
+            if not run_ids:
+                continue
+            try:
+                held, cancel = heartbeat(self.name, run_ids, self.lease)
+            except Exception as e:
+                self.emit(f"Heartbeat fehlgeschlagen: {e}")
+                continue
+            with self._lock:
+                for run_id in run_ids:
+                    run = self._runs.get(run_id)
+                    if run is None or run.done or run.stop_event.is_set():
+                        continue
+                    if run_id not in held:
+                        # Claim abgelaufen und evtl. schon an einen anderen Agenten vergeben
+                        self.emit(f"Job {run_id}: Claim verloren, wird abgebrochen")
+                        run.stop_event.set()
+                    elif run_id in cancel:
+                        self.emit(f"Job {run_id}: Abbruch angefordert")
+                        run.stop_event.set()
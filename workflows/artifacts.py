@@ -0,0 +1,197 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+# Lokaler, inhaltsadressierter Speicher für Step-Ergebnisse
+DEFAULT_ROOT = os.environ.get("WORKFLOW_ARTIFACT_DIR", os.path.join(os.path.expanduser("~"), ".workflow_artifacts"))
+DEFAULT_MAX_BYTES = int(os.environ.get("WORKFLOW_CACHE_MAX_MB", "2048")) * 1024 * 1024
+CACHE_ENABLED = os.environ.get("WORKFLOW_CACHE", "1") != "0"
+
+# Schlüssel in WorkflowStep.parameters, die nur die Ausführung steuern und nicht ins Ergebnis eingehen
+CONTROL_PARAMETERS = {"depends_on", "cache", "timeout", "sweep", "sweep_parallel", "profile"}
+
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def combine_refs(refs):
+    # Ein Hash für mehrere Eingänge (Reihenfolge zählt)
+    if not refs:
+        return None
+    if len(refs) == 1:
+        return refs[0]
+    return hashlib.sha256("\n".join(refs).encode()).hexdigest()
+
+
+class ArtifactWriter:
+    # Schreibt in eine Temp-Datei und hasht dabei mit; commit() legt das Objekt im Store ab
+    def __init__(self, store):
+        self.store = store
+        self._hash = hashlib.sha256()
+        fd, self._tmp = tempfile.mkstemp(dir=store.tmp_dir)
+        self._file = os.fdopen(fd, "wb")
+        self.size = 0
+
+    def write(self, data):
+        self._hash.update(data)
+        self._file.write(data)
+        self.size += len(data)
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def commit(self):
+        self._file.close()
+        return self.store._adopt(self._tmp, self._hash.hexdigest(), self.size)
+
+    def discard(self):
+        self._file.close()
+        if os.path.exists(self._tmp):
+            os.remove(self._tmp)
+
+
+class ArtifactStore:
+    # objects/<ab>/<hash> : Inhalt, adressiert über sha256
+    # keys/<ab>/<key>     : Cache-Schlüssel (Code + Input + Parameter) -> Objekt-Hash
+    # Zuletzt benutzt = mtime des Objekts, danach richtet sich die LRU-Verdrängung
+    def __init__(self, root=DEFAULT_ROOT, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.tmp_dir = os.path.join(root, "tmp")
+        for sub in ("objects", "keys", "tmp"):
+            os.makedirs(os.path.join(root, sub), exist_ok=True)
+        self._lock = threading.Lock()
+        self._stats_path = os.path.join(root, "stats.json")
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+        if os.path.exists(self._stats_path):
+            try:
+                with open(self._stats_path) as f:
+                    self._stats.update(json.load(f))
+            except (OSError, ValueError):
+                pass
+        self._size = sum(size for _, _, size in self._objects())
+
+    def _objects(self):
+        base = os.path.join(self.root, "objects")
+        for sub in os.listdir(base):
+            for name in os.listdir(os.path.join(base, sub)):
+                path = os.path.join(base, sub, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, st.st_mtime, st.st_size
+
+    def _path(self, kind, digest):
+        return os.path.join(self.root, kind, digest[:2], digest)
+
+    def path(self, digest):
+        return self._path("objects", digest)
+
+    def exists(self, digest):
+        return bool(digest) and os.path.exists(self.path(digest))
+
+    def open_writer(self):
+        return ArtifactWriter(self)
+
+    def put_bytes(self, data):
+        writer = self.open_writer()
+        writer.write(data)
+        return writer.commit()
+
+    def _adopt(self, tmp_path, digest, size):
+        target = self.path(digest)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with self._lock:
+            if os.path.exists(target):
+                os.remove(tmp_path)
+                os.utime(target)
+            else:
+                os.replace(tmp_path, target)
+                self._size += size
+        self.evict()
+        return digest
+
+    def cache_key(self, code_path, input_ref, parameters):
+        # Schlüssel aus Modul-Code, Upstream-Input und Step-Parametern
+        params = {k: v for k, v in (parameters or {}).items() if k not in CONTROL_PARAMETERS}
+        h = hashlib.sha256()
+        h.update(file_digest(code_path).encode())
+        h.update(b"\0" + (input_ref or "").encode())
+        h.update(b"\0" + json.dumps(params, sort_keys=True, default=str).encode())
+        return h.hexdigest()
+
+    def lookup(self, key):
+        # Objekt-Hash zu einem Cache-Schlüssel, zählt Treffer/Fehlzugriffe
+        digest = None
+        try:
+            with open(self._path("keys", key)) as f:
+                digest = f.read().strip()
+        except FileNotFoundError:
+            pass
+        hit = self.exists(digest)
+        with self._lock:
+            self._stats["hits" if hit else "misses"] += 1
+            self._save_stats()
+        if not hit:
+            return None
+        os.utime(self.path(digest)) # als zuletzt benutzt markieren
+        return digest
+
+    def record(self, key, digest):
+        path = self._path("keys", key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(digest)
+
+    def evict(self):
+        # Älteste Objekte löschen, bis der Store wieder unter 90 % der Grenze liegt
+        with self._lock:
+            if self._size <= self.max_bytes:
+                return
+            target = int(self.max_bytes * 0.9)
+            for path, _, size in sorted(self._objects(), key=lambda o: o[1]):
+                if self._size <= target:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    continue
+                self._size -= size
+                self._stats["evictions"] += 1
+            self._save_stats()
+
+    def stats(self):
+        with self._lock:
+            total = self._stats["hits"] + self._stats["misses"]
+            return dict(self._stats, bytes=self._size,
+                        hit_rate=self._stats["hits"] / total if total else 0.0)
+
+    def _save_stats(self):
+        try:
+            with open(self._stats_path, "w") as f:
+                json.dump(self._stats, f)
+        except OSError:
+            pass
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_artifact_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ArtifactStore()
+        return _store
@@ -0,0 +1,404 @@
+import asyncio
+import os
+import signal
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from workflows.dag import step_dependencies, is_linear, is_sweep
+from workflows.executor import DagExecutor, GLOBAL_MAX_WORKERS
+from workflows.limits import KILL_GRACE, Limits, rlimit_preexec, signal_group
+from workflows.pipeline import run_pipeline
+from workflows.runner import StepRun, _execute_in_pool
+from workflows.profiles import module_command
+from workflows.streams import LineSplitter, enlarge_pipe, READ_SIZE
+from workflows.sweep import sweep_sets, sweep_limit, sweep_label, sub_parameters, gather
+from workflows.usage import exited, reap, track
+from workflows.worker_pool import POOL_SIZE
+
+# "async": alle Modul-Prozesse laufen in einer Event-Loop (Standard), "thread": ein Thread pro Step,
+# "queue": Steps werden als Jobs für Worker-Agenten eingereiht (workflows/agent.py)
+EXECUTOR_MODE = os.environ.get("WORKFLOW_EXECUTOR", "async")
+# Threads für blockierende Arbeit (DB-Einträge, Cache-Hashes, Writer-Flush)
+BLOCKING_WORKERS = int(os.environ.get("WORKFLOW_BLOCKING_WORKERS", "4"))
+
+
+async def _pump(stream, log_lines, output=None):
+    # Ausgabestrom nicht-blockierend lesen: Rohdaten ins Artefakt, Zeilen blockweise ins Log.
+    # Das Schreiben ins Artefakt läuft in einem Thread (langsame Platte hält sonst die ganze Loop
+    # auf); immer nur ein Block gleichzeitig, damit die Reihenfolge stimmt
+    loop = asyncio.get_running_loop()
+    splitter = LineSplitter()
+    writing = None
+    try:
+        while True:
+            data = await stream.read(READ_SIZE)
+            if not data:
+                break
+            if output is not None:
+                if writing is not None:
+                    await writing
+                writing = loop.run_in_executor(None, output.write, data)
+            lines = splitter.feed(data)
+            if lines:
+                log_lines(lines)
+        lines = splitter.feed(b"", final=True)
+        if lines:
+            log_lines(lines)
+    finally:
+        # auch bei Abbruch: das Artefakt wird erst nach dem letzten Schreiben verworfen/übernommen
+        if writing is not None:
+            await asyncio.shield(writing)
+
+
+async def _read_pipe(loop, pipe):
+    reader = asyncio.StreamReader(limit=2 * READ_SIZE)
+    transport, _ = await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), pipe)
+    return reader, transport
+
+
+async def _write_pipe(loop, pipe):
+    transport, protocol = await loop.connect_write_pipe(asyncio.streams.FlowControlMixin, pipe)
+    return asyncio.StreamWriter(transport, protocol, None, loop), transport
+
+
+async def _feed_stdin(writer, paths, text):
+    try:
+        if text:
+            writer.write(text.encode("utf-8"))
+            await writer.drain()
+        for path in paths:
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(READ_SIZE), b""):
+                    writer.write(block)
+                    await writer.drain()
+    except (BrokenPipeError, ConnectionResetError):
+        pass
+    finally:
+        writer.close()
+
+
+async def _wait_exit(process):
+    # Auf das Prozessende warten, ohne ihn abzuholen (das macht usage.reap mit wait4)
+    loop = asyncio.get_running_loop()
+    try:
+        pidfd = os.pidfd_open(process.pid)
+    except (AttributeError, OSError):
+        while not exited(process):
+            await asyncio.sleep(0.05)
+        return
+    done = loop.create_future()
+    loop.add_reader(pidfd, lambda: done.done() or done.set_result(None))
+    try:
+        await done
+    finally:
+        loop.remove_reader(pidfd)
+        os.close(pidfd)
+
+
+async def _until_exit(process, tasks):
+    await asyncio.gather(*tasks)
+    await _wait_exit(process)
+
+
+async def _kill_group(process, grace=KILL_GRACE):
+    # Wie limits.kill_process_group: SIGTERM an die Gruppe, nach grace Sekunden SIGKILL
+    signal_group(process.pid, signal.SIGTERM)
+    try:
+        await asyncio.wait_for(_wait_exit(process), grace)
+    except asyncio.TimeoutError:
+        pass
+    signal_group(process.pid, signal.SIGKILL)
+    await _wait_exit(process)
+
+
+async def execute_subprocess(mod, paths, input_data, output, log_lines, limits=None, env=None, profile=None):
+    # Wie runner._execute_subprocess, aber ohne eigene Threads; Abbruch über Task-Cancel.
+    # Der Prozess wird selbst gestartet und per pidfd beobachtet (statt asyncio-Child-Watcher),
+    # damit wait4 den Ressourcenverbrauch liefern kann.
+    # Rückgabe: (returncode, None/"cancelled"/"timeout", Ressourcenverbrauch)
+    loop = asyncio.get_running_loop()
+    limits = limits or Limits()
+    has_input = bool(input_data or paths)
+    started = time.monotonic()
+    process = subprocess.Popen(
+        module_command(mod.code_path, profile),
+        stdin=subprocess.PIPE if has_input else subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        start_new_session=True,
+        env=dict(os.environ, **env) if env else None,
+        preexec_fn=rlimit_preexec(limits),
+    )
+    track(process)
+    transports = []
+    reason = None
+    enlarge_pipe(process.stdout)
+    try:
+        stdout, transport = await _read_pipe(loop, process.stdout)
+        transports.append(transport)
+        stderr, transport = await _read_pipe(loop, process.stderr)
+        transports.append(transport)
+        tasks = [_pump(stdout, log_lines, output), _pump(stderr, log_lines)]
+        if has_input:
+            stdin, transport = await _write_pipe(loop, process.stdin)
+            transports.append(transport)
+            tasks.append(_feed_stdin(stdin, paths, input_data))
+        # Timeout gilt bis zum Prozessende, auch wenn das Modul seine Ausgaben vorher schließt
+        remaining = limits.timeout and max(0, started + limits.timeout - time.monotonic())
+        await asyncio.wait_for(_until_exit(process, tasks), remaining)
+    except asyncio.TimeoutError:
+        reason = "timeout"
+        await _kill_group(process)
+    except asyncio.CancelledError:
+        reason = "cancelled"
+        await _kill_group(process)
+    finally:
+        for transport in transports:
+            transport.close()
+    usage = reap(process, started)
+    return process.returncode, reason, usage
+
+
+class AsyncDagExecutor(DagExecutor):
+    # DagExecutor-Variante für die Event-Loop: Steps sind Tasks statt Threads
+    def __init__(self, steps, run_step, max_parallel=None, slots=None, completed=None):
+        super().__init__(steps, run_step, max_parallel, completed=completed)
+        self.slots = slots # asyncio.Semaphore für das globale Prozess-Limit
+
+    async def _run_with_slot(self, step):
+        try:
+            if is_sweep(step):
+                # Sub-Runs belegen die Slots selbst (AsyncExecutor.run_sweep)
+                return await self.run_step(step, self._inputs(step.id))
+            async with self.slots:
+                return await self.run_step(step, self._inputs(step.id))
+        except asyncio.CancelledError:
+            return "cancelled", None
+
+    async def run(self):
+        self._prepare()
+        running = {}
+        try:
+            while self._ready or running:
+                while self._ready and len(running) < self.max_parallel:
+                    sid = self._ready.pop(0)
+                    running[asyncio.ensure_future(self._run_with_slot(self.steps[sid]))] = sid
+                if not running:
+                    break
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    sid = running.pop(task)
+                    try:
+                        status, output_ref = task.result()
+                    except Exception:
+                        status, output_ref = "failed", None
+                    self._complete(sid, status, output_ref)
+        except asyncio.CancelledError:
+            # Abbruch: laufende Steps beenden und ihr Ergebnis noch eintragen
+            self.stop_event.set()
+            for task in running:
+                task.cancel()
+            for task, sid in running.items():
+                try:
+                    status, output_ref = await task
+                except (Exception, asyncio.CancelledError):
+                    status, output_ref = "cancelled", None
+                self.status[sid] = status
+                self.outputs[sid] = output_ref
+        return self._finish()
+
+
+class AsyncRun:
+    # Handle für einen Workflow-Lauf in der Event-Loop
+    def __init__(self, executor):
+        self._executor = executor
+        self.task = None
+        self.cancel_requested = False
+        self.future = None # concurrent.futures.Future mit step.id -> Status
+
+    def cancel(self):
+        self._executor.loop.call_soon_threadsafe(self._cancel)
+
+    def _cancel(self):
+        self.cancel_requested = True
+        if self.task is not None:
+            self.task.cancel()
+
+    def done(self):
+        return self.future.done()
+
+    def result(self, timeout=None):
+        return self.future.result(timeout)
+
+    def wait(self, stop_event=None):
+        # Blockierend auf das Ergebnis warten, stop_event (z.B. Strg+C) bricht den Lauf ab
+        cancelled = False
+        while True:
+            try:
+                return self.future.result(timeout=0.2)
+            except TimeoutError:
+                if stop_event is not None and stop_event.is_set() and not cancelled:
+                    self.cancel()
+                    cancelled = True
+
+
+class AsyncExecutor:
+    # Eine Event-Loop in einem Thread treibt alle Modul-Prozesse aller Workflows.
+    # Anzahl der Threads bleibt konstant: Loop + BLOCKING_WORKERS (+ POOL_SIZE für das Pool-Backend),
+    # unabhängig davon, wie viele Prozesse gleichzeitig laufen.
+    def __init__(self, max_processes=GLOBAL_MAX_WORKERS):
+        self.max_processes = max(1, max_processes)
+        self.loop = asyncio.new_event_loop()
+        self._blocking = ThreadPoolExecutor(max_workers=BLOCKING_WORKERS, thread_name_prefix="async-io")
+        self._pool_threads = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix="async-pool")
+        self._slots = asyncio.Semaphore(self.max_processes) # globales Prozess-Limit
+        self._thread = threading.Thread(target=self._run_loop, name="workflow-loop", daemon=True)
+        self._thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, steps, workflow_instance_id, emit=print, max_parallel=None, pipeline=False,
+               on_step_finished=None, completed=None):
+        # Thread-sicher; emit/on_step_finished werden im Loop-Thread aufgerufen
+        run = AsyncRun(self)
+        on_step_finished = on_step_finished or (lambda step_id, status: None)
+
+        async def main():
+            run.task = asyncio.current_task()
+            if run.cancel_requested:
+                return {s.id: "cancelled" for s in steps}
+            return await self._execute(steps, workflow_instance_id, emit, max_parallel, pipeline, on_step_finished,
+                                       completed)
+
+        run.future = asyncio.run_coroutine_threadsafe(main(), self.loop)
+        return run
+
+    async def _blocking_call(self, fn, *args):
+        # Blockierende Arbeit läuft bei Abbruch zu Ende, erst danach kommt das CancelledError an
+        future = self.loop.run_in_executor(self._blocking, fn, *args)
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            await future
+            raise
+
+    async def _execute(self, steps, workflow_instance_id, emit, max_parallel, pipeline, on_step_finished,
+                       completed=None):
+        if pipeline and completed:
+            emit("Fortsetzung im Pipeline-Modus: übrige Steps laufen als DAG.")
+        elif pipeline:
+            if is_linear(step_dependencies(steps)) and not any(is_sweep(s) for s in steps):
+                # Pipeline-Modus verbindet Prozesse über OS-Pipes mit eigenen Tee-Threads
+                stop_event = threading.Event()
+                future = self.loop.run_in_executor(
+                    None, run_pipeline, steps, workflow_instance_id, emit, stop_event)
+                try:
+                    step_status = await asyncio.shield(future)
+                except asyncio.CancelledError:
+                    stop_event.set()
+                    step_status = await future
+                for step_id, status in step_status.items():
+                    on_step_finished(step_id, status)
+                return step_status
+            emit("Pipeline-Modus nur für lineare Workflows ohne Sweep, führe als DAG aus.")
+
+        executor = None
+
+        async def run_one(step, inputs):
+            name = step.module.name
+            step_emit = (lambda line: emit(f"[{name}] {line}")) if executor.parallel else emit
+            run = self.run_sweep if is_sweep(step) else self.run_step
+            status, output_ref = await run(step, workflow_instance_id, step_emit, inputs)
+            on_step_finished(step.id, status)
+            return status, output_ref
+
+        executor = AsyncDagExecutor(steps, run_one, max_parallel, self._slots, completed)
+        step_status = await executor.run()
+        if executor.stop_event.is_set():
+            emit("Execution stopped by user.")
+        return step_status
+
+    async def run_sweep(self, step, workflow_instance_id, emit=print, inputs=None):
+        # Gegenstück zu sweep.run_sweep: ein Task pro Parametersatz, begrenzt durch sweep_parallel
+        # und das globale Prozess-Limit
+        sets = sweep_sets(step.parameters)
+        limit = asyncio.Semaphore(sweep_limit(step, len(sets)))
+        emit(f"{step.module.name}: Sweep über {len(sets)} Parametersätze, bis zu {sweep_limit(step, len(sets))} parallel")
+
+        async def run_one(values):
+            label = sweep_label(values)
+            try:
+                async with limit, self._slots:
+                    return await self.run_step(step, workflow_instance_id, lambda line: emit(f"[{label}] {line}"),
+                                               inputs, sub_parameters(step.parameters, values))
+            except asyncio.CancelledError:
+                return "cancelled", None
+
+        tasks = [asyncio.ensure_future(run_one(values)) for values in sets]
+        try:
+            results = await asyncio.gather(*tasks)
+        except asyncio.CancelledError:
+            # Abbruch: laufende Sub-Runs beenden, ihr Ergebnis trotzdem zusammenfassen
+            for task in tasks:
+                task.cancel()
+            results = [await task for task in tasks]
+        return await self._blocking_call(gather, step, workflow_instance_id, results, emit)
+
+    async def run_step(self, step, workflow_instance_id, emit=print, inputs=None, parameters=None):
+        # Gegenstück zu runner.run_step; blockierende Teile laufen im kleinen Thread-Pool
+        run = StepRun(step, workflow_instance_id, emit, inputs, parameters)
+        try:
+            result = await self._blocking_call(run.begin)
+            if result is not None:
+                return result
+            mod = run.mod
+            if (mod.backend or "subprocess") == "pool":
+                result = await self._execute_in_pool(run)
+            else:
+                result = await execute_subprocess(
+                    mod, run.paths, run.input_data, run.output, run.log_lines, run.limits, run.env, run.profile)
+        except asyncio.CancelledError:
+            # Abbruch vor dem Prozessstart
+            if run.output is None:
+                return "cancelled", None
+            result = None, "cancelled", None
+        except Exception as e:
+            return await self._blocking_call(run.fail, e)
+        # Abschluss nicht mehr unterbrechen, sonst bliebe der ModuleRun auf "running"
+        future = self.loop.run_in_executor(self._blocking, run.complete, *result)
+        try:
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                return await future
+        except Exception as e:
+            return await self._blocking_call(run.fail, e)
+
+    async def _execute_in_pool(self, run):
+        # Warm-Pool-Worker arbeiten blockierend; dafür gibt es genau POOL_SIZE Threads
+        stop_event = threading.Event()
+        future = self.loop.run_in_executor(
+            self._pool_threads, _execute_in_pool,
+            run.mod, run.paths, run.input_data, run.output, run.log_lines, stop_event, run.limits, run.env,
+            run.profile)
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            stop_event.set()
+            return await future
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_async_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = AsyncExecutor()
+        return _executor
@@ -0,0 +1,71 @@
+import os
+import shutil
+import tempfile
+
+from db.db_setup import SessionLocal, WorkflowInstance
+
+# Binäre Artefakte: große Daten (Arrays, Tabellen) gehen nicht über stdin/stdout, sondern als
+# Datei im Shared Memory (tmpfs, /dev/shm). Der Runner gibt dem Modul den Pfad seiner Ausgabe
+# (WORKFLOW_OUTPUT_FILE) und die Pfade binärer Eingänge (WORKFLOW_INPUT_FILES) mit; das Modul
+# bildet sie per mmap ab (workflows/module_io.py), Nachfolger lesen dieselben Seiten ohne Kopie.
+#
+# Die Dateien gehören zu einer WorkflowInstance: <BLOB_ROOT>/<instance_id>/<run_id>, Referenz
+# in ModuleRun.output_ref/input_ref als "shm:<instance_id>/<run_id>". Sie werden gelöscht, wenn
+# die Instanz abgeschlossen ist (engine.finish_workflow_instance), und zählen nicht zum Cache.
+
+BLOB_ROOT = os.environ.get(
+    "WORKFLOW_BLOB_DIR",
+    os.path.join("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(), "workflow_blobs"),
+)
+PREFIX = "shm:"
+
+ACTIVE_STATUS = ("pending", "running")
+
+
+def is_blob(ref):
+    return bool(ref) and ref.startswith(PREFIX)
+
+
+def blob_ref(workflow_instance_id, run_id):
+    return f"{PREFIX}{workflow_instance_id}/{run_id}"
+
+
+def blob_path(ref, root=BLOB_ROOT):
+    return os.path.join(root, *ref[len(PREFIX):].split("/"))
+
+
+def output_path(workflow_instance_id, run_id, root=BLOB_ROOT):
+    # Pfad für die binäre Ausgabe eines Runs (Verzeichnis wird angelegt, die Datei legt das Modul an)
+    directory = os.path.join(root, str(workflow_instance_id))
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, str(run_id))
+
+
+def exists(ref, root=BLOB_ROOT):
+    return is_blob(ref) and os.path.exists(blob_path(ref, root))
+
+
+def remove_instance(workflow_instance_id, root=BLOB_ROOT):
+    shutil.rmtree(os.path.join(root, str(workflow_instance_id)), ignore_errors=True)
+
+
+def remove_stale(root=BLOB_ROOT):
+    # Verzeichnisse von Instanzen, die nicht mehr laufen (z.B. nach einem Absturz der GUI)
+    try:
+        ids = [int(name) for name in os.listdir(root) if name.isdigit()]
+    except FileNotFoundError:
+        return []
+    if not ids:
+        return []
+    session = SessionLocal()
+    try:
+        active = {
+            row.id for row in session.query(WorkflowInstance.id)
+            .filter(WorkflowInstance.id.in_(ids), WorkflowInstance.status.in_(ACTIVE_STATUS))
+        }
+    finally:
+        session.close()
+    stale = [i for i in ids if i not in active]
+    for instance_id in stale:
+        remove_instance(instance_id, root)
+    return stale
@@ -0,0 +1,334 @@
+import argparse
+import os
+import signal
+import sys
+import threading
+
+# Kommandozeile ohne PyQt5: python -m workflows run|resume|list|status|history|show|archive|agent|queue ...
+# DB- und Engine-Module werden erst im jeweiligen Kommando importiert, damit der Start schnell bleibt
+
+
+def cmd_run(args):
+    from workflows.engine import load_workflow, run_workflow
+
+    workflow = load_workflow(args.workflow)
+    if workflow is None:
+        print(f"Workflow '{args.workflow}' nicht gefunden.", file=sys.stderr)
+        return 2
+
+    # Strg+C bricht den Lauf sauber ab (laufende Steps werden beendet)
+    if args.profile:
+        os.environ["WORKFLOW_PROFILE"] = args.profile
+
+    stop_event = threading.Event()
+    signal.signal(signal.SIGINT, lambda signum, frame: stop_event.set())
+
+    instance_id, status, step_status = run_workflow(
+        workflow, print, stop_event, max_parallel=args.parallel, pipeline=args.pipeline)
+    print(f"Workflow '{workflow.name}' (Instanz {instance_id}): {status}")
+    if stop_event.is_set():
+        return 130
+    return 0 if status == "finished" else 1
+
+
+def cmd_resume(args):
+    # Fehlgeschlagene Instanz fortsetzen: fertige Steps übernehmen, Rest neu ausführen
+    from workflows.engine import load_workflow, resumable_instance, resume_workflow
+
+    instance_id = args.instance
+    if instance_id is None:
+        if not args.workflow:
+            print("Instanz oder --workflow angeben.", file=sys.stderr)
+            return 2
+        workflow = load_workflow(args.workflow)
+        if workflow is None:
+            print(f"Workflow '{args.workflow}' nicht gefunden.", file=sys.stderr)
+            return 2
+        instance_id = resumable_instance(workflow.id)
+        if instance_id is None:
+            print(f"Letzter Lauf von '{workflow.name}' ist nicht fehlgeschlagen.", file=sys.stderr)
+            return 2
+
+    if args.profile:
+        os.environ["WORKFLOW_PROFILE"] = args.profile
+
+    stop_event = threading.Event()
+    signal.signal(signal.SIGINT, lambda signum, frame: stop_event.set())
+
+    try:
+        new_id, status, step_status = resume_workflow(
+            instance_id, print, stop_event, max_parallel=args.parallel, pipeline=args.pipeline)
+    except (LookupError, ValueError) as e:
+        print(str(e), file=sys.stderr)
+        return 2
+    print(f"Instanz {new_id} (Fortsetzung von {instance_id}): {status}")
+    if stop_event.is_set():
+        return 130
+    return 0 if status == "finished" else 1
+
+
+def cmd_list(args):
+    from sqlalchemy import func
+    from db.db_setup import SessionLocal, Workflow, WorkflowStep
+
+    session = SessionLocal()
+    rows = (
+        session.query(Workflow.id, Workflow.name, func.count(WorkflowStep.id))
+        .outerjoin(WorkflowStep, WorkflowStep.workflow_id == Workflow.id)
+        .group_by(Workflow.id, Workflow.name)
+        .order_by(Workflow.name)
+        .all()
+    )
+    session.close()
+    for wf_id, name, steps in rows:
+        print(f"{wf_id:>5}  {name}  ({steps} Steps)")
+    return 0
+
+
+def cmd_status(args):
+    from db.db_setup import SessionLocal, Workflow, WorkflowInstance, WorkflowStep, Module, ModuleRun
+
+    session = SessionLocal()
+    try:
+        query = (
+            session.query(WorkflowInstance, Workflow.name)
+            .join(Workflow, Workflow.id == WorkflowInstance.workflow_id)
+            .order_by(WorkflowInstance.started_at.desc())
+        )
+        if args.workflow:
+            query = query.filter(Workflow.name == args.workflow)
+        instances = query.limit(args.limit).all()
+        for inst, name in instances:
+            status = inst.status.value if inst.status else "-"
+            print(f"{inst.id:>5}  {name:<30} {status:<10} {inst.started_at or '-'}  {inst.finished_at or '-'}")
+
+        # Für einen einzelnen Workflow zusätzlich die Steps der letzten Instanz
+        if args.workflow and instances:
+            inst = instances[0][0]
+            runs = (
+                session.query(ModuleRun, Module.name)
+                .join(WorkflowStep, WorkflowStep.id == ModuleRun.workflow_step_id)
+                .join(Module, Module.id == WorkflowStep.module_id)
+                .filter(ModuleRun.workflow_instance_id == inst.id)
+                .order_by(ModuleRun.id)
+                .all()
+            )
+            from workflows.usage import format_usage
+            print()
+            for run, module_name in runs:
+                status = run.status.value if run.status else "-"
+                print(f"       {module_name:<30} {status:<10} {run.started_at or '-'}  {run.finished_at or '-'}  {format_usage(run)}")
+    finally:
+        session.close()
+    return 0
+
+
+def cmd_history(args):
+    # Laufende und archivierte Instanzen eines Workflows, neueste zuerst
+    from db.archive import archived_instances
+    from db.db_setup import SessionLocal, WorkflowInstance
+    from workflows.engine import load_workflow
+
+    workflow = load_workflow(args.workflow)
+    if workflow is None:
+        print(f"Workflow '{args.workflow}' nicht gefunden.", file=sys.stderr)
+        return 2
+
+    session = SessionLocal()
+    try:
+        live = (
+            session.query(WorkflowInstance)
+            .filter(WorkflowInstance.workflow_id == workflow.id)
+            .order_by(WorkflowInstance.started_at.desc())
+            .limit(args.limit)
+            .all()
+        )
+        rows = [
+            (inst.id, inst.status.value if inst.status else "-", inst.started_at, inst.finished_at,
+             f"Fortsetzung von {inst.resumed_from_id}" if inst.resumed_from_id else "")
+            for inst in live
+        ]
+    finally:
+        session.close()
+    if len(rows) < args.limit:
+        for entry in archived_instances(workflow.id, args.limit - len(rows)):
+            rows.append((entry.instance_id, entry.status or "-", entry.started_at, entry.finished_at, "archiviert"))
+
+    for inst_id, status, started, finished, note in rows:
+        print(f"{inst_id:>7}  {status:<10} {started or '-'}  {finished or '-'}  {note}")
+    return 0
+
+
+def cmd_show(args):
+    # Steps einer Instanz (aus der DB oder dem Archiv), optional mit Logs
+    from datetime import datetime
+    from db.archive import find_archive, read_archive
+    from db.db_setup import SessionLocal, WorkflowInstance, WorkflowStep, Module, ModuleRun
+    from db.log_store import iter_lines
+    from workflows.usage import format_usage
+
+    session = SessionLocal()
+    try:
+        inst = session.get(WorkflowInstance, args.instance)
+        if inst is not None:
+            header = (inst.status.value if inst.status else "-", inst.started_at, inst.finished_at, "")
+            runs = [
+                {"id": run.id, "module_name": name, "status": run.status.value if run.status else "-",
+                 "started_at": run.started_at, "finished_at": run.finished_at, "usage": format_usage(run)}
+                for run, name in (
+                    session.query(ModuleRun, Module.name)
+                    .outerjoin(WorkflowStep, WorkflowStep.id == ModuleRun.workflow_step_id)
+                    .outerjoin(Module, Module.id == WorkflowStep.module_id)
+                    .filter(ModuleRun.workflow_instance_id == inst.id)
+                    .order_by(ModuleRun.id)
+                    .all()
+                )
+            ]
+    finally:
+        session.close()
+
+    if inst is None:
+        entry = find_archive(args.instance)
+        if entry is None:
+            print(f"Instanz {args.instance} nicht gefunden.", file=sys.stderr)
+            return 2
+        try:
+            data, runs = read_archive(entry.path, logs=args.log)
+        except OSError as e:
+            print(f"Archiv {entry.path} nicht lesbar: {e}", file=sys.stderr)
+            return 1
+        parse = lambda value: datetime.fromisoformat(value) if value else None
+        header = (data["status"] or "-", parse(data["started_at"]), parse(data["finished_at"]), f"archiviert: {entry.path}")
+        for run in runs:
+            run["started_at"], run["finished_at"] = parse(run["started_at"]), parse(run["finished_at"])
+            run["usage"] = format_usage(run)
+
+    print(f"Instanz {args.instance}: {header[0]}  {header[1] or '-'}  {header[2] or '-'}  {header[3]}")
+    for run in runs:
+        print(f"       {run['module_name'] or '-':<30} {run['status'] or '-':<10} "
+              f"{run['started_at'] or '-'}  {run['finished_at'] or '-'}  {run['usage']}")
+        if args.log:
+            lines = run["log"] if "log" in run else iter_lines(run["id"])
+            for line in lines:
+                print(f"         | {line}")
+    return 0
+
+
+def cmd_archive(args):
+    # Aufbewahrung anwenden (z.B. per cron), Standardwerte aus WORKFLOW_KEEP_RUNS/_DAYS
+    from db.archive import apply_retention, KEEP_RUNS, KEEP_DAYS
+    from workflows.engine import load_workflow
+
+    keep_runs = KEEP_RUNS if args.keep_runs is None else args.keep_runs
+    keep_days = KEEP_DAYS if args.keep_days is None else args.keep_days
+    workflow_id = None
+    if args.workflow:
+        workflow = load_workflow(args.workflow)
+        if workflow is None:
+            print(f"Workflow '{args.workflow}' nicht gefunden.", file=sys.stderr)
+            return 2
+        workflow_id = workflow.id
+    if not keep_runs and not keep_days:
+        print("Keine Aufbewahrung angegeben (--keep-runs/--keep-days bzw. WORKFLOW_KEEP_RUNS/_DAYS).", file=sys.stderr)
+        return 2
+
+    archived = apply_retention(workflow_id, keep_runs, keep_days, dry_run=args.dry_run)
+    verb = "würden archiviert" if args.dry_run else "archiviert"
+    for wf_id, count in archived.items():
+        print(f"Workflow {wf_id}: {count} Instanz(en) {verb}")
+    if not archived:
+        print("Nichts zu archivieren.")
+    return 0
+
+
+def cmd_agent(args):
+    # Worker-Agent: Jobs aus der Warteschlange ausführen, bis Strg+C/SIGTERM
+    from workflows.agent import WorkerAgent, AGENT_CONCURRENCY, AGENT_POLL
+    from db.job_queue import LEASE_SECONDS
+
+    agent = WorkerAgent(
+        args.name,
+        args.concurrency or AGENT_CONCURRENCY,
+        args.lease or LEASE_SECONDS,
+        args.poll or AGENT_POLL,
+    )
+    # Beenden: laufende Jobs abbrechen und für andere Agenten wieder einreihen
+    signal.signal(signal.SIGINT, lambda signum, frame: agent.stop())
+    signal.signal(signal.SIGTERM, lambda signum, frame: agent.stop())
+    agent.run()
+    return 0
+
+
+def cmd_queue(args):
+    from db.job_queue import queue_counters
+
+    counters = queue_counters()
+    print(f"Offen: {counters['pending']}, laufend: {counters['running']}")
+    for worker, info in sorted(counters["workers"].items(), key=lambda item: item[0] or ""):
+        print(f"  {worker or '-':<40} {info['running']:>4} Jobs  Lease bis {info['lease_until'] or '-'}")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m workflows", description="Workflows ohne GUI ausführen")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Workflow ausführen, Logs nach stdout")
+    run.add_argument("workflow", help="Name oder ID des Workflows")
+    run.add_argument("--parallel", type=int, default=None, help="max. parallele Steps")
+    run.add_argument("--pipeline", action=argparse.BooleanOptionalAction, default=None,
+                     help="Pipeline-Modus erzwingen/abschalten")
+    run.add_argument("--profile", nargs="?", const="cprofile", choices=("cprofile", "sample"),
+                     help="alle Steps profilieren (Standard-Modus: cprofile)")
+    run.set_defaults(func=cmd_run)
+
+    resume = sub.add_parser("resume", help="Fehlgeschlagene Instanz ab dem fehlgeschlagenen Step fortsetzen")
+    resume.add_argument("instance", type=int, nargs="?", help="ID der fehlgeschlagenen Instanz")
+    resume.add_argument("-w", "--workflow", help="statt der ID: letzte Instanz dieses Workflows")
+    resume.add_argument("--parallel", type=int, default=None, help="max. parallele Steps")
+    resume.add_argument("--pipeline", action=argparse.BooleanOptionalAction, default=None,
+                        help="Pipeline-Modus erzwingen/abschalten")
+    resume.add_argument("--profile", nargs="?", const="cprofile", choices=("cprofile", "sample"),
+                        help="alle Steps profilieren (Standard-Modus: cprofile)")
+    resume.set_defaults(func=cmd_resume)
+
+    lst = sub.add_parser("list", help="Workflows auflisten")
+    lst.set_defaults(func=cmd_list)
+
+    status = sub.add_parser("status", help="Letzte Workflow-Instanzen anzeigen")
+    status.add_argument("workflow", nargs="?", help="nur diesen Workflow (mit Step-Details)")
+    status.add_argument("-n", "--limit", type=int, default=10)
+    status.set_defaults(func=cmd_status)
+
+    history = sub.add_parser("history", help="Instanzen eines Workflows inkl. archivierter")
+    history.add_argument("workflow", help="Name oder ID des Workflows")
+    history.add_argument("-n", "--limit", type=int, default=20)
+    history.set_defaults(func=cmd_history)
+
+    show = sub.add_parser("show", help="Steps einer Instanz anzeigen (auch archiviert)")
+    show.add_argument("instance", type=int, help="ID der Workflow-Instanz")
+    show.add_argument("--log", action="store_true", help="Logs mit ausgeben")
+    show.set_defaults(func=cmd_show)
+
+    archive = sub.add_parser("archive", help="Alte Instanzen archivieren und aus der DB löschen")
+    archive.add_argument("workflow", nargs="?", help="nur diesen Workflow")
+    archive.add_argument("--keep-runs", type=int, help="neueste N Instanzen behalten (Standard: WORKFLOW_KEEP_RUNS)")
+    archive.add_argument("--keep-days", type=float, help="Instanzen der letzten D Tage behalten (Standard: WORKFLOW_KEEP_DAYS)")
+    archive.add_argument("--dry-run", action="store_true", help="nur anzeigen, was archiviert würde")
+    archive.set_defaults(func=cmd_archive)
+
+    agent = sub.add_parser("agent", help="Worker-Agent: Jobs aus der Warteschlange ausführen (WORKFLOW_EXECUTOR=queue)")
+    agent.add_argument("--name", help="Name des Agenten (Standard: Rechner:PID)")
+    agent.add_argument("--concurrency", type=int, help="max. gleichzeitige Jobs (Standard: WORKFLOW_AGENT_CONCURRENCY)")
+    agent.add_argument("--lease", type=float, help="Lease in Sekunden (Standard: WORKFLOW_LEASE_SECONDS)")
+    agent.add_argument("--poll", type=float, help="Abfrageintervall in Sekunden, wenn nichts zu tun ist")
+    agent.set_defaults(func=cmd_agent)
+
+    queue = sub.add_parser("queue", help="Offene und laufende Jobs der Warteschlange anzeigen")
+    queue.set_defaults(func=cmd_queue)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
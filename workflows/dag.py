@@ -0,0 +1,74 @@
+class CycleError(ValueError):
+    pass
+
+
+def step_dependencies(steps):
+    # Abhängigkeiten je Step (step.id -> Liste der Vorgänger-IDs)
+    # "depends_on" in WorkflowStep.parameters überschreibt die Standard-Kette:
+    # ohne Angabe hängt ein Step vom vorherigen Step (nach position) ab
+    ordered = sorted(steps, key=lambda s: s.position)
+    known = {s.id for s in ordered}
+    deps = {}
+    previous = None
+    for step in ordered:
+        params = step.parameters or {}
+        if "depends_on" in params:
+            deps[step.id] = [d for d in params["depends_on"] or [] if d in known and d != step.id]
+        else:
+            deps[step.id] = [previous.id] if previous else []
+        previous = step
+    return deps
+
+
+def dependents(deps):
+    # Umkehrung: step.id -> Liste der Nachfolger
+    result = {sid: [] for sid in deps}
+    for sid, ups in deps.items():
+        for up in ups:
+            result[up].append(sid)
+    return result
+
+
+def topological_order(deps):
+    # Kahn-Algorithmus, stabil in Eingabe-Reihenfolge
+    remaining = {sid: len(ups) for sid, ups in deps.items()}
+    children = dependents(deps)
+    ready = [sid for sid in deps if remaining[sid] == 0]
+    order = []
+    while ready:
+        sid = ready.pop(0)
+        order.append(sid)
+        for child in children[sid]:
+            remaining[child] -= 1
+            if remaining[child] == 0:
+                ready.append(child)
+    if len(order) != len(deps):
+        raise CycleError("Zyklische Abhängigkeit zwischen Steps: "
+                         + ", ".join(str(sid) for sid in deps if sid not in order))
+    return order
+
+
+def is_linear(deps):
+    # True, wenn höchstens ein Step gleichzeitig laufen kann (einfache Kette)
+    children = dependents(deps)
+    roots = [sid for sid, ups in deps.items() if not ups]
+    return len(roots) <= 1 and all(len(c) <= 1 for c in children.values()) \
+        and all(len(ups) <= 1 for ups in deps.values())
+
+
+def descendants(deps, step_ids):
+    # Alle Steps, die (transitiv) von step_ids abhängen
+    children = dependents(deps)
+    seen = set()
+    todo = list(step_ids)
+    while todo:
+        for child in children[todo.pop()]:
+            if child not in seen:
+                seen.add(child)
+                todo.append(child)
+    return seen
+
+
+def is_sweep(step):
+    # Step mit "sweep" in den Parametern: wird als Parameter-Sweep aufgefächert (workflows/sweep.py)
+    return bool((step.parameters or {}).get("sweep"))
@@ -0,0 +1,240 @@
+import threading
+from datetime import datetime
+
+from sqlalchemy.orm import joinedload
+
+from db.archive import schedule_retention
+from db.db_setup import SessionLocal, Workflow, WorkflowStep, WorkflowInstance, ModuleRun
+from db.log_writer import get_log_writer
+from workflows import blobs
+from workflows.artifacts import get_artifact_store
+from workflows.async_executor import EXECUTOR_MODE, get_async_executor
+from workflows.dag import step_dependencies, is_linear, is_sweep, descendants
+from workflows.executor import DagExecutor
+from workflows.pipeline import run_pipeline
+from workflows.runner import run_step, run_queued, start_module_run
+from workflows.sweep import run_sweep
+
+# Status, mit denen ein Workflow als erfolgreich gilt
+OK_STATUS = ("finished", "skipped")
+
+
+def load_workflow(name_or_id):
+    # Workflow inkl. Steps + Module laden und vom Session-Kontext lösen
+    session = SessionLocal()
+    try:
+        query = session.query(Workflow).options(joinedload(Workflow.steps).joinedload(WorkflowStep.module))
+        if isinstance(name_or_id, int) or str(name_or_id).isdigit():
+            workflow = query.filter_by(id=int(name_or_id)).first() or query.filter_by(name=str(name_or_id)).first()
+        else:
+            workflow = query.filter_by(name=name_or_id).first()
+        session.expunge_all()
+        return workflow
+    finally:
+        session.close()
+
+
+def create_workflow_instance(workflow_id, status="running", resumed_from_id=None):
+    # Jeder Lauf bekommt eine eigene Instanz, ältere bleiben als Historie erhalten
+    # status="pending": Instanz wartet noch in der Warteschlange des Schedulers
+    # resumed_from_id: Instanz, deren Ergebnisse eine Fortsetzung übernimmt
+    session = SessionLocal()
+    try:
+        instance = WorkflowInstance(
+            workflow_id=workflow_id,
+            status=status,
+            started_at=datetime.now(),
+            resumed_from_id=resumed_from_id,
+        )
+        session.add(instance)
+        session.commit()
+        return instance.id
+    finally:
+        session.close()
+
+
+def workflow_succeeded(step_status):
+    return all(s in OK_STATUS for s in step_status.values())
+
+
+def finish_workflow_instance(workflow_instance_id, step_status):
+    # Endstatus der Instanz aus den Step-Ergebnissen ableiten und speichern
+    status = "finished" if workflow_succeeded(step_status) else "failed"
+    session = SessionLocal()
+    inst = session.get(WorkflowInstance, workflow_instance_id)
+    inst.status = status
+    inst.finished_at = datetime.now()
+    workflow_id = inst.workflow_id
+    session.commit()
+    session.close()
+    # Binäre Artefakte gehören zur Instanz; Reste abgestürzter Instanzen gleich mit entfernen
+    blobs.remove_instance(workflow_instance_id)
+    blobs.remove_stale()
+    # Ältere Instanzen archivieren, falls eine Aufbewahrung konfiguriert ist
+    schedule_retention(workflow_id)
+    return status
+
+
+def execute_steps(steps, workflow_instance_id, emit=print, stop_event=None, max_parallel=None,
+                  pipeline=False, on_step_finished=None, completed=None):
+    # Steps einer Instanz ausführen (Pipeline-Modus oder DAG), Rückgabe: step.id -> Status
+    # completed: step.id -> (Status, output_ref) übernommener Steps (Fortsetzen), laufen nicht erneut
+    stop_event = stop_event or threading.Event()
+    on_step_finished = on_step_finished or (lambda step_id, status: None)
+
+    if EXECUTOR_MODE == "async":
+        # Alle Prozesse in der gemeinsamen Event-Loop, dieser Thread wartet nur
+        run = get_async_executor().submit(steps, workflow_instance_id, emit, max_parallel, pipeline, on_step_finished,
+                                          completed)
+        return run.wait(stop_event)
+
+    if pipeline and completed:
+        # Übernommene Ergebnisse liegen als Artefakte vor, die Pipeline kennt nur Prozess-Pipes
+        emit("Fortsetzung im Pipeline-Modus: übrige Steps laufen als DAG.")
+    elif pipeline and EXECUTOR_MODE == "queue":
+        # Pipes gibt es nur zwischen Prozessen eines Rechners, Jobs laufen auf beliebigen Agenten
+        emit("Pipeline-Modus nicht mit Worker-Agenten, führe als DAG aus.")
+    elif pipeline:
+        if is_linear(step_dependencies(steps)) and not any(is_sweep(s) for s in steps):
+            step_status = run_pipeline(steps, workflow_instance_id, emit, stop_event)
+            for step_id, status in step_status.items():
+                on_step_finished(step_id, status)
+            return step_status
+        emit("Pipeline-Modus nur für lineare Workflows ohne Sweep, führe als DAG aus.")
+
+    executor = None
+
+    def run_one(step, inputs):
+        # bei paralleler Ausführung Zeilen mit Modulnamen markieren
+        name = step.module.name
+        step_emit = (lambda line: emit(f"[{name}] {line}")) if executor.parallel else emit
+        run = run_queued if EXECUTOR_MODE == "queue" else run_step
+        if is_sweep(step):
+            status, output_ref = run_sweep(step, workflow_instance_id, step_emit, stop_event, inputs, run)
+        else:
+            status, output_ref = run(step, workflow_instance_id, step_emit, stop_event, inputs)
+        on_step_finished(step.id, status)
+        return status, output_ref
+
+    executor = DagExecutor(steps, run_one, max_parallel, stop_event, completed)
+    step_status = executor.run()
+    if stop_event.is_set():
+        emit("Execution stopped by user.")
+    return step_status
+
+
+def run_workflow(workflow, emit=print, stop_event=None, max_parallel=None, pipeline=None):
+    # Kompletter Lauf: Instanz anlegen, Steps ausführen, Instanz abschließen
+    # Rückgabe: (workflow_instance_id, Status, step.id -> Status)
+    if not isinstance(workflow, Workflow):
+        workflow = load_workflow(workflow)
+    if workflow is None:
+        raise LookupError("Workflow nicht gefunden")
+    instance_id = create_workflow_instance(workflow.id)
+    steps = sorted(workflow.steps, key=lambda s: s.position)
+    try:
+        step_status = execute_steps(
+            steps, instance_id, emit, stop_event,
+            max_parallel if max_parallel is not None else workflow.max_parallel,
+            bool(workflow.pipeline) if pipeline is None else pipeline,
+        )
+    except Exception as e:
+        emit(f"ERROR: {e}")
+        step_status = {s.id: "failed" for s in steps}
+    return instance_id, finish_workflow_instance(instance_id, step_status), step_status
+
+
+# --- Fortsetzen nach Fehler ---
+
+RESUMABLE_STATUS = ("failed", "cancelled", "timeout", "oom")
+
+
+def resumable_instance(workflow_id):
+    # Letzte Instanz eines Workflows, wenn sie fehlgeschlagen ist (sonst None)
+    session = SessionLocal()
+    try:
+        inst = session.execute(WorkflowInstance.latest(workflow_id).limit(1)).scalars().first()
+        if inst is None or inst.status is None or inst.status.value not in RESUMABLE_STATUS:
+            return None
+        # Vor dem Start aus der Warteschlange genommen: es gibt nichts fortzusetzen
+        if session.query(ModuleRun.id).filter(ModuleRun.workflow_instance_id == inst.id).first() is None:
+            return None
+        return inst.id
+    finally:
+        session.close()
+
+
+def resume_plan(instance_id):
+    # Was eine Fortsetzung übernimmt: (Workflow, step.id -> ModuleRun).
+    # Übernommen wird ein Step, dessen letzter Run in der Instanz "finished" ist und dessen
+    # Ergebnis noch im Artefakt-Store liegt; fehlgeschlagene, abgebrochene oder neue
+    # Steps und alles, was (transitiv) von ihnen abhängt, läuft neu.
+    session = SessionLocal()
+    try:
+        inst = session.get(WorkflowInstance, instance_id)
+        if inst is None:
+            raise LookupError(f"Instanz {instance_id} nicht gefunden")
+        status = inst.status.value if inst.status else None
+        if status not in RESUMABLE_STATUS:
+            raise ValueError(f"Instanz {instance_id} ist {status or 'ohne Status'}, fortsetzen geht nur nach einem Fehler")
+        workflow_id = inst.workflow_id
+        latest = {}
+        for run in session.query(ModuleRun).filter(ModuleRun.workflow_instance_id == instance_id).order_by(ModuleRun.id):
+            latest[run.workflow_step_id] = run
+        session.expunge_all()
+    finally:
+        session.close()
+
+    workflow = load_workflow(workflow_id)
+    if workflow is None:
+        raise LookupError(f"Workflow {workflow_id} nicht gefunden")
+    store = get_artifact_store()
+    deps = step_dependencies(workflow.steps)
+    # Binäre Ergebnisse (blobs.py) sind mit der alten Instanz gelöscht, diese Steps laufen erneut
+    done = {
+        step_id: run for step_id, run in latest.items()
+        if step_id in deps and run.status is not None and run.status.value == "finished"
+        and not blobs.is_blob(run.output_ref) and store.exists(run.output_ref)
+    }
+    rerun = set(deps) - set(done)
+    rerun |= descendants(deps, rerun)
+    return workflow, {step_id: run for step_id, run in done.items() if step_id not in rerun}
+
+
+def adopt_results(workflow_instance_id, steps, reused, source_instance_id):
+    # Übernommene Steps in der neuen Instanz als fertige Modul-Runs eintragen,
+    # damit Historie, Status und eine weitere Fortsetzung vollständig sind
+    # Rückgabe: step.id -> (Status, output_ref) für execute_steps(completed=...)
+    writer = get_log_writer()
+    completed = {}
+    for step in steps:
+        run = reused.get(step.id)
+        if run is None:
+            continue
+        run_id = start_module_run(step, workflow_instance_id, run.input_ref, output_ref=run.output_ref)
+        writer.append_log(run_id, f"Ergebnis {run.output_ref[:12]} aus Instanz {source_instance_id} übernommen.")
+        writer.finish_run(run_id, wait=False, status="finished", finished_at=datetime.now())
+        completed[step.id] = ("finished", run.output_ref)
+    return completed
+
+
+def resume_workflow(instance_id, emit=print, stop_event=None, max_parallel=None, pipeline=None):
+    # Fehlgeschlagene Instanz fortsetzen: neue Instanz (resumed_from_id = instance_id) anlegen,
+    # fertige Steps übernehmen, nur den fehlgeschlagenen Step und alles danach ausführen
+    # Rückgabe wie run_workflow: (workflow_instance_id, Status, step.id -> Status)
+    workflow, reused = resume_plan(instance_id)
+    steps = sorted(workflow.steps, key=lambda s: s.position)
+    new_id = create_workflow_instance(workflow.id, resumed_from_id=instance_id)
+    completed = adopt_results(new_id, steps, reused, instance_id)
+    emit(f"Fortsetzung von Instanz {instance_id}: {len(completed)} von {len(steps)} Steps übernommen.")
+    try:
+        step_status = execute_steps(
+            steps, new_id, emit, stop_event,
+            max_parallel if max_parallel is not None else workflow.max_parallel,
+            bool(workflow.pipeline) if pipeline is None else pipeline,
+            completed=completed,
+        )
+    except Exception as e:
+        emit(f"ERROR: {e}")
+        step_status = {s.id: completed.get(s.id, ("failed",))[0] for s in steps}
+    return new_id, finish_workflow_instance(new_id, step_status), step_status
@@ -0,0 +1,110 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from workflows.dag import step_dependencies, dependents, topological_order, is_linear, is_sweep
+
+# Obergrenze für gleichzeitig laufende Steps im ganzen Prozess (über alle Workflows);
+# mit WORKFLOW_EXECUTOR=queue laufen die Prozesse bei den Worker-Agenten, dann begrenzt sie
+# nur die gleichzeitig eingereihten Jobs und hängt nicht an den Kernen dieses Rechners
+QUEUE_MODE = os.environ.get("WORKFLOW_EXECUTOR") == "queue"
+GLOBAL_MAX_WORKERS = int(os.environ.get("WORKFLOW_MAX_WORKERS", 256 if QUEUE_MODE else os.cpu_count() or 4))
+_global_slots = threading.BoundedSemaphore(GLOBAL_MAX_WORKERS)
+
+
+class DagExecutor:
+    # Führt Steps entlang ihrer Abhängigkeiten aus: alle bereiten Steps laufen parallel,
+    # begrenzt durch max_parallel (pro Workflow) und GLOBAL_MAX_WORKERS (global)
+    def __init__(self, steps, run_step, max_parallel=None, stop_event=None, completed=None):
+        self.steps = {s.id: s for s in steps}
+        self.run_step = run_step # Callable(step, inputs) -> (Status, output_ref)
+        self.max_parallel = max(1, max_parallel or GLOBAL_MAX_WORKERS)
+        self.stop_event = stop_event or threading.Event()
+        self.deps = step_dependencies(steps)
+        topological_order(self.deps) # wirft CycleError vor dem ersten Start
+        self.parallel = self.max_parallel > 1 and not is_linear(self.deps)
+        self.status = {}
+        self.outputs = {} # step.id -> output_ref (Artefakt-Hash)
+        self.completed = completed or {} # step.id -> (Status, output_ref), schon vorhandene Ergebnisse
+
+    def _inputs(self, sid):
+        # Ergebnisse der Vorgänger, in Reihenfolge ihrer Position
+        ups = sorted(self.deps[sid], key=lambda up: self.steps[up].position)
+        return [self.outputs[up] for up in ups if self.outputs.get(up)]
+
+    def _run_with_slot(self, step):
+        # Sweeps belegen die Slots je Sub-Run selbst (workflows/sweep.py)
+        if is_sweep(step):
+            return self.run_step(step, self._inputs(step.id))
+        # Globalen Slot belegen, dabei auf Abbruch reagieren
+        while not _global_slots.acquire(timeout=0.2):
+            if self.stop_event.is_set():
+                return "cancelled", None
+        try:
+            if self.stop_event.is_set():
+                return "cancelled", None
+            return self.run_step(step, self._inputs(step.id))
+        finally:
+            _global_slots.release()
+
+    def _prepare(self):
+        self._children = dependents(self.deps)
+        self._waiting = {sid: len(ups) for sid, ups in self.deps.items()}
+        self._ready = [sid for sid in self.deps if self._waiting[sid] == 0]
+        # Übernommene Ergebnisse (Fortsetzen nach Fehler) wie fertige Steps eintragen
+        for sid, (status, output_ref) in self.completed.items():
+            if sid in self.deps:
+                self._complete(sid, status, output_ref)
+        self._ready = [sid for sid in self._ready if sid not in self.status]
+        # Reihenfolge nach position, damit die Standard-Kette wie bisher läuft
+        self._ready.sort(key=lambda sid: self.steps[sid].position)
+
+    def _complete(self, sid, status, output_ref):
+        # Ergebnis eines Steps eintragen und Nachfolger freigeben bzw. überspringen
+        self.status[sid] = status
+        self.outputs[sid] = output_ref
+        if status in ("finished", "skipped"):
+            for child in self._children[sid]:
+                self._waiting[child] -= 1
+                if self._waiting[child] == 0:
+                    self._ready.append(child)
+            self._ready.sort(key=lambda s: self.steps[s].position)
+        else:
+            self._skip_descendants(sid, self._children)
+
+    def _finish(self):
+        # Was nie gestartet wurde (Abbruch), als cancelled markieren
+        for sid in self.deps:
+            self.status.setdefault(sid, "cancelled")
+        return self.status
+
+    def run(self):
+        self._prepare()
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_parallel, thread_name_prefix="step") as pool:
+            while self._ready or running:
+                while self._ready and len(running) < self.max_parallel and not self.stop_event.is_set():
+                    sid = self._ready.pop(0)
+                    running[pool.submit(self._run_with_slot, self.steps[sid])] = sid
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    sid = running.pop(future)
+                    try:
+                        status, output_ref = future.result()
+                    except Exception:
+                        status, output_ref = "failed", None
+                    self._complete(sid, status, output_ref)
+
+        return self._finish()
+
+    def _skip_descendants(self, sid, children):
+        todo = list(children[sid])
+        while todo:
+            child = todo.pop()
+            if child not in self.status:
+                self.status[child] = "upstream_failed"
+                todo.extend(children[child])
@@ -0,0 +1,137 @@
+import os
+import resource
+import signal
+import time
+
+from workflows.usage import wait_exit
+
+# Sekunden zwischen SIGTERM und SIGKILL an die Prozessgruppe
+KILL_GRACE = float(os.environ.get("WORKFLOW_KILL_GRACE", "5"))
+
+
+class Limits:
+    # Grenzen für einen Modul-Prozess, None = unbegrenzt
+    def __init__(self, timeout=None, cpu=None, memory_mb=None):
+        self.timeout = timeout or None # Wanduhr-Sekunden
+        self.cpu = cpu or None # CPU-Sekunden (RLIMIT_CPU)
+        self.memory_mb = memory_mb or None # Adressraum (RLIMIT_AS)
+        self.oom_kills = None # Stand von memory.events beim Start (rlimit_preexec)
+
+    def deadline(self):
+        return time.monotonic() + self.timeout if self.timeout else None
+
+
+def module_limits(mod, parameters=None):
+    # Grenzen aus dem Modul; "timeout" in WorkflowStep.parameters überschreibt die Laufzeitgrenze
+    timeout = (parameters or {}).get("timeout", mod.timeout)
+    return Limits(timeout, mod.cpu_limit, mod.memory_limit_mb)
+
+
+def cgroup_oom_kills():
+    # Bisherige OOM-Kills in der cgroup dieses Prozesses (Module erben sie), None wenn nicht lesbar
+    # cgroup v2: memory.events, v1: memory.oom_control des memory-Controllers
+    candidates = []
+    try:
+        with open("/proc/self/cgroup") as f:
+            for line in f:
+                _, controllers, path = line.strip().split(":", 2)
+                if controllers == "":
+                    candidates.append(os.path.join("/sys/fs/cgroup", path.lstrip("/"), "memory.events"))
+                elif "memory" in controllers.split(","):
+                    candidates.append(os.path.join("/sys/fs/cgroup/memory", path.lstrip("/"), "memory.oom_control"))
+    except (OSError, ValueError):
+        return None
+    for candidate in candidates:
+        try:
+            with open(candidate) as f:
+                for line in f:
+                    if line.startswith("oom_kill "):
+                        return int(line.split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+    return None
+
+
+def rlimit_preexec(limits):
+    # preexec_fn für Popen: setzt RLIMIT_CPU/RLIMIT_AS im Kindprozess vor dem exec, die Grenzen gelten
+    # also ab der ersten Anweisung des Moduls und für alle davon gestarteten Prozesse.
+    # Im Kind läuft nur setrlimit mit vorab berechneten Werten (kein Import, keine Sperren)
+    if limits.memory_mb:
+        limits.oom_kills = cgroup_oom_kills()
+    values = []
+    if limits.cpu:
+        # weiche Grenze -> SIGXCPU, harte Grenze eine Sekunde später -> SIGKILL
+        values.append((resource.RLIMIT_CPU, int(limits.cpu), int(limits.cpu) + 1))
+    if limits.memory_mb:
+        size = int(limits.memory_mb * 1024 * 1024)
+        values.append((resource.RLIMIT_AS, size, size))
+    if not values:
+        return None
+    # Über die eigene harte Grenze kommt ein Prozess ohne Rechte nicht hinaus
+    clamped = []
+    for which, soft, hard in values:
+        current = resource.getrlimit(which)[1]
+        if current != resource.RLIM_INFINITY:
+            soft, hard = min(soft, current), min(hard, current)
+        clamped.append((which, (soft, hard)))
+    setrlimit = resource.setrlimit
+
+    def apply():
+        for which, value in clamped:
+            setrlimit(which, value)
+    return apply
+
+
+def signal_group(pid, sig):
+    # Prozesse werden mit start_new_session gestartet, pid == Gruppen-ID
+    try:
+        os.killpg(pid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def kill_process_group(process, grace=KILL_GRACE):
+    # Ganze Prozessgruppe beenden (inkl. vom Modul gestarteter Kindprozesse):
+    # erst SIGTERM, nach grace Sekunden SIGKILL. Der Prozess wird nicht abgeholt,
+    # das macht der Aufrufer (usage.reap), damit der Ressourcenverbrauch erhalten bleibt
+    signal_group(process.pid, signal.SIGTERM)
+    wait_exit(process, grace)
+    # Übrig gebliebene Kinder auch dann beenden, wenn der Hauptprozess schon weg ist
+    signal_group(process.pid, signal.SIGKILL)
+    wait_exit(process)
+
+
+def _memory_exceeded(limits, usage):
+    # Hinweise auf Speichermangel: Peak-RSS nahe der Grenze oder ein neuer OOM-Kill in der cgroup
+    if limits is None or not limits.memory_mb:
+        return False
+    rss = (usage or {}).get("max_rss_kb")
+    if rss and rss >= 0.9 * limits.memory_mb * 1024:
+        return True
+    kills = cgroup_oom_kills()
+    return limits.oom_kills is not None and kills is not None and kills > limits.oom_kills
+
+
+def classify(return_code, reason, tail=(), limits=None, usage=None):
+    # Endstatus eines Modul-Prozesses:
+    # reason: "cancelled"/"timeout", wenn der Runner den Prozess selbst beendet hat
+    # tail: letzte Log-Zeilen, um einen MemoryError (RLIMIT_AS) zu erkennen
+    # limits/usage: Grenzen und Verbrauch des Laufs, um ein SIGKILL zuzuordnen
+    if reason:
+        return reason
+    if return_code == 0:
+        return "finished"
+    if return_code == -signal.SIGXCPU:
+        return "timeout" # weiche CPU-Grenze
+    if return_code == -signal.SIGKILL:
+        # Nicht von uns beendet: harte CPU-Grenze (cpu + 1) oder OOM-Killer, sonst unbekannt
+        usage = usage or {}
+        cpu = (usage.get("cpu_user") or 0) + (usage.get("cpu_system") or 0)
+        if limits is not None and limits.cpu and cpu >= limits.cpu:
+            return "timeout"
+        if _memory_exceeded(limits, usage):
+            return "oom"
+        return "failed"
+    if any(line.startswith("MemoryError") for line in tail):
+        return "oom"
+    return "failed"
@@ -0,0 +1,67 @@
+import mmap
+import os
+
+# Hilfen für Modul-Skripte: binäre Ein- und Ausgaben per mmap statt über stdin/stdout
+# (siehe workflows/blobs.py). Der Runner setzt
+#   WORKFLOW_INPUT_FILES  binäre Ergebnisse der Vorgänger (durch os.pathsep getrennt)
+#   WORKFLOW_OUTPUT_FILE  Datei für die eigene binäre Ausgabe
+#
+#   from workflows import module_io
+#   table = module_io.input_array()                      # numpy, schreibgeschützt, ohne Kopie
+#   out = module_io.output_array(table.shape, "float64") # direkt ins Shared Memory schreiben
+#   out[:] = table * 2
+#   out.flush()
+#
+# Legt ein Modul eine Ausgabe-Datei an, ist sie das Ergebnis des Steps (stdout landet dann nur
+# im Log). Im Pipeline-Modus gibt es keine binären Ein-/Ausgaben.
+
+
+def input_paths():
+    value = os.environ.get("WORKFLOW_INPUT_FILES")
+    return value.split(os.pathsep) if value else []
+
+
+def output_path():
+    path = os.environ.get("WORKFLOW_OUTPUT_FILE")
+    if not path:
+        raise RuntimeError("Keine binäre Ausgabe verfügbar (WORKFLOW_OUTPUT_FILE fehlt, z.B. im Pipeline-Modus)")
+    return path
+
+
+def _input(index):
+    paths = input_paths()
+    if index >= len(paths):
+        raise IndexError(f"Binärer Eingang {index} fehlt ({len(paths)} vorhanden)")
+    return paths[index]
+
+
+def open_input(index=0):
+    # Eingang als schreibgeschützte mmap (bytes-artig, memoryview(...) ohne Kopie)
+    with open(_input(index), "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def create_output(size):
+    # Ausgabe mit fester Größe anlegen und beschreibbar abbilden
+    with open(output_path(), "w+b") as f:
+        f.truncate(size)
+        return mmap.mmap(f.fileno(), size, access=mmap.ACCESS_WRITE)
+
+
+def input_array(index=0):
+    # Eingang im .npy-Format (output_array/save_array) als schreibgeschütztes numpy-Array
+    import numpy as np
+    return np.load(_input(index), mmap_mode="r")
+
+
+def output_array(shape, dtype):
+    # Ausgabe als .npy (mit dtype/shape im Kopf) anlegen und als beschreibbares Array abbilden
+    from numpy.lib.format import open_memmap
+    return open_memmap(output_path(), mode="w+", dtype=dtype, shape=shape)
+
+
+def save_array(array):
+    out = output_array(array.shape, array.dtype)
+    out[...] = array
+    out.flush()
+    return out
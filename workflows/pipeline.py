@@ -0,0 +1,145 @@
+import os
+import subprocess
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from db.log_writer import get_log_writer
+from workflows.limits import module_limits, rlimit_preexec, kill_process_group, classify
+from workflows.profiles import profile_mode, profile_file, module_command, store_profile, discard_profile
+from workflows.runner import start_module_run, module_env, run_parameters, feed_stdin
+from workflows.streams import tee, drain
+from workflows.usage import exited, reap, track
+
+
+def run_pipeline(steps, workflow_instance_id, emit=print, stop_event=None):
+    # Alle Steps gleichzeitig starten, stdout von Step N per Pipe nach stdin von Step N+1
+    # (wie eine Shell-Pipeline); Ausgaben werden zusätzlich mitgeschrieben (Tee)
+    # Rückgabe: step.id -> Status
+    stop_event = stop_event or threading.Event()
+    writer = get_log_writer()
+    status = {}
+
+    chain = []
+    for step in sorted(steps, key=lambda s: s.position):
+        if step.module.code_path:
+            chain.append(step)
+        else:
+            emit(f"{step.module.name}: Kein Code hinterlegt.")
+            status[step.id] = "skipped"
+
+    processes = []
+    threads = []
+    deadlines = {} # step.id -> time.monotonic()-Zeitpunkt oder None
+    step_limits = {} # step.id -> Limits (für die Einordnung eines SIGKILL)
+    tails = {} # step.id -> letzte Log-Zeilen
+    reasons = {} # step.id -> "cancelled"/"timeout", wenn vom Runner beendet
+    started = {} # step.id -> Start-/Endzeitpunkt für die Laufzeit
+    ended = {}
+    profiles = {} # step.id -> (Modus, Datei) profilierter Steps
+    try:
+        for i, step in enumerate(chain):
+            mod = step.module
+            env = module_env(step.parameters)
+            run_id = start_module_run(step, workflow_instance_id, parameters=run_parameters(step.parameters))
+            prev = chain[i - 1].module if i > 0 else None
+            # Eingang: vom Vorgänger, wenn beide Seiten Daten austauschen
+            piped = prev is not None and prev.needs_output and mod.needs_input
+            first_input = i == 0 and mod.needs_input and getattr(step, "input_data", None)
+            mode = profile_mode(step.parameters)
+            if mode:
+                profiles[step.id] = (mode, profile_file())
+            limits = module_limits(mod, step.parameters)
+            started[step.id] = time.monotonic()
+            process = subprocess.Popen(
+                module_command(mod.code_path, profiles.get(step.id)),
+                stdin=subprocess.PIPE if piped or first_input else subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                start_new_session=True,
+                env=dict(os.environ, **env) if env else None,
+                preexec_fn=rlimit_preexec(limits),
+            )
+            track(process)
+            deadlines[step.id] = limits.deadline()
+            step_limits[step.id] = limits
+            emit(f"Running {mod.name} (Pipeline)...")
+            if first_input:
+                # In eigenem Thread, zusammen mit den Lesern gestartet: sonst blockiert eine große
+                # Eingabe, sobald das Modul seine Ausgabe-Pipe füllt, bevor es stdin fertig gelesen hat
+                threads.append(threading.Thread(target=feed_stdin, args=(process, [], step.input_data), daemon=True))
+            processes.append((step, run_id, process, piped))
+
+        for i, (step, run_id, process, _) in enumerate(processes):
+            nxt = processes[i + 1] if i + 1 < len(processes) else None
+            target = nxt[2].stdin if nxt is not None and nxt[3] else None
+            tails[step.id] = deque(maxlen=5)
+
+            def log_lines(lines, name=step.module.name, run_id=run_id, tail=tails[step.id]):
+                for line in lines:
+                    emit(f"[{name}] {line}")
+                tail.extend(lines[-tail.maxlen:])
+                writer.append_lines(run_id, lines)
+
+            threads.append(threading.Thread(target=tee, args=(process.stdout, target, log_lines), daemon=True))
+            threads.append(threading.Thread(target=drain, args=(process.stderr, log_lines), daemon=True))
+        for t in threads:
+            t.start()
+
+        # Auf das Ende aller Prozesse warten, dabei auf Abbruch und Zeitlimits reagieren
+        running = list(processes)
+        while running:
+            time.sleep(0.1)
+            if stop_event.is_set():
+                emit("Execution stopped by user.")
+                for step, _, process, _ in running:
+                    reasons[step.id] = "cancelled"
+                    kill_process_group(process)
+                break
+            for entry in list(running):
+                step, _, process, _ = entry
+                if exited(process):
+                    ended[step.id] = time.monotonic()
+                    running.remove(entry)
+                elif deadlines[step.id] is not None and time.monotonic() > deadlines[step.id]:
+                    # Nur dieser Step; Nachfolger bekommen EOF auf stdin
+                    reasons[step.id] = "timeout"
+                    kill_process_group(process)
+                    ended[step.id] = time.monotonic()
+                    running.remove(entry)
+        for t in threads:
+            t.join()
+
+        for step, run_id, process, _ in processes:
+            usage = reap(process)
+            if usage is not None:
+                usage["wall_time"] = ended.get(step.id, time.monotonic()) - started[step.id]
+            result = classify(process.returncode, reasons.get(step.id), tails[step.id], step_limits.get(step.id), usage)
+            values = dict(usage or {})
+            if step.id in profiles:
+                mode, path = profiles.pop(step.id)
+                values["profile_ref"] = store_profile(path)
+                values["profile_mode"] = mode if values["profile_ref"] else None
+            writer.finish_run(run_id, wait=False, status=result, finished_at=datetime.now(), **values)
+            status[step.id] = result
+            emit(f"Finished {step.module.name}")
+        writer.flush()
+
+    except Exception as e:
+        # Start fehlgeschlagen -> alles beenden, offene Runs als failed markieren
+        for step, run_id, process, _ in processes:
+            if process.poll() is None:
+                kill_process_group(process, grace=0)
+                process.wait()
+            writer.finish_run(run_id, wait=False, status="failed", finished_at=datetime.now())
+            status[step.id] = "failed"
+        writer.flush()
+        emit(f"ERROR: {e}")
+
+    for _, path in profiles.values():
+        discard_profile(path)
+
+    for step in chain:
+        status.setdefault(step.id, "failed")
+    return status
@@ -0,0 +1,147 @@
+import io
+import json
+import os
+import resource
+import runpy
+import sys
+import time
+import traceback
+from contextlib import nullcontext
+
+# Worker-Prozess des Warm-Pools: lädt schwere Module einmal vor und führt danach
+# Modul-Skripte per runpy aus. Aufträge kommen als JSON-Zeilen über einen eigenen
+# Steuer-Kanal (fd aus argv), die Ausgaben gehen über stdout/stderr an den Runner.
+# Nach jedem Auftrag schreibt der Worker eine Endmarke auf stdout und stderr.
+
+MARK = b"\x1e__workflow_job_end__:"
+
+
+def preload(names):
+    for name in names:
+        name = name.strip()
+        if not name:
+            continue
+        try:
+            __import__(name)
+        except Exception:
+            pass
+
+
+def rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def open_stdin(job):
+    if job.get("stdin_text"):
+        return io.StringIO(job["stdin_text"])
+    paths = job.get("stdin_paths") or []
+    if len(paths) == 1:
+        return open(paths[0], "r", encoding="utf-8", errors="replace")
+    if paths:
+        data = io.StringIO()
+        for path in paths:
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                data.write(f.read())
+        data.seek(0)
+        return data
+    return io.StringIO("")
+
+
+def _profiled(profile):
+    # profile: [Modus, Ausgabedatei] (workflows/profiles.py) oder None
+    if not profile:
+        return nullcontext()
+    from workflows.profiler import profiled
+    return profiled(*profile)
+
+
+def run_job(job):
+    code_path = job["code_path"]
+    saved_argv, saved_path, saved_cwd = sys.argv, list(sys.path), os.getcwd()
+    saved_env = dict(os.environ)
+    saved_stdin = sys.stdin
+    rc = 0
+    try:
+        os.environ.update(job.get("env") or {})
+        sys.argv = [code_path] + list(job.get("args") or [])
+        sys.path.insert(0, os.path.dirname(os.path.abspath(code_path)))
+        sys.stdin = open_stdin(job)
+        with _profiled(job.get("profile")):
+            runpy.run_path(code_path, run_name="__main__")
+    except SystemExit as e:
+        if e.code is None:
+            rc = 0
+        elif isinstance(e.code, int):
+            rc = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            rc = 1
+    except BaseException:
+        traceback.print_exc()
+        rc = 1
+    finally:
+        try:
+            sys.stdin.close()
+        except Exception:
+            pass
+        sys.stdin = saved_stdin
+        sys.argv, sys.path[:] = saved_argv, saved_path
+        os.chdir(saved_cwd)
+        os.environ.clear()
+        os.environ.update(saved_env)
+    return rc
+
+
+def usage_snapshot():
+    # Verbrauch des Workers selbst plus der von ihm abgewarteten Kindprozesse
+    return resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN)
+
+
+def usage_delta(before, after, wall_time):
+    # Felder wie workflows.usage.USAGE_COLUMNS; max_rss_kb ist der Peak des Workers, nicht des Auftrags
+    def total(pair, field):
+        return getattr(pair[0], field) + getattr(pair[1], field)
+    return {
+        "wall_time": wall_time,
+        "cpu_user": total(after, "ru_utime") - total(before, "ru_utime"),
+        "cpu_system": total(after, "ru_stime") - total(before, "ru_stime"),
+        "max_rss_kb": max(after[0].ru_maxrss, after[1].ru_maxrss),
+        "io_read_bytes": (total(after, "ru_inblock") - total(before, "ru_inblock")) * 512,
+        "io_write_bytes": (total(after, "ru_oublock") - total(before, "ru_oublock")) * 512,
+        "ctx_voluntary": total(after, "ru_nvcsw") - total(before, "ru_nvcsw"),
+        "ctx_involuntary": total(after, "ru_nivcsw") - total(before, "ru_nivcsw"),
+    }
+
+
+def main():
+    control = os.fdopen(int(sys.argv[1]), "r")
+    max_jobs = int(os.environ.get("WORKFLOW_POOL_MAX_JOBS", "50"))
+    max_growth = int(os.environ.get("WORKFLOW_POOL_MAX_RSS_GROWTH_MB", "512")) * 1024 * 1024
+    preload(os.environ.get("WORKFLOW_POOL_PRELOAD", "").split(","))
+    baseline = rss_bytes()
+    jobs = 0
+
+    for line in control:
+        job = json.loads(line)
+        started = time.monotonic()
+        before = usage_snapshot()
+        rc = run_job(job)
+        usage = usage_delta(before, usage_snapshot(), time.monotonic() - started)
+        jobs += 1
+        # Recyceln nach N Aufträgen oder bei zu starkem Speicherwachstum
+        recycle = jobs >= max_jobs or (baseline and rss_bytes() - baseline > max_growth)
+        end = MARK + job["token"].encode() + f" {rc} {int(bool(recycle))} {json.dumps(usage, separators=(',', ':'))}\n".encode()
+        for stream in (sys.stdout, sys.stderr):
+            stream.flush()
+            stream.buffer.write(end)
+            stream.buffer.flush()
+        if recycle:
+            break
+
+
+if __name__ == "__main__":
+    main()
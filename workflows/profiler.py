@@ -0,0 +1,116 @@
+import cProfile
+import marshal
+import os
+import runpy
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+# Läuft im Modul-Prozess (Subprozess oder Warm-Pool-Worker), deshalb nur Standardbibliothek.
+# Beide Modi schreiben eine pstats-Datei, die pstats.Stats (und z.B. snakeviz) lesen kann:
+#   cprofile  deterministisch (jeder Funktionsaufruf im Haupt-Thread), genaue Aufrufzahlen, bremst
+#             Code mit vielen kleinen Funktionsaufrufen deutlich
+#   sample    Stichproben der Stacks aller Threads alle WORKFLOW_PROFILE_INTERVAL_MS; kaum Overhead,
+#             "Aufrufe" sind hier die Anzahl Stichproben, in denen die Funktion auf dem Stack lag
+#
+#   python workflows/profiler.py <modus> <ausgabe.prof> <skript> [argumente]
+
+SAMPLE_INTERVAL = float(os.environ.get("WORKFLOW_PROFILE_INTERVAL_MS", "5")) / 1000
+
+# Frames des Profilers selbst, von runpy und des Warm-Pool-Workers gehören nicht ins Profil
+_OWN_FILES = (
+    os.path.abspath(__file__),
+    os.path.abspath(runpy.__file__),
+    "<frozen runpy>",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "pool_worker.py"),
+)
+
+
+class Sampler(threading.Thread):
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.interval = interval
+        self.samples = Counter() # Stack (innerster Frame zuerst) -> Anzahl
+        self._stopped = threading.Event()
+
+    def run(self):
+        own = threading.get_ident()
+        while not self._stopped.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    if code.co_filename not in _OWN_FILES:
+                        stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                    frame = frame.f_back
+                if stack:
+                    self.samples[tuple(stack)] += 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+    def stats(self):
+        # Stichproben als pstats-Dict: func -> (Aufrufe, Aufrufe, Eigenzeit, Gesamtzeit, Aufrufer)
+        entries = {}
+        for stack, count in self.samples.items():
+            seconds = count * self.interval
+            seen = set()
+            for depth, func in enumerate(stack):
+                entry = entries.setdefault(func, [0, 0, 0.0, 0.0, {}])
+                own = seconds if depth == 0 else 0.0
+                entry[2] += own
+                if func in seen:
+                    continue # Rekursion nur einmal in der Gesamtzeit zählen
+                seen.add(func)
+                entry[0] += count
+                entry[1] += count
+                entry[3] += seconds
+                if depth + 1 < len(stack):
+                    caller = entry[4].setdefault(stack[depth + 1], [0, 0, 0.0, 0.0])
+                    caller[0] += count
+                    caller[1] += count
+                    caller[2] += own
+                    caller[3] += seconds
+        return {
+            func: (cc, nc, tt, ct, {caller: tuple(values) for caller, values in callers.items()})
+            for func, (cc, nc, tt, ct, callers) in entries.items()
+        }
+
+
+@contextmanager
+def profiled(mode, path, interval=SAMPLE_INTERVAL):
+    # Code im Block profilieren, das Profil wird auch bei sys.exit() oder Exception geschrieben
+    if mode == "sample":
+        sampler = Sampler(interval)
+        sampler.start()
+        try:
+            yield
+        finally:
+            sampler.stop()
+            with open(path, "wb") as f:
+                marshal.dump(sampler.stats(), f)
+    else:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(path)
+
+
+def main(argv):
+    mode, path, script = argv[:3]
+    # wie "python skript": argv und Suchpfad des Skripts statt des Profilers
+    sys.argv = [script] + argv[3:]
+    sys.path[0] = os.path.dirname(os.path.abspath(script))
+    with profiled(mode, path):
+        runpy.run_path(script, run_name="__main__")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,131 @@
+import os
+import pstats
+import sys
+import tempfile
+
+from workflows.artifacts import get_artifact_store
+
+# Profiling von Modul-Läufen: ein Step läuft mit "profile" in WorkflowStep.parameters
+# (true/"cprofile" oder "sample") bzw. alle Steps eines Laufs mit WORKFLOW_PROFILE
+# (CLI: python -m workflows run --profile) unter workflows/profiler.py. Die pstats-Datei wird
+# als Artefakt gespeichert, ModuleRun.profile_ref verweist darauf; die GUI zeigt die
+# Hotspots zweier Läufe nebeneinander (gui/profile_tab.py).
+
+PROFILE_MODES = ("cprofile", "sample")
+PROFILER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiler.py")
+TOP_N = 30
+SORT_KEYS = ("tottime", "cumtime", "calls")
+
+
+def profile_mode(parameters=None):
+    # Modus für einen Lauf oder None; der Step-Parameter geht vor WORKFLOW_PROFILE
+    value = (parameters or {}).get("profile")
+    if value is None:
+        value = os.environ.get("WORKFLOW_PROFILE")
+    if value in (None, False, "", "0", "off", "false"):
+        return None
+    if value in (True, 1, "1", "on", "true"):
+        return "cprofile"
+    if value not in PROFILE_MODES:
+        raise ValueError(f"Unbekannter Profiling-Modus: {value!r} ({' oder '.join(PROFILE_MODES)})")
+    return value
+
+
+def profile_file():
+    # Temporäre Datei für das Profil eines Laufs (wird danach ins Artefakt-Verzeichnis übernommen)
+    fd, path = tempfile.mkstemp(prefix="workflow-profile-", suffix=".prof")
+    os.close(fd)
+    return path
+
+
+def module_command(code_path, profile=None):
+    # Kommando für einen Modul-Prozess; profile = (Modus, Ausgabedatei) oder None
+    if profile is None:
+        return [sys.executable, "-u", code_path]
+    mode, path = profile
+    return [sys.executable, "-u", PROFILER_SCRIPT, mode, path, code_path]
+
+
+def store_profile(path):
+    # Profil ins Artefakt-Verzeichnis übernehmen, Rückgabe: Hash oder None (kein Profil geschrieben,
+    # z.B. weil der Prozess hart beendet wurde)
+    try:
+        if not os.path.getsize(path):
+            return None
+        writer = get_artifact_store().open_writer()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                writer.write(block)
+        return writer.commit()
+    except OSError:
+        return None
+    finally:
+        discard_profile(path)
+
+
+def discard_profile(path):
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
+def load_stats(profile_ref):
+    path = get_artifact_store().path(profile_ref)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Profil {profile_ref[:12]} nicht mehr vorhanden (Artefakt verdrängt?)")
+    return pstats.Stats(path)
+
+
+def hotspots(profile_ref, n=TOP_N, sort="tottime"):
+    # Top-n Funktionen eines gespeicherten Profils, Rückgabe: (Zeilen, Gesamtzeit)
+    stats = load_stats(profile_ref)
+    rows = [
+        {"function": name, "file": file, "line": line, "calls": nc, "tottime": tt, "cumtime": ct}
+        for (file, line, name), (cc, nc, tt, ct, callers) in stats.stats.items()
+    ]
+    rows.sort(key=lambda row: row[sort], reverse=True)
+    return rows[:n], stats.total_tt
+
+
+def function_label(row):
+    return f"{row['function']} ({os.path.basename(row['file'])}:{row['line']})"
+
+
+def compare_hotspots(base_ref, other_ref, n=TOP_N, sort="tottime"):
+    # Zwei Profile gegenüberstellen: die Top-n beider Läufe, je Funktion Werte aus beiden und die
+    # Differenz (other - base); sortiert nach dem größeren Wert, Regressionen fallen so oben auf
+    base, base_total = hotspots(base_ref, None, sort)
+    other, other_total = hotspots(other_ref, None, sort)
+    key = lambda row: (row["file"], row["line"], row["function"])
+    base_by_key = {key(row): row for row in base}
+    other_by_key = {key(row): row for row in other}
+    top = {key(row) for row in base[:n]} | {key(row) for row in other[:n]}
+    missing = 0 if sort == "calls" else 0.0
+    rows = []
+    for k in top:
+        a, b = base_by_key.get(k), other_by_key.get(k)
+        value_a = a[sort] if a else missing
+        value_b = b[sort] if b else missing
+        rows.append({"label": function_label(a or b), "base": value_a, "other": value_b, "delta": value_b - value_a})
+    rows.sort(key=lambda row: max(row["base"], row["other"]), reverse=True)
+    return rows, base_total, other_total
+
+
+def profiled_runs(module_id, limit=50):
+    # Läufe eines Moduls mit Profil, neueste zuerst: [(ModuleRun, Workflow-Name)]
+    from db.db_setup import SessionLocal, ModuleRun, WorkflowStep, Workflow
+
+    session = SessionLocal()
+    try:
+        rows = (
+            session.query(ModuleRun, Workflow.name)
+            .join(WorkflowStep, WorkflowStep.id == ModuleRun.workflow_step_id)
+            .join(Workflow, Workflow.id == WorkflowStep.workflow_id)
+            .filter(WorkflowStep.module_id == module_id, ModuleRun.profile_ref.isnot(None))
+            .order_by(ModuleRun.id.desc())
+            .limit(limit)
+            .all()
+        )
+        session.expunge_all()
+        return rows
+    finally:
+        session.close()
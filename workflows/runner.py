@@ -0,0 +1,405 @@
+import json
+import os
+import re
+import shutil
+import subprocess, sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from db.db_setup import SessionLocal, ModuleRun
+from db.job_queue import enqueue, cancel_job, job_state, requeue_expired, DONE_STATUS
+from db.log_store import new_lines
+from db.log_writer import get_log_writer
+from workflows import blobs
+from workflows.artifacts import get_artifact_store, combine_refs, CACHE_ENABLED, CONTROL_PARAMETERS
+from workflows.limits import Limits, module_limits, rlimit_preexec, classify
+from workflows.profiles import profile_mode, profile_file, module_command, store_profile, discard_profile
+from workflows.streams import tee, drain, per_line, LineSplitter
+from workflows.usage import reap, track
+from workflows.worker_pool import get_worker_pool, module_pythonpath
+
+# Abfrageintervall für Status/Log eingereihter Jobs (WORKFLOW_EXECUTOR=queue)
+QUEUE_POLL = float(os.environ.get("WORKFLOW_QUEUE_POLL", "0.5"))
+
+
+def start_module_run(step, workflow_instance_id, input_ref=None, **values):
+    # DB-Eintrag für den Modul-Run anlegen, gibt die ID zurück
+    session = SessionLocal()
+    try:
+        module_run = ModuleRun(
+            workflow_instance_id=workflow_instance_id,
+            workflow_step_id=step.id,
+            status="running",
+            started_at=datetime.now(),
+            input_ref=input_ref or getattr(step, "input_ref", None),
+            **values
+        )
+        session.add(module_run)
+        session.commit()
+        return module_run.id
+    finally:
+        session.close()
+
+
+def run_parameters(parameters):
+    # Parameter, die das Modul sieht (ohne Steuer-Parameter wie timeout/sweep); für ModuleRun.parameters
+    return {k: v for k, v in (parameters or {}).items() if k not in CONTROL_PARAMETERS} or None
+
+
+def module_env(parameters):
+    # Step-Parameter für den Modul-Prozess: WORKFLOW_PARAMS (alle als JSON) und
+    # WORKFLOW_PARAM_<NAME> je Parameter (Text unverändert, sonst JSON)
+    params = run_parameters(parameters)
+    if not params:
+        return None
+    env = {"WORKFLOW_PARAMS": json.dumps(params, default=str)}
+    for key, value in params.items():
+        name = re.sub(r"\W", "_", str(key)).upper()
+        env[f"WORKFLOW_PARAM_{name}"] = value if isinstance(value, str) else json.dumps(value, default=str)
+    return env
+
+
+def feed_stdin(process, paths, text):
+    # Eingaben in eigenem Thread schreiben, damit volle Pipes nicht blockieren
+    try:
+        if text:
+            process.stdin.write(text.encode("utf-8"))
+        for path in paths:
+            with open(path, "rb") as f:
+                shutil.copyfileobj(f, process.stdin, 1024 * 1024)
+    except BrokenPipeError:
+        pass
+    finally:
+        try:
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+
+
+def _execute_subprocess(mod, paths, input_data, output, log_lines, stop_event, limits=None, env=None, profile=None):
+    # Frischer Interpreter pro Step; stdout -> output + Log, stderr -> Log
+    # Eigene Prozessgruppe, damit Abbruch/Timeout auch Kindprozesse des Moduls beendet
+    # profile: (Modus, Ausgabedatei), Modul läuft dann unter workflows/profiler.py
+    # Rückgabe: (returncode, None/"cancelled"/"timeout", Ressourcenverbrauch)
+    limits = limits or Limits()
+    started = time.monotonic()
+    process = subprocess.Popen(
+        module_command(mod.code_path, profile),
+        stdin=subprocess.PIPE if input_data or paths else subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        start_new_session=True,
+        env=dict(os.environ, **env) if env else None,
+        preexec_fn=rlimit_preexec(limits),
+    )
+    track(process)
+    helpers = [threading.Thread(target=drain, args=(process.stderr, log_lines), daemon=True)]
+    if input_data or paths:
+        helpers.append(threading.Thread(target=feed_stdin, args=(process, paths, input_data), daemon=True))
+    for t in helpers:
+        t.start()
+
+    # stdout ist das Ergebnis des Steps: ins Artefakt schreiben und mitloggen
+    reason = tee(process.stdout, output, log_lines, stop_event, process, limits.deadline())
+    usage = reap(process, started)
+    for t in helpers:
+        t.join()
+    return process.returncode, reason, usage
+
+
+def _execute_in_pool(mod, paths, input_data, output, log_lines, stop_event, limits=None, env=None, profile=None):
+    # Ausführung in einem vorgestarteten Worker (Module.backend == "pool")
+    # Nur das Zeitlimit greift hier, CPU-/Speichergrenzen gelten pro Prozess und nicht pro Auftrag
+    out_lines, err_lines = LineSplitter(), LineSplitter()
+    if limits is not None and (limits.cpu or limits.memory_mb):
+        # nicht stillschweigend ignorieren: im Run-Log vermerken
+        log_lines(["WARNUNG: CPU-/Speichergrenze wird im Warm-Pool (backend \"pool\") nicht angewendet, "
+                   "nur das Timeout. Für harte Grenzen backend \"subprocess\" verwenden."])
+
+    def on_stdout(data):
+        output.write(data)
+        lines = out_lines.feed(data)
+        if lines:
+            log_lines(lines)
+
+    def on_stderr(data):
+        lines = err_lines.feed(data)
+        if lines:
+            log_lines(lines)
+
+    return_code, reason, usage = get_worker_pool().run(
+        mod.code_path, on_stdout, on_stderr, stdin_paths=paths, stdin_text=input_data,
+        env=env, stop_event=stop_event, deadline=(limits or Limits()).deadline(), profile=profile)
+    lines = out_lines.feed(b"", final=True) + err_lines.feed(b"", final=True)
+    if lines:
+        log_lines(lines)
+    output.close()
+    return return_code, reason, usage
+
+
+class StepRun:
+    # Ablauf eines Step-Laufs ohne die eigentliche Prozess-Ausführung:
+    # begin() -> Cache/DB-Eintrag, complete()/fail() -> Artefakt, Status, Log abschließen.
+    # Wird von run_step (Threads) und vom asyncio-Executor gemeinsam genutzt.
+    # parameters: statt step.parameters (z.B. ein Parametersatz eines Sweeps)
+    def __init__(self, step, workflow_instance_id, emit=print, inputs=None, parameters=None):
+        self.step = step
+        self.mod = step.module
+        self.workflow_instance_id = workflow_instance_id
+        self.emit = emit
+        self.inputs = inputs
+        self.params = (step.parameters or {}) if parameters is None else parameters
+        self.env = module_env(self.params)
+        self.writer = get_log_writer()
+        self.store = get_artifact_store()
+        self.run_id = None
+        self.key = None
+        self.output = None
+        self.blob_output = None # Pfad für eine binäre Ausgabe (workflows/blobs.py)
+        self.profile = None # (Modus, Datei), wenn der Lauf profiliert wird (workflows/profiles.py)
+        self.paths = []
+        self.input_data = None
+        self.limits = Limits()
+        self.tail = deque(maxlen=5) # letzte Zeilen, u.a. für die Erkennung von MemoryError
+
+    def begin(self):
+        # Gibt (Status, output_ref) zurück, wenn nichts ausgeführt werden muss, sonst None
+        mod, step, store = self.mod, self.step, self.store
+        if not mod.code_path:
+            self.emit(f"{mod.name}: Kein Code hinterlegt.")
+            return "skipped", None
+
+        inputs = [ref for ref in self.inputs or [] if ref] if mod.needs_input else []
+        input_ref = combine_refs(inputs)
+        params = self.params
+        run_params = run_parameters(params)
+        mode = profile_mode(params)
+
+        # Ergebnis schon im Cache? Dann Step überspringen und Artefakt wiederverwenden
+        # (nicht bei binären Eingängen: "shm:"-Referenzen sind keine Inhalts-Hashes;
+        # beim Profiling wird immer ausgeführt, das Ergebnis aber wie gewohnt gespeichert)
+        if (CACHE_ENABLED and params.get("cache", True) and not getattr(step, "input_data", None)
+                and not any(blobs.is_blob(ref) for ref in inputs)):
+            try:
+                self.key = store.cache_key(mod.code_path, input_ref, params)
+            except OSError:
+                self.key = None
+        if self.key and not mode:
+            cached = store.lookup(self.key)
+            if cached:
+                self.run_id = self.start(input_ref, output_ref=cached, parameters=run_params)
+                self.writer.append_log(self.run_id, f"Cache-Treffer, Ergebnis {cached[:12]} wiederverwendet.")
+                self.finish(wait=False, status="finished", finished_at=datetime.now())
+                self.emit(f"{mod.name}: Cache-Treffer, übersprungen.")
+                return "finished", cached
+
+        self.limits = module_limits(mod, params)
+        self.run_id = self.start(input_ref, parameters=run_params)
+        if mode:
+            self.profile = (mode, profile_file())
+        self.emit(f"Running {mod.name}{f' (Profiling: {mode})' if mode else ''}...")
+        self.output = store.open_writer()
+        # Input falls nötig über stdin: Ergebnisse der Vorgänger oder step.input_data;
+        # binäre Ergebnisse nicht über stdin, sondern als Pfad zum Abbilden per mmap
+        self.input_data = getattr(step, "input_data", None) if mod.needs_input else None
+        self.paths = [store.path(ref) for ref in inputs if not blobs.is_blob(ref)]
+        self.blob_output = blobs.output_path(self.workflow_instance_id, self.run_id)
+        self.env = dict(
+            self.env or {},
+            WORKFLOW_OUTPUT_FILE=self.blob_output,
+            PYTHONPATH=module_pythonpath(),
+        )
+        blob_inputs = [blobs.blob_path(ref) for ref in inputs if blobs.is_blob(ref)]
+        if blob_inputs:
+            self.env["WORKFLOW_INPUT_FILES"] = os.pathsep.join(blob_inputs)
+        return None
+
+    def start(self, input_ref, **values):
+        # ModuleRun anlegen (der Worker-Agent übernimmt stattdessen den Job-Eintrag)
+        return start_module_run(self.step, self.workflow_instance_id, input_ref, **values)
+
+    def finish(self, wait=True, **values):
+        # Endstatus schreiben, Writer flusht einmal pro Step
+        self.writer.finish_run(self.run_id, wait, **values)
+
+    def log_lines(self, lines):
+        # Zeilen eines gelesenen Blocks: einzeln an emit (GUI/CLI), als Ganzes an den Writer
+        for line in lines:
+            self.emit(line)
+        self.tail.extend(lines[-self.tail.maxlen:])
+        self.writer.append_lines(self.run_id, lines)
+
+    def complete(self, return_code, reason=None, usage=None):
+        # reason: "cancelled"/"timeout", wenn der Prozess vom Runner beendet wurde
+        # usage: Ressourcenverbrauch (usage.USAGE_COLUMNS) für den ModuleRun
+        status = classify(return_code, reason, self.tail, self.limits, usage)
+        output_ref = None
+        if status == "finished" and os.path.exists(self.blob_output):
+            # Binäre Ausgabe ist das Ergebnis (stdout steht im Log); gehört zur Instanz, kein Cache
+            self.output.discard()
+            output_ref = blobs.blob_ref(self.workflow_instance_id, self.run_id)
+        elif status == "finished":
+            output_ref = self.output.commit()
+            if self.key:
+                self.store.record(self.key, output_ref)
+        else:
+            self.output.discard()
+            self._discard_blob()
+
+        message = {
+            "cancelled": "Execution stopped by user.",
+            "timeout": f"Zeitlimit überschritten (Laufzeit {self.limits.timeout or '-'} s, CPU {self.limits.cpu or '-'} s).",
+            "oom": f"Speichergrenze überschritten ({self.limits.memory_mb or '-'} MB).",
+        }.get(status)
+        if message:
+            self.writer.append_log(self.run_id, message)
+            self.emit(message)
+
+        # Profil auch bei Fehlern behalten, gerade dann ist es interessant
+        values = dict(usage or {})
+        if self.profile is not None:
+            mode, path = self.profile
+            values["profile_ref"] = store_profile(path)
+            values["profile_mode"] = mode if values["profile_ref"] else None
+            if values["profile_ref"] is None:
+                self.writer.append_log(self.run_id, "Kein Profil geschrieben (Prozess hart beendet?).")
+
+        self.finish(status=status, finished_at=datetime.now(), output_ref=output_ref, **values)
+        self.emit(f"Finished {self.mod.name}")
+        return status, output_ref
+
+    def _discard_blob(self):
+        # halb geschriebene binäre Ausgabe eines fehlgeschlagenen Runs
+        if self.blob_output and os.path.exists(self.blob_output):
+            os.remove(self.blob_output)
+
+    def fail(self, error):
+        # Falls Exception: ModulRun in DB auf failed setzen
+        if self.output is not None:
+            self.output.discard()
+        self._discard_blob()
+        if self.profile is not None:
+            discard_profile(self.profile[1])
+        if self.run_id is not None:
+            self.writer.append_log(self.run_id, f"Exception: {str(error)}")
+            self.finish(status="failed", finished_at=datetime.now())
+        self.emit(f"ERROR: {error}")
+        self.emit(f"Finished {self.mod.name}")
+        return "failed", None
+
+
+def run_step(step, workflow_instance_id, emit=print, stop_event=None, inputs=None, parameters=None):
+    # Einen WorkflowStep als Subprozess ausführen, ModuleRun anlegen und Logs über den Writer schreiben
+    # inputs: Artefakt-Hashes der Vorgänger-Steps, werden bei needs_input per stdin übergeben
+    # parameters: statt step.parameters, erreichen das Modul als Umgebungsvariablen (module_env)
+    # Rückgabe: (Status, output_ref) mit Status "finished", "failed", "skipped" (kein Code),
+    # "cancelled", "timeout" oder "oom"
+    return execute_run(StepRun(step, workflow_instance_id, emit, inputs, parameters), stop_event)
+
+
+def execute_run(run, stop_event=None):
+    # StepRun ausführen: Cache/DB-Eintrag, Prozess (Subprozess oder Warm-Pool), Abschluss
+    try:
+        result = run.begin()
+        if result is not None:
+            return result
+        mod = run.mod
+        if (mod.backend or "subprocess") == "pool":
+            result = _execute_in_pool(
+                mod, run.paths, run.input_data, run.output, run.log_lines, stop_event, run.limits, run.env,
+                run.profile)
+        else:
+            result = _execute_subprocess(
+                mod, run.paths, run.input_data, run.output, run.log_lines, stop_event, run.limits, run.env,
+                run.profile)
+        return run.complete(*result)
+    except Exception as e:
+        return run.fail(e)
+
+
+def run_queued(step, workflow_instance_id, emit=print, stop_event=None, inputs=None, parameters=None):
+    # Wie run_step, aber als Job für einen Worker-Agenten (WORKFLOW_EXECUTOR=queue, workflows/agent.py):
+    # Job einreihen, dann Status und Log aus der DB mitlesen, bis ein Agent ihn beendet hat
+    mod = step.module
+    if not mod.code_path:
+        emit(f"{mod.name}: Kein Code hinterlegt.")
+        return "skipped", None
+    try:
+        # WORKFLOW_PROFILE gilt auf dem Agenten nicht, der Modus geht deshalb mit den Parametern
+        mode = profile_mode(parameters if parameters is not None else step.parameters)
+        if mode:
+            parameters = {**(parameters if parameters is not None else step.parameters or {}), "profile": mode}
+        run_id = enqueue(step, workflow_instance_id, inputs, parameters)
+    except Exception as e:
+        emit(f"ERROR: {e}")
+        return "failed", None
+    emit(f"{mod.name}: Job {run_id} eingereiht.")
+
+    seq = 0
+    worker = None
+    cancelled = False
+    while True:
+        try:
+            status, output_ref, current = job_state(run_id)
+            if current and current != worker:
+                worker = current
+                emit(f"Running {mod.name} auf {worker}...")
+            # Zustand vor dem Log lesen: der Agent flusht das Log vor dem Endstatus
+            lines, seq = new_lines(run_id, seq)
+            for line in lines:
+                emit(line)
+            if status in DONE_STATUS:
+                emit(f"Finished {mod.name}")
+                return status, output_ref
+            if stop_event is not None and stop_event.is_set():
+                if not cancelled:
+                    cancel_job(run_id)
+                    cancelled = True
+                # ohne lebenden Agenten würde der Abbruch sonst nie ankommen
+                requeue_expired()
+        except Exception as e:
+            # DB kurz nicht erreichbar: weiter warten, der Job läuft beim Agenten weiter
+            emit(f"Job {run_id}: {e}")
+        time.sleep(QUEUE_POLL)
+
+
+def run_module(mod, emit=print, stop_event=None, input_data=None):
+    # Ein Modul einzeln ausführen (ohne ModuleRun/Cache), stdout+stderr zusammen ins Log
+    # Rückgabe: returncode oder None, wenn kein Code hinterlegt ist
+    if not mod.code_path:
+        emit(f"{mod.name}: Kein Code hinterlegt.")
+        return None
+
+    emit(f"Running {mod.name}...")
+    return_code = None
+    try:
+        # Wenn Input gebraucht wird und vorhanden ist -> per stdin übergeben
+        stdin_text = input_data if mod.needs_input and input_data else None
+        limits = module_limits(mod)
+        process = subprocess.Popen(
+            [sys.executable, "-u", mod.code_path],
+            stdin=subprocess.PIPE if stdin_text else subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+            preexec_fn=rlimit_preexec(limits),
+        )
+        feeder = None
+        if stdin_text:
+            feeder = threading.Thread(target=feed_stdin, args=(process, [], stdin_text), daemon=True)
+            feeder.start()
+        reason = tee(process.stdout, None, per_line(emit), stop_event, process, limits.deadline())
+        return_code = process.wait()
+        if feeder is not None:
+            feeder.join()
+        if reason == "cancelled":
+            emit("Execution stopped by user.")
+        elif reason == "timeout":
+            emit(f"Zeitlimit überschritten ({limits.timeout} s).")
+    except Exception as e:
+        emit(f"ERROR: {e}")
+
+    emit(f"Finished {mod.name}")
+    return return_code
@@ -0,0 +1,169 @@
+import itertools
+import threading
+import time
+from datetime import datetime
+
+from db.db_setup import SessionLocal, WorkflowInstance
+from workflows.dag import step_dependencies, is_linear, is_sweep
+from workflows.engine import create_workflow_instance
+from workflows.executor import GLOBAL_MAX_WORKERS
+from workflows.sweep import sweep_sets, sweep_limit
+
+
+class RunTicket:
+    # Ein angefragter Workflow-Lauf in der Warteschlange
+    _ids = itertools.count(1)
+
+    def __init__(self, workflow, priority, slots, start_fn):
+        self.id = next(self._ids)
+        self.workflow = workflow
+        self.workflow_id = workflow.id
+        self.priority = priority
+        self.slots = slots # so viele Prozesse kann der Lauf gleichzeitig belegen
+        self.start_fn = start_fn # Callable(ticket), startet den eigentlichen Lauf
+        self.instance_id = None
+        self.state = "pending" # pending -> running -> done / cancelled
+        self.submitted_at = time.monotonic()
+        self.admitted_at = None
+
+    def wait_time(self):
+        end = self.admitted_at if self.admitted_at is not None else time.monotonic()
+        return end - self.submitted_at
+
+
+def estimate_slots(workflow, max_processes):
+    # Wie viele Modul-Prozesse ein Lauf höchstens gleichzeitig belegt
+    steps = [s for s in workflow.steps if s.module is None or s.module.code_path]
+    if not steps:
+        return 1
+    if workflow.pipeline:
+        width = len(steps)
+    elif is_linear(step_dependencies(steps)):
+        width = 1
+    else:
+        width = min(workflow.max_parallel or max_processes, len(steps))
+    # Sweeps fächern einen Step in bis zu sweep_parallel gleichzeitige Prozesse auf
+    for step in steps:
+        if is_sweep(step):
+            width = max(width, sweep_limit(step, len(sweep_sets(step.parameters))))
+    return max(1, min(width, max_processes))
+
+
+class RunScheduler:
+    # Zentrale Warteschlange für Workflow-Läufe:
+    # - neue Läufe werden als WorkflowInstance "pending" angelegt
+    # - zugelassen wird, solange die Summe der belegten Prozess-Slots <= max_processes bleibt
+    # - Reihenfolge: höhere Priorität zuerst, dann Workflows mit weniger laufenden Instanzen
+    #   (faire Aufteilung), dann Einreihungszeit
+    def __init__(self, max_processes=GLOBAL_MAX_WORKERS):
+        self.max_processes = max(1, max_processes)
+        self._lock = threading.Lock()
+        self._pending = []
+        self._running = []
+
+    def submit(self, workflow, start_fn, priority=None, slots=None, resumed_from_id=None):
+        # resumed_from_id: Fortsetzung einer fehlgeschlagenen Instanz (siehe engine.resume_plan)
+        ticket = RunTicket(
+            workflow,
+            (workflow.priority or 0) if priority is None else priority,
+            slots or estimate_slots(workflow, self.max_processes),
+            start_fn,
+        )
+        ticket.instance_id = create_workflow_instance(workflow.id, status="pending", resumed_from_id=resumed_from_id)
+        with self._lock:
+            self._pending.append(ticket)
+        self._dispatch()
+        return ticket
+
+    def cancel(self, ticket):
+        # Nur wartende Läufe können hier entfernt werden, laufende stoppt der Aufrufer selbst
+        with self._lock:
+            if ticket not in self._pending:
+                return False
+            self._pending.remove(ticket)
+            ticket.state = "cancelled"
+        # Nie gestartet: "cancelled" (nicht "failed"), wird auch nicht zum Fortsetzen angeboten
+        _set_instance_status(ticket.instance_id, "cancelled", finished_at=datetime.now())
+        self._dispatch()
+        return True
+
+    def release(self, ticket):
+        # Lauf ist fertig -> Slots freigeben und nächste Läufe zulassen
+        with self._lock:
+            if ticket in self._running:
+                self._running.remove(ticket)
+            ticket.state = "done"
+        self._dispatch()
+
+    def position(self, ticket):
+        # 1-basierte Position in der Warteschlange, None wenn nicht (mehr) wartend
+        with self._lock:
+            order = self._order()
+            return order.index(ticket) + 1 if ticket in order else None
+
+    def counters(self):
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "running": len(self._running),
+                "slots_used": sum(t.slots for t in self._running),
+                "max_processes": self.max_processes,
+            }
+
+    def _order(self):
+        running_per_workflow = {}
+        for t in self._running:
+            running_per_workflow[t.workflow_id] = running_per_workflow.get(t.workflow_id, 0) + 1
+        return sorted(
+            self._pending,
+            key=lambda t: (-t.priority, running_per_workflow.get(t.workflow_id, 0), t.submitted_at),
+        )
+
+    def _dispatch(self):
+        admitted = []
+        with self._lock:
+            used = sum(t.slots for t in self._running)
+            while self._pending:
+                ticket = self._order()[0]
+                # Strikte Reihenfolge, damit große Läufe nicht verhungern;
+                # ein einzelner Lauf darf immer starten, wenn sonst nichts läuft
+                if self._running and used + ticket.slots > self.max_processes:
+                    break
+                self._pending.remove(ticket)
+                self._running.append(ticket)
+                ticket.state = "running"
+                ticket.admitted_at = time.monotonic()
+                used += ticket.slots
+                admitted.append(ticket)
+
+        for ticket in admitted:
+            _set_instance_status(ticket.instance_id, "running", started_at=datetime.now(), finished_at=None)
+            try:
+                ticket.start_fn(ticket)
+            except Exception as e:
+                print(f"Scheduler: Start von Workflow {ticket.workflow_id} fehlgeschlagen: {e}")
+                _set_instance_status(ticket.instance_id, "failed", finished_at=datetime.now())
+                self.release(ticket)
+
+
+def _set_instance_status(instance_id, status, **values):
+    session = SessionLocal()
+    inst = session.get(WorkflowInstance, instance_id)
+    if inst is not None:
+        inst.status = status
+        for key, value in values.items():
+            setattr(inst, key, value)
+        session.commit()
+    session.close()
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RunScheduler()
+        return _scheduler
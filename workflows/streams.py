@@ -0,0 +1,139 @@
+import codecs
+import fcntl
+import os
+import select
+import time
+
+from workflows.limits import kill_process_group
+
+# Ausgaben werden blockweise verarbeitet: ein read() liefert bis zu READ_SIZE Bytes, die in einem
+# Rutsch dekodiert und in Zeilen zerlegt werden; Log und Writer bekommen die Zeilen als Liste.
+READ_SIZE = 256 * 1024
+PIPE_SIZE = 1024 * 1024 # größerer Pipe-Puffer: weniger Kontextwechsel zwischen Modul und Runner
+MAX_LINE_LENGTH = int(os.environ.get("WORKFLOW_MAX_LINE_LENGTH", str(64 * 1024))) # längere Zeilen werden umbrochen
+POLL_INTERVAL = 0.1 # Sekunden, wie oft Abbruch und Zeitlimit geprüft werden
+
+
+def enlarge_pipe(stream, size=PIPE_SIZE):
+    # Nur Linux (F_SETPIPE_SZ); ohne Rechte für die Größe bleibt es beim Standard (64 KB)
+    try:
+        fcntl.fcntl(stream.fileno(), fcntl.F_SETPIPE_SZ, size)
+    except (AttributeError, OSError, ValueError):
+        pass
+
+
+def _overwrite(line):
+    # "\r" ohne "\n" (Fortschrittsbalken) überschreibt die Zeile wie im Terminal, nur der letzte Stand bleibt
+    return line.rstrip("\r").rpartition("\r")[2]
+
+
+class LineSplitter:
+    # Bytes inkrementell dekodieren (ungültiges UTF-8 wird ersetzt) und blockweise in Zeilen zerlegen.
+    # Der unvollständige Rest bleibt begrenzt: Fortschrittsbalken behalten nur ihren letzten Stand,
+    # Zeilen über max_line Zeichen werden umbrochen.
+    def __init__(self, max_line=MAX_LINE_LENGTH):
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._rest = ""
+        self.max_line = max_line
+
+    def feed(self, data, final=False):
+        text = self._rest + self._decoder.decode(data, final)
+        lines = text.split("\n")
+        rest = "" if final else lines.pop()
+        if final and lines and lines[-1] == "":
+            lines.pop()
+        if "\r" in text:
+            lines = [_overwrite(line) if "\r" in line else line for line in lines]
+            # ein abschließendes "\r" kann zu "\r\n" im nächsten Block gehören
+            cut = rest.rfind("\r", 0, len(rest) - 1)
+            if cut >= 0:
+                rest = rest[cut + 1:]
+        if self.max_line and len(text) > self.max_line:
+            if max(map(len, lines), default=0) > self.max_line:
+                lines = [piece for line in lines for piece in self._wrap(line)]
+            if len(rest) > self.max_line:
+                pieces = self._wrap(rest)
+                lines.extend(pieces[:-1])
+                rest = pieces[-1]
+        self._rest = rest
+        return lines
+
+    def _wrap(self, line):
+        n = self.max_line
+        if len(line) <= n:
+            return [line]
+        return [line[i:i + n] for i in range(0, len(line), n)]
+
+
+def per_line(callback):
+    # Zeilen-Callback (z.B. emit) als Block-Callback für tee/drain
+    def log_lines(lines):
+        for line in lines:
+            callback(line)
+    return log_lines
+
+
+def stop_reason(stop_event=None, deadline=None):
+    if stop_event is not None and stop_event.is_set():
+        return "cancelled"
+    if deadline is not None and time.monotonic() > deadline:
+        return "timeout"
+    return None
+
+
+def tee(source, target, log_lines, stop_event=None, process=None, deadline=None):
+    # stdout eines Steps lesen: Rohdaten an target (nächster Step / Artefakt) weiterreichen, Zeilen ins Log
+    # log_lines bekommt die Zeilen je gelesenem Block als Liste
+    # Abbruch/Zeitlimit wird auch geprüft, wenn das Modul nichts ausgibt; dann wird die Prozessgruppe beendet
+    # Rückgabe: None, "cancelled" oder "timeout"
+    splitter = LineSplitter()
+    enlarge_pipe(source)
+    fd = source.fileno()
+    reason = None
+    watch = stop_event is not None or deadline is not None
+    while True:
+        if watch:
+            ready, _, _ = select.select([fd], [], [], POLL_INTERVAL)
+            reason = stop_reason(stop_event, deadline)
+            if reason:
+                if process is not None:
+                    kill_process_group(process)
+                break
+            if not ready:
+                continue
+        data = os.read(fd, READ_SIZE)
+        if not data:
+            break
+        if target is not None:
+            try:
+                target.write(data)
+                target.flush()
+            except (BrokenPipeError, ValueError):
+                # Nachfolger hat stdin geschlossen -> nur noch loggen
+                target = None
+        lines = splitter.feed(data)
+        if lines:
+            log_lines(lines)
+    lines = splitter.feed(b"", final=True)
+    if lines:
+        log_lines(lines)
+    source.close()
+    if target is not None:
+        try:
+            target.close()
+        except BrokenPipeError:
+            pass
+    return reason
+
+
+def drain(source, log_lines):
+    # stderr nur ins Log
+    splitter = LineSplitter()
+    for data in iter(lambda: os.read(source.fileno(), READ_SIZE), b""):
+        lines = splitter.feed(data)
+        if lines:
+            log_lines(lines)
+    lines = splitter.feed(b"", final=True)
+    if lines:
+        log_lines(lines)
+    source.close()
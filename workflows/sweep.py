@@ -0,0 +1,112 @@
+import itertools
+import shutil
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from db.log_writer import get_log_writer
+from workflows import blobs
+from workflows.artifacts import get_artifact_store
+from workflows.executor import GLOBAL_MAX_WORKERS, _global_slots
+from workflows.runner import run_step, start_module_run
+
+# Parameter-Sweep: ein Step läuft einmal pro Parametersatz, die Sub-Runs parallel.
+# In WorkflowStep.parameters:
+#   "sweep": {"date": ["2024-01-01", "2024-01-02"], "shard": [0, 1, 2]}   # Raster (alle Kombinationen)
+#   "sweep": [{"tenant": "a"}, {"tenant": "b", "limit": 10}]              # Liste von Parametersätzen
+#   "sweep_parallel": 8                                                    # max. gleichzeitige Sub-Runs
+# Jeder Sub-Run ist ein eigener ModuleRun (mit seinem Parametersatz in ModuleRun.parameters),
+# die Parameter kommen per Umgebung ins Modul (runner.module_env). Danach fasst ein weiterer
+# ModuleRun des Steps die Ergebnisse zusammen (Fan-in): Ausgaben in Sweep-Reihenfolge hintereinander,
+# das ist der Eingang der Nachfolger-Steps.
+
+SWEEP_PARAMETERS = ("sweep", "sweep_parallel")
+
+
+def sweep_sets(parameters):
+    # Parametersätze des Sweeps (nur die Sweep-Werte), in fester Reihenfolge
+    sweep = (parameters or {}).get("sweep")
+    if isinstance(sweep, dict):
+        names = list(sweep)
+        values = [v if isinstance(v, list) else [v] for v in sweep.values()]
+        return [dict(zip(names, combo)) for combo in itertools.product(*values)]
+    if isinstance(sweep, list):
+        return [s if isinstance(s, dict) else {"value": s} for s in sweep]
+    raise ValueError(f"Ungültiger Sweep: {sweep!r} (Dict mit Wertelisten oder Liste von Parametersätzen)")
+
+
+def sub_parameters(parameters, values):
+    # Parameter eines Sub-Runs: Step-Parameter ohne Sweep-Angaben, überschrieben vom Parametersatz
+    base = {k: v for k, v in (parameters or {}).items() if k not in SWEEP_PARAMETERS}
+    return dict(base, **values)
+
+
+def sweep_limit(step, count=None):
+    limit = (step.parameters or {}).get("sweep_parallel") or GLOBAL_MAX_WORKERS
+    return max(1, min(int(limit), count or int(limit)))
+
+
+def sweep_label(values):
+    return ",".join(f"{k}={v}" for k, v in values.items())
+
+
+def sweep_status(results):
+    # Gesamtstatus: fertig nur, wenn alle Sub-Runs fertig sind
+    statuses = [status for status, _ in results]
+    if all(s in ("finished", "skipped") for s in statuses):
+        return "finished"
+    return "cancelled" if "cancelled" in statuses else "failed"
+
+
+def gather(step, workflow_instance_id, results, emit=print):
+    # Fan-in: Ergebnisse der Sub-Runs zu einem Artefakt verbinden und als ModuleRun des Steps eintragen
+    # (dieser Run ist der letzte des Steps, Fortsetzen und Nachfolger sehen nur ihn)
+    # Rückgabe: (Status, output_ref)
+    status = sweep_status(results)
+    store = get_artifact_store()
+    writer = get_log_writer()
+    run_id = start_module_run(step, workflow_instance_id, parameters={"sweep_runs": len(results)})
+    output_ref = None
+    if status == "finished" and any(blobs.is_blob(ref) for _, ref in results):
+        # binäre Ausgaben (module_io) haben kein gemeinsames Format, das sich aneinanderhängen ließe
+        writer.append_log(run_id, "Binäre Ausgaben von Sweep-Runs lassen sich nicht zusammenfassen.")
+        status = "failed"
+    if status == "finished":
+        output = store.open_writer()
+        for _, ref in results:
+            if ref:
+                with open(store.path(ref), "rb") as f:
+                    shutil.copyfileobj(f, output, 1024 * 1024)
+        output_ref = output.commit()
+    counts = ", ".join(f"{n} {s}" for s, n in Counter(s for s, _ in results).items())
+    message = f"Sweep {step.module.name}: {len(results)} Parametersätze ({counts})"
+    writer.append_log(run_id, message)
+    writer.finish_run(run_id, status=status, finished_at=datetime.now(), output_ref=output_ref)
+    emit(message)
+    return status, output_ref
+
+
+def run_sweep(step, workflow_instance_id, emit=print, stop_event=None, inputs=None, run=run_step):
+    # Thread-Variante: Sub-Runs in einem eigenen Pool, jeder belegt einen globalen Slot
+    # (der Step selbst belegt keinen, sonst könnten sich mehrere Sweeps gegenseitig blockieren)
+    # run: Ausführung eines Sub-Runs, run_step oder runner.run_queued (Worker-Agenten)
+    sets = sweep_sets(step.parameters)
+    limit = sweep_limit(step, len(sets))
+    emit(f"{step.module.name}: Sweep über {len(sets)} Parametersätze, bis zu {limit} parallel")
+
+    def run_one(values):
+        while not _global_slots.acquire(timeout=0.2):
+            if stop_event is not None and stop_event.is_set():
+                return "cancelled", None
+        try:
+            if stop_event is not None and stop_event.is_set():
+                return "cancelled", None
+            label = sweep_label(values)
+            return run(step, workflow_instance_id, lambda line: emit(f"[{label}] {line}"), stop_event,
+                       inputs, sub_parameters(step.parameters, values))
+        finally:
+            _global_slots.release()
+
+    with ThreadPoolExecutor(max_workers=limit, thread_name_prefix="sweep") as pool:
+        results = list(pool.map(run_one, sets))
+    return gather(step, workflow_instance_id, results, emit)
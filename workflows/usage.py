@@ -0,0 +1,216 @@
+import os
+import threading
+import time
+
+# Ressourcenverbrauch von Modul-Prozessen. Gemessen wird über os.wait4 beim Abholen des
+# beendeten Prozesses: der Kernel liefert CPU, Block-I/O und Kontextwechsel (inkl.
+# abgewarteter Kindprozesse). Nur der Peak-RSS kommt aus /proc (VmHWM), weil ru_maxrss
+# eines Kindes mindestens den RSS des Elternprozesses beim fork/exec enthält. Gibt es keinen
+# Messwert aus der Laufzeit des Moduls (sehr kurze Läufe), bleibt max_rss_kb leer.
+
+SAMPLE_INTERVAL = float(os.environ.get("WORKFLOW_RSS_SAMPLE_INTERVAL", "0.5")) # Sekunden
+
+# Spalten in ModuleRun, in die ein Usage-Dict geschrieben wird
+USAGE_COLUMNS = ("wall_time", "cpu_user", "cpu_system", "max_rss_kb",
+                 "io_read_bytes", "io_write_bytes", "ctx_voluntary", "ctx_involuntary")
+
+
+def read_hwm(pid):
+    # Peak-RSS (VmHWM) eines laufenden Prozesses in KB, None wenn nicht lesbar
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+class RssSampler(threading.Thread):
+    # Ein Thread für alle laufenden Modul-Prozesse; eine kleine /proc-Datei pro Prozess und Intervall
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        super().__init__(name="rss-sampler", daemon=True)
+        self.interval = interval
+        self._peaks = {}
+        self._lock = threading.Lock()
+
+    def track(self, pid):
+        # Nach Popen aufrufen; direkt nach exec steht in VmHWM nur der Interpreter-Start,
+        # der erste Messwert kommt deshalb erst nach einem Intervall
+        with self._lock:
+            self._peaks[pid] = None
+
+    def untrack(self, pid):
+        with self._lock:
+            return self._peaks.pop(pid, None)
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                pids = list(self._peaks)
+            for pid in pids:
+                hwm = read_hwm(pid)
+                if hwm is None:
+                    continue
+                with self._lock:
+                    if pid in self._peaks:
+                        self._peaks[pid] = max(self._peaks[pid] or 0, hwm)
+
+    def peak(self, pid):
+        # Letzter Stand vor dem Abholen: läuft der Prozess noch, VmHWM ein letztes Mal lesen
+        # (bei einem Zombie gibt es keine Speicherangaben mehr)
+        hwm = read_hwm(pid)
+        sampled = self.untrack(pid)
+        values = [value for value in (sampled, hwm) if value]
+        return max(values) if values else None
+
+
+_sampler = None
+_sampler_lock = threading.Lock()
+
+
+def track(process):
+    global _sampler
+    with _sampler_lock:
+        if _sampler is None:
+            _sampler = RssSampler()
+            _sampler.start()
+    _sampler.track(process.pid)
+
+
+def from_rusage(ru, wall_time=None):
+    return {
+        "wall_time": wall_time,
+        "cpu_user": ru.ru_utime,
+        "cpu_system": ru.ru_stime,
+        "max_rss_kb": ru.ru_maxrss, # Linux: KB
+        "io_read_bytes": ru.ru_inblock * 512, # Blöcke à 512 Byte
+        "io_write_bytes": ru.ru_oublock * 512,
+        "ctx_voluntary": ru.ru_nvcsw,
+        "ctx_involuntary": ru.ru_nivcsw,
+    }
+
+
+def exited(process):
+    # Prozess beendet? Holt ihn nicht ab, damit reap() danach noch die Ressourcen bekommt
+    if process.returncode is not None:
+        return True
+    try:
+        return os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOHANG | os.WNOWAIT) is not None
+    except ChildProcessError:
+        return True
+
+
+def wait_exit(process, timeout=None):
+    # Wie process.wait(timeout), aber ohne abzuholen; Rückgabe: ob der Prozess beendet ist
+    if timeout is None:
+        if process.returncode is None:
+            try:
+                os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOWAIT)
+            except ChildProcessError:
+                pass
+        return True
+    end = time.monotonic() + timeout
+    while not exited(process):
+        if time.monotonic() > end:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+def reap(process, started=None):
+    # Anstelle von process.wait(): wartet, setzt returncode und liefert den Verbrauch (oder None,
+    # falls der Prozess schon anderweitig abgeholt wurde)
+    if process.returncode is not None:
+        return None
+    peak = _sampler.peak(process.pid) if _sampler is not None else None
+    try:
+        _, status, ru = os.wait4(process.pid, 0)
+    except ChildProcessError:
+        process.wait()
+        return None
+    process.returncode = os.waitstatus_to_exitcode(status)
+    usage = from_rusage(ru, time.monotonic() - started if started is not None else None)
+    usage["max_rss_kb"] = peak # ru_maxrss gehört evtl. zum Elternprozess, siehe oben
+    return usage
+
+
+def format_usage(run):
+    # Kurzform für die GUI/CLI, run: ModuleRun oder Dict mit USAGE_COLUMNS
+    get = run.get if isinstance(run, dict) else lambda key: getattr(run, key, None)
+    if get("wall_time") is None and get("cpu_user") is None:
+        return ""
+    cpu = (get("cpu_user") or 0) + (get("cpu_system") or 0)
+    io = ((get("io_read_bytes") or 0) + (get("io_write_bytes") or 0)) / (1024 * 1024)
+    parts = []
+    if get("wall_time") is not None:
+        parts.append(f"{get('wall_time'):.1f}s")
+    parts.append(f"CPU {cpu:.1f}s")
+    if get("max_rss_kb"):
+        parts.append(f"RSS {get('max_rss_kb') / 1024:.0f} MB")
+    parts.append(f"I/O {io:.1f} MB")
+    return " · ".join(parts)
+
+
+def latest_step_usage(workflow_id):
+    # step.id -> letzter ModuleRun des Steps (mit Verbrauchswerten)
+    from sqlalchemy import func
+    from db.db_setup import SessionLocal, ModuleRun, WorkflowStep
+
+    session = SessionLocal()
+    try:
+        latest = (
+            session.query(func.max(ModuleRun.id))
+            .join(WorkflowStep, WorkflowStep.id == ModuleRun.workflow_step_id)
+            .filter(WorkflowStep.workflow_id == workflow_id)
+            .group_by(ModuleRun.workflow_step_id)
+        )
+        runs = session.query(ModuleRun).filter(ModuleRun.id.in_(latest.scalar_subquery())).all()
+        session.expunge_all()
+        return {run.workflow_step_id: run for run in runs}
+    finally:
+        session.close()
+
+
+def workflow_usage_summary(workflow_id, instances=20):
+    # Verbrauch der letzten Instanzen eines Workflows: Summen pro Instanz, gemittelt
+    from sqlalchemy import func
+    from db.db_setup import SessionLocal, ModuleRun, WorkflowInstance
+
+    session = SessionLocal()
+    try:
+        recent = (
+            session.query(WorkflowInstance.id)
+            .filter(WorkflowInstance.workflow_id == workflow_id)
+            .order_by(WorkflowInstance.id.desc())
+            .limit(instances)
+            .subquery()
+        )
+        rows = (
+            session.query(
+                ModuleRun.workflow_instance_id,
+                func.sum(ModuleRun.cpu_user + ModuleRun.cpu_system),
+                func.max(ModuleRun.max_rss_kb),
+                func.sum(ModuleRun.io_read_bytes + ModuleRun.io_write_bytes),
+                func.min(ModuleRun.started_at),
+                func.max(ModuleRun.finished_at),
+            )
+            .filter(ModuleRun.workflow_instance_id.in_(session.query(recent.c.id)))
+            .filter(ModuleRun.cpu_user.isnot(None))
+            .group_by(ModuleRun.workflow_instance_id)
+            .all()
+        )
+    finally:
+        session.close()
+    if not rows:
+        return None
+    walls = [(end - start).total_seconds() for _, _, _, _, start, end in rows if start and end]
+    return {
+        "instances": len(rows),
+        "cpu": sum(r[1] or 0 for r in rows) / len(rows),
+        "max_rss_kb": max(r[2] or 0 for r in rows),
+        "io_bytes": sum(r[3] or 0 for r in rows) / len(rows),
+        "wall_time": sum(walls) / len(walls) if walls else None,
+    }
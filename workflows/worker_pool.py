@@ -0,0 +1,236 @@
+import json
+import os
+import select
+import subprocess, sys
+import signal
+import threading
+import uuid
+from collections import deque
+
+from workflows.limits import signal_group
+from workflows.pool_worker import MARK
+from workflows.streams import stop_reason, enlarge_pipe, READ_SIZE
+
+POOL_SIZE = int(os.environ.get("WORKFLOW_POOL_SIZE", "2"))
+POOL_PRELOAD = os.environ.get("WORKFLOW_POOL_PRELOAD", "numpy,pandas")
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pool_worker.py")
+# Projektverzeichnis, damit Module "from workflows import module_io" importieren können
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def module_pythonpath():
+    return os.pathsep.join(filter(None, [os.environ.get("PYTHONPATH"), PROJECT_ROOT]))
+
+
+class _MarkedStream:
+    # Liest einen Worker-Ausgabestrom bis zur Endmarke des aktuellen Auftrags
+    def __init__(self, fileobj):
+        enlarge_pipe(fileobj)
+        self.fd = fileobj.fileno()
+        self.buffer = b""
+
+    def read_job(self, token, on_data, check_stop=None, on_stop=None):
+        # on_data bekommt Rohdaten ohne Marke; Rückgabe: (rc, recycle, usage) oder None bei EOF/Abbruch
+        # check_stop() liefert einen Abbruchgrund oder None, on_stop(grund) wird dann aufgerufen
+        marker = MARK + token.encode()
+        while True:
+            pos = self.buffer.find(marker)
+            if pos >= 0:
+                end = self.buffer.find(b"\n", pos)
+                if end >= 0:
+                    if pos:
+                        on_data(self.buffer[:pos])
+                    rc, recycle, usage = self.buffer[pos + len(marker):end].split(maxsplit=2)
+                    self.buffer = self.buffer[end + 1:]
+                    return int(rc), recycle == b"1", json.loads(usage)
+            else:
+                # Alles bis auf ein mögliches Marken-Fragment am Ende sofort weitergeben
+                cut = len(self.buffer)
+                start = self.buffer.rfind(marker[:1], max(0, cut - len(marker) + 1))
+                if start >= 0 and marker.startswith(self.buffer[start:]):
+                    cut = start
+                if cut:
+                    on_data(self.buffer[:cut])
+                    self.buffer = self.buffer[cut:]
+
+            if check_stop is not None:
+                ready, _, _ = select.select([self.fd], [], [], 0.2)
+                reason = check_stop()
+                if reason:
+                    if on_stop is not None:
+                        on_stop(reason)
+                    return None
+                if not ready:
+                    continue
+            data = os.read(self.fd, READ_SIZE)
+            if not data:
+                if self.buffer:
+                    on_data(self.buffer)
+                    self.buffer = b""
+                return None
+            self.buffer += data
+
+
+class PoolWorker:
+    def __init__(self, preload=POOL_PRELOAD):
+        read_fd, write_fd = os.pipe()
+        env = dict(os.environ, WORKFLOW_POOL_PRELOAD=preload, PYTHONUNBUFFERED="1", PYTHONPATH=module_pythonpath())
+        self.process = subprocess.Popen(
+            [sys.executable, "-u", WORKER_SCRIPT, str(read_fd)],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            pass_fds=(read_fd,),
+            env=env,
+            start_new_session=True, # kill() erreicht so auch Kindprozesse der Module
+        )
+        os.close(read_fd)
+        self.control = os.fdopen(write_fd, "w")
+        self.stdout = _MarkedStream(self.process.stdout)
+        self.stderr = _MarkedStream(self.process.stderr)
+        self.jobs = 0
+
+    def alive(self):
+        return self.process.poll() is None
+
+    def kill(self):
+        signal_group(self.process.pid, signal.SIGKILL)
+        self.process.wait()
+
+    def close(self):
+        self.kill()
+        for f in (self.control, self.process.stdout, self.process.stderr):
+            try:
+                f.close()
+            except OSError:
+                pass
+
+
+class WorkerPool:
+    # Vorgestartete Python-Worker mit vorgeladenen Modulen; spart Interpreter-Start und Imports
+    def __init__(self, size=POOL_SIZE, preload=POOL_PRELOAD):
+        self.size = max(1, size)
+        self.preload = preload
+        self._idle = deque()
+        self._lock = threading.Lock()
+        # Wartende Aufträge werden geweckt, sobald ein Worker frei wird oder ein Platz (auch durch
+        # Recycling/Abbruch eines Workers) frei geworden ist
+        self._available = threading.Condition(self._lock)
+        self._count = 0
+        self.stats = {"jobs": 0, "started": 0, "recycled": 0}
+
+    def warm_up(self):
+        # Alle Worker schon vor dem ersten Auftrag starten
+        with self._available:
+            while self._count < self.size:
+                self._idle.append(self._spawn())
+            self._available.notify_all()
+
+    def _spawn(self):
+        # Aufrufer hält _lock
+        self._count += 1
+        self.stats["started"] += 1
+        return PoolWorker(self.preload)
+
+    def _acquire(self):
+        while True:
+            with self._available:
+                while not self._idle and self._count >= self.size:
+                    self._available.wait()
+                if self._idle:
+                    worker = self._idle.popleft()
+                else:
+                    # Platz reservieren, der Worker startet außerhalb der Sperre
+                    self._count += 1
+                    self.stats["started"] += 1
+                    worker = None
+            if worker is None:
+                try:
+                    return PoolWorker(self.preload)
+                except Exception:
+                    self._free_slot()
+                    raise
+            if worker.alive():
+                return worker
+            self._discard(worker)
+
+    def _release(self, worker):
+        with self._available:
+            self._idle.append(worker)
+            self._available.notify()
+
+    def _free_slot(self):
+        with self._available:
+            self._count -= 1
+            self._available.notify()
+
+    def _discard(self, worker):
+        worker.close()
+        self._free_slot()
+
+    def run(self, code_path, on_stdout, on_stderr, stdin_paths=None, stdin_text=None,
+            args=None, env=None, stop_event=None, deadline=None, profile=None):
+        # Führt ein Modul-Skript in einem Worker aus. on_stdout/on_stderr bekommen Rohdaten (bytes).
+        # deadline: time.monotonic()-Zeitpunkt, danach wird der Worker beendet
+        # profile: (Modus, Ausgabedatei), das Skript läuft dann unter workflows/profiler.py
+        # Rückgabe: (returncode, None/"cancelled"/"timeout", Ressourcenverbrauch des Auftrags oder None)
+        worker = self._acquire()
+        token = uuid.uuid4().hex
+        job = {"token": token, "code_path": code_path, "stdin_paths": stdin_paths or [],
+               "stdin_text": stdin_text, "args": args or [], "env": env or {}, "profile": profile}
+        try:
+            worker.control.write(json.dumps(job) + "\n")
+            worker.control.flush()
+        except (BrokenPipeError, OSError):
+            self._discard(worker)
+            return self.run(code_path, on_stdout, on_stderr, stdin_paths, stdin_text, args, env, stop_event, deadline,
+                            profile)
+
+        stopped = []
+        err_result = []
+        err_thread = threading.Thread(
+            target=lambda: err_result.append(worker.stderr.read_job(token, on_stderr)), daemon=True)
+        err_thread.start()
+        check_stop = None
+        if stop_event is not None or deadline is not None:
+            check_stop = lambda: stop_reason(stop_event, deadline)
+        result = worker.stdout.read_job(token, on_stdout, check_stop, lambda reason: (stopped.append(reason), worker.kill()))
+        if result is None and not stopped:
+            worker.kill() # Worker ist unerwartet beendet (z.B. os._exit im Modul)
+        err_thread.join()
+
+        with self._lock:
+            self.stats["jobs"] += 1
+        worker.jobs += 1
+        if result is None:
+            self._discard(worker)
+            rc = worker.process.returncode
+            return (rc if rc else 1), (stopped[0] if stopped else None), None
+        rc, recycle, usage = result
+        if recycle:
+            with self._lock:
+                self.stats["recycled"] += 1
+            self._discard(worker)
+        else:
+            self._release(worker)
+        return rc, None, usage
+
+    def shutdown(self):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                worker = self._idle.popleft()
+            self._discard(worker)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_worker_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = WorkerPool()
+        return _pool